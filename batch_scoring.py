@@ -0,0 +1,186 @@
+"""
+Headless batch scoring for survey exports shaped like `survey.csv`.
+
+Usage:
+    python batch_scoring.py survey.csv -o scored.csv
+    python batch_scoring.py export.parquet -o scored.parquet --chunksize 50000 --workers 4
+    python batch_scoring.py survey_store/ -o scored.csv
+
+Each chunk is encoded into the `feature_columns` layout in one vectorized pass
+and scored with a single `predict_proba` call, so memory stays bounded by the
+chunk size no matter how large the export is. A survey store directory (see
+`survey_store.py`) is scored one partition at a time from its cached model
+matrices, reading only the columns the risk rules need. Every chunk also feeds
+the 'batch' drift monitor (see `drift_monitor.py`); workers send back bin
+counts only, and a drift summary is printed after the run.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from drift_monitor import get_monitor, print_report
+from model_registry import get_registry
+from prediction import DECISION_THRESHOLD, require_full_model
+from rules import get_rules, risk_levels, risk_scores
+from survey_store import SurveyStore
+
+DEFAULT_CHUNKSIZE = 10000
+
+
+def score_frame(frame, loaded=None, start_row=0, explain=False, features=None):
+    """
+    Score a DataFrame of raw survey answers and return one output row per input row.
+    `features` is the already encoded model matrix, if there is one.
+    With `explain`, adds a TreeSHAP `contribution_<feature>` column per model feature.
+    """
+    loaded = loaded or get_registry().get()
+    require_full_model(loaded)
+    if features is None:
+        features = loaded.encoder.encode_columns(frame, len(frame))
+    probability = loaded.model.predict_proba(features)[:, 1]
+    prediction = (probability > DECISION_THRESHOLD).astype(np.int64)
+    score = risk_scores(frame, prediction)
+    scored = pd.DataFrame({
+        'row': np.arange(start_row, start_row + len(frame)),
+        'prediction': np.where(prediction == 1, 'Treatment Likely', 'Treatment Unlikely'),
+        'probability': probability,
+        'risk_score': score,
+        'risk_level': risk_levels(score),
+    })
+    if explain:
+        phi = loaded.explainer.shap_values(features)
+        contributions = pd.DataFrame(phi, columns=[f"contribution_{col}" for col in loaded.feature_columns])
+        scored = pd.concat([scored, contributions], axis=1)
+    return scored
+
+
+def iter_chunks(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield DataFrame chunks from a CSV or Parquet file."""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, dtype=str, chunksize=chunksize)
+
+
+class ChunkWriter:
+    """Appends scored chunks to a CSV or Parquet file (or stdout for '-')."""
+
+    def __init__(self, path):
+        self.path = path
+        self._parquet = None
+        self._header = True
+
+    def write(self, frame):
+        if self.path.endswith('.parquet'):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+        else:
+            target = sys.stdout if self.path == '-' else self.path
+            frame.to_csv(target, mode='w' if self._header else 'a', header=self._header, index=False)
+        self._header = False
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def _score_chunk(args):
+    """The scored chunk and its drift sketch counts (None when monitoring is off)."""
+    frame, start_row, explain, features = args
+    loaded = get_registry().get()
+    if features is None:
+        features = loaded.encoder.encode_columns(frame, len(frame))
+    scored = score_frame(frame, loaded, start_row, explain, features)
+    monitor = get_monitor('batch', loaded, wait=True)
+    return scored, monitor.counts(features, scored['probability'].to_numpy()) if monitor is not None else None
+
+
+def _store_chunks(path, explain=False):
+    """One chunk per store partition: the rule columns plus the partition's cached model matrix."""
+    store = SurveyStore(path)
+    encoder = get_registry().get().encoder
+    columns = [field for field in get_rules().fields if field in store.columns]
+    start_row = 0
+    for partition in store.partitions:
+        features = store.features(encoder, [partition])
+        yield store.read(columns, [partition]), start_row, explain, features
+        start_row += len(features)
+
+
+def _numbered_chunks(path, chunksize, explain=False):
+    if os.path.isdir(path):
+        yield from _store_chunks(path, explain)
+        return
+    start_row = 0
+    for frame in iter_chunks(path, chunksize):
+        yield frame, start_row, explain, None
+        start_row += len(frame)
+
+
+def score_file(input_path, output_path, chunksize=DEFAULT_CHUNKSIZE, workers=1, explain=False):
+    """Stream `input_path` through the model into `output_path`; returns the row count."""
+    writer = ChunkWriter(output_path)
+    monitor = get_monitor('batch', wait=True)
+    rows = 0
+
+    def write(result):
+        nonlocal rows
+        scored, counts = result
+        writer.write(scored)
+        if monitor is not None and counts is not None:
+            monitor.add_counts(*counts)
+        rows += len(scored)
+
+    try:
+        chunks = _numbered_chunks(input_path, chunksize, explain)
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # At most two chunks per worker are in flight, and results are written in input order.
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.submit(_score_chunk, chunk))
+                    if len(pending) >= 2 * workers:
+                        write(pending.popleft().result())
+                while pending:
+                    write(pending.popleft().result())
+        else:
+            for chunk in chunks:
+                write(_score_chunk(chunk))
+    finally:
+        writer.close()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a survey export with the mental health model.")
+    parser.add_argument('input', help="CSV or Parquet file shaped like survey.csv, or a survey store directory")
+    parser.add_argument('-o', '--output', default='-', help="CSV or Parquet output path ('-' for stdout)")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="rows per chunk")
+    parser.add_argument('--workers', type=int, default=1, help="parallel worker processes (0 = all cores)")
+    parser.add_argument('--explain', action='store_true', help="add per-feature TreeSHAP contribution columns")
+    args = parser.parse_args(argv)
+
+    workers = args.workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    rows = score_file(args.input, args.output, chunksize=args.chunksize, workers=workers, explain=args.explain)
+    elapsed = time.perf_counter() - start
+    print(f"Scored {rows} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):.0f} rows/s)", file=sys.stderr)
+    monitor = get_monitor('batch', wait=True)
+    if monitor is not None:
+        print_report(monitor.report(), file=sys.stderr, alerts_only=True)
+
+
+if __name__ == '__main__':
+    main()
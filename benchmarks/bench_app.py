@@ -0,0 +1,239 @@
+"""
+Server cost and websocket payload of each interaction with the Streamlit app.
+
+Usage:
+    python benchmarks/bench_app.py                     # the working tree's main.py
+    python benchmarks/bench_app.py --compare HEAD~1    # ... side by side with main.py at a git revision
+    python benchmarks/bench_app.py --sessions 20 -o app.json
+
+Starts `streamlit run` headless and drives it over its websocket the way a
+browser does: one BackMsg per interaction, carrying the widget states and, for
+widgets inside a fragment, the fragment id. It then reads ForwardMsgs until the
+run finishes. Each session loads the page, answers and advances through every
+form step, generates the report and flips the what-if selectboxes. Recorded
+per interaction: server CPU time (from /proc, so Linux only), wall time, the
+messages and bytes received, and how many of those bytes were the page CSS.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, 'main.py')
+
+FORM_ANSWERS = (35, 'Yes', 'Yes', 'Yes', 'No', 'Yes')
+WHAT_IF_CHANGES = (('family_history', 'No'), ('benefits', 'No'), ('remote_work', 'No'))
+WIDGET_TYPES = ('button', 'selectbox', 'number_input')
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def server_cpu_seconds(pid):
+    """User + system CPU of the server process, including its finished script-runner threads."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+class AppServer:
+    """`streamlit run <script>` in a child process on a free port."""
+
+    def __init__(self, script):
+        self.port = free_port()
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'streamlit', 'run', script, '--server.headless', 'true',
+             '--server.port', str(self.port), '--server.fileWatcherType', 'none', '--browser.gatherUsageStats', 'false'],
+            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        self.close()
+        raise RuntimeError(f"Streamlit did not start serving {script}.")
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait(timeout=30)
+
+
+class BrowserSession:
+    """Just enough of the Streamlit frontend protocol to click through the app."""
+
+    def __init__(self, server, websocket, timeout=None):
+        self.server = server
+        self.websocket = websocket
+        self.timeout = timeout     # seconds to wait for each message of a run
+        self.page_script_hash = ''
+        self.widgets = {}          # label -> (element type, widget id, fragment id)
+        self.widget_states = {}    # widget id -> WidgetState of widgets this session has set
+        self.cached_hashes = set()
+
+    def widget(self, label):
+        matches = [widget for name, widget in self.widgets.items() if name == label or name.startswith(label)]
+        if not matches:
+            raise KeyError(f"No widget labelled {label!r} on the page.")
+        return matches[-1]
+
+    def interact(self, label=None, value=None):
+        """Send one rerun (the page load when `label` is None) and measure it until the run finishes."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        message = BackMsg()
+        client_state = message.rerun_script
+        client_state.page_script_hash = self.page_script_hash
+        client_state.cached_message_hashes.extend(sorted(self.cached_hashes))
+        trigger = None
+        if label is not None:
+            element_type, widget_id, fragment_id = self.widget(label)
+            state = WidgetState(id=widget_id)
+            if element_type == 'button':
+                state.trigger_value = True
+                trigger = state
+            elif element_type == 'number_input':
+                state.double_value = float(value)
+            else:
+                state.string_value = str(value)
+            if trigger is None:
+                self.widget_states[widget_id] = state
+            client_state.fragment_id = fragment_id
+        client_state.widget_states.widgets.extend(list(self.widget_states.values()) + ([trigger] if trigger else []))
+
+        cpu_before = server_cpu_seconds(self.server.process.pid)
+        start = time.perf_counter()
+        self.websocket.send(message.SerializeToString())
+        stats = self._receive()
+        stats['wall_ms'] = (time.perf_counter() - start) * 1000
+        # The server keeps working until its last message is written; let it settle before reading its CPU time.
+        time.sleep(0.02)
+        stats['server_cpu_ms'] = (server_cpu_seconds(self.server.process.pid) - cpu_before) * 1000
+        return stats
+
+    def _receive(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        stats = {'messages': 0, 'bytes': 0, 'css_bytes': 0, 'full_runs': 0, 'fragment_runs': 0}
+        while True:
+            data = self.websocket.recv(timeout=self.timeout)
+            stats['messages'] += 1
+            stats['bytes'] += len(data)
+            message = ForwardMsg()
+            message.ParseFromString(data)
+            kind = message.WhichOneof('type')
+            if message.metadata.cacheable:
+                self.cached_hashes.add(message.hash)
+            if kind == 'new_session':
+                self.page_script_hash = message.new_session.page_script_hash
+            elif kind == 'delta' and message.delta.WhichOneof('type') == 'new_element':
+                element = message.delta.new_element
+                element_type = element.WhichOneof('type')
+                if element_type == 'markdown' and '<style>' in element.markdown.body:
+                    stats['css_bytes'] += len(data)
+                elif element_type in WIDGET_TYPES:
+                    widget = getattr(element, element_type)
+                    self.widgets[widget.label] = (element_type, widget.id, message.delta.fragment_id)
+            elif kind == 'script_finished':
+                status = message.script_finished
+                if status == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    continue
+                stats['full_runs' if status == ForwardMsg.FINISHED_SUCCESSFULLY else 'fragment_runs'] += 1
+                return stats
+
+
+def run_session(server):
+    """One user's walk through the app; returns [(interaction kind, stats)]."""
+    from websockets.sync.client import connect
+
+    with connect(f"ws://127.0.0.1:{server.port}/_stcore/stream", subprotocols=['streamlit'], max_size=None) as websocket:
+        session = BrowserSession(server, websocket)
+        results = [('page load', session.interact())]
+        results.append(('form navigation', session.interact('BEGIN ANALYSIS')))
+        for step, answer in enumerate(FORM_ANSWERS):
+            results.append(('form input', session.interact(' ', answer)))
+            last = step == len(FORM_ANSWERS) - 1
+            results.append(('generate report' if last else 'form navigation',
+                            session.interact('GENERATE REPORT' if last else 'Next >>')))
+        for factor, value in WHAT_IF_CHANGES:
+            results.append(('what-if', session.interact('Select a Factor:', factor)))
+            results.append(('what-if', session.interact("New value for '", value)))
+        return results
+
+
+def benchmark(script, sessions):
+    server = AppServer(script)
+    try:
+        run_session(server)  # warm-up: model load, caches, prediction table
+        samples = defaultdict(list)
+        for _ in range(sessions):
+            for kind, stats in run_session(server):
+                samples[kind].append(stats)
+    finally:
+        server.close()
+    summary = {}
+    for kind, runs in samples.items():
+        summary[kind] = {'count': len(runs), **{
+            field: sum(run[field] for run in runs) / len(runs)
+            for field in ('server_cpu_ms', 'wall_ms', 'messages', 'bytes', 'css_bytes', 'full_runs', 'fragment_runs')
+        }}
+    interactions = [run for runs in samples.values() for run in runs]
+    summary['session'] = {
+        'count': sessions,
+        **{field: sum(run[field] for run in interactions) / sessions
+           for field in ('server_cpu_ms', 'wall_ms', 'messages', 'bytes', 'css_bytes', 'full_runs', 'fragment_runs')},
+    }
+    return summary
+
+
+def print_summary(label, summary):
+    print(f"\n{label}")
+    print(f"{'interaction':<17} {'server CPU ms':>13} {'wall ms':>8} {'messages':>9} {'bytes':>8} {'CSS bytes':>10} {'full/fragment runs':>19}")
+    for kind, row in summary.items():
+        print(f"{kind:<17} {row['server_cpu_ms']:>13.1f} {row['wall_ms']:>8.1f} {row['messages']:>9.1f} {row['bytes']:>8.0f} "
+              f"{row['css_bytes']:>10.0f} {row['full_runs']:>9.1f}/{row['fragment_runs']:.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure per-interaction server time and websocket bytes of main.py.")
+    parser.add_argument('--script', default=APP_PATH)
+    parser.add_argument('--compare', metavar='REV', help="also measure main.py as of this git revision")
+    parser.add_argument('--sessions', type=int, default=10, help="measured sessions per script (after one warm-up)")
+    parser.add_argument('-o', '--output', help="write the results as JSON")
+    args = parser.parse_args(argv)
+
+    results = {}
+    if args.compare:
+        source = subprocess.run(['git', 'show', f"{args.compare}:main.py"], cwd=ROOT, check=True,
+                                capture_output=True, text=True).stdout
+        # Next to main.py, so the script imports the same modules and sees the same pages/.
+        with tempfile.NamedTemporaryFile('w', suffix='.py', prefix='.bench_main_', dir=ROOT, delete=False) as f:
+            f.write(source)
+        try:
+            results[args.compare] = benchmark(f.name, args.sessions)
+        finally:
+            os.remove(f.name)
+        print_summary(f"main.py at {args.compare}", results[args.compare])
+    results['current'] = benchmark(args.script, args.sessions)
+    print_summary(args.script, results['current'])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
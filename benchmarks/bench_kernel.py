@@ -0,0 +1,65 @@
+"""
+Parity check and latency benchmark: NumPy forest kernel vs scikit-learn.
+
+Usage:
+    python benchmarks/bench_kernel.py [--repeats 200]
+
+Fails with ParityError if the kernel's probabilities differ from
+`RandomForestClassifier.predict_proba` on `survey.csv` or on random rows.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from encoder import SURVEY_PATH, load_encoder
+from forest_kernel import ForestKernel, check_parity, parity_sample
+from model_registry import COLUMNS_PATH, MODEL_PATH
+
+BATCH_SIZES = (1, 16, 256, 10000)
+
+
+def time_call(fn, X, repeats):
+    fn(X)
+    samples = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        samples[i] = time.perf_counter() - start
+    return np.percentile(samples, [50, 99]) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeats', type=int, default=200, help="timed calls per batch size (fewer for 10k rows)")
+    args = parser.parse_args(argv)
+
+    model = joblib.load(MODEL_PATH)
+    feature_columns = list(joblib.load(COLUMNS_PATH))
+    if hasattr(model, 'feature_names_in_'):
+        del model.feature_names_in_
+    kernel = ForestKernel.from_model(model, feature_columns)
+
+    survey = pd.read_csv(SURVEY_PATH, dtype=str)
+    survey_X = load_encoder(feature_columns).encode_columns(survey, len(survey))
+    check_parity(kernel, model, survey_X)
+    check_parity(kernel, model, parity_sample(len(feature_columns), n_rows=10000))
+    print(f"Parity OK on {len(survey_X)} survey rows and 10000 random rows.\n")
+
+    print(f"{'batch':>6} | {'sklearn p50':>11} {'p99':>8} | {'kernel p50':>10} {'p99':>8} | {'speedup':>7}")
+    for size in BATCH_SIZES:
+        X = parity_sample(len(feature_columns), n_rows=size, seed=size)
+        repeats = max(5, args.repeats // max(1, size // 256))
+        sk_p50, sk_p99 = time_call(model.predict_proba, X, repeats)
+        k_p50, k_p99 = time_call(kernel.kernel_proba, X, repeats)
+        print(f"{size:>6} | {sk_p50:>9.3f}ms {sk_p99:>6.3f}ms | {k_p50:>8.3f}ms {k_p99:>6.3f}ms | {sk_p50 / k_p50:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
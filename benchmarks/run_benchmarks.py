@@ -0,0 +1,241 @@
+"""
+Benchmark and load-test suite for the prediction path and the Streamlit app.
+
+Usage:
+    python benchmarks/run_benchmarks.py -o results.json
+    python benchmarks/run_benchmarks.py --users 16 --sessions-per-user 3 -o results.json
+    python benchmarks/run_benchmarks.py --skip-load-test
+
+Measures cold start (import + model load, per engine, in fresh processes),
+single-prediction latency percentiles, batch throughput over rows sampled from
+`survey.csv`, what-if sweep cost and memory per loaded model. The load
+generator starts `streamlit run main.py` and drives N concurrent users through
+every form step over their own websocket connections (see bench_app.py), so
+they share one server process like real browsers do. Results are written as
+JSON so runs can be compared.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import numpy as np
+import pandas as pd
+
+from batch_scoring import score_frame
+from bench_app import APP_PATH, AppServer, BrowserSession
+from encoder import SURVEY_PATH
+from lookup_table import PredictionTable
+from model_registry import ENGINES, get_registry
+from prediction import build_report
+from what_if import run_sweep
+
+COLD_START_SCRIPT = """
+import json, resource, sys, time
+start = time.perf_counter()
+from model_registry import get_registry
+imported = time.perf_counter()
+rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+loaded = get_registry().get()
+done = time.perf_counter()
+print(json.dumps({
+    'import_seconds': imported - start,
+    'load_seconds': done - imported,
+    'total_seconds': done - start,
+    'model_bytes': loaded.memory_bytes,
+    'rss_delta_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before,
+}))
+"""
+
+
+def percentiles(samples_seconds):
+    samples = np.asarray(samples_seconds) * 1000
+    return {
+        'count': int(len(samples)),
+        'mean_ms': float(samples.mean()),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'p99_ms': float(np.percentile(samples, 99)),
+        'max_ms': float(samples.max()),
+    }
+
+
+def random_answers(rng):
+    answers = {'age': int(rng.integers(18, 101))}
+    for key in ('family_history', 'self_employed', 'remote_work', 'tech_company', 'benefits'):
+        answers[key] = "Yes" if rng.integers(2) else "No"
+    return answers
+
+
+def bench_cold_start(repeats):
+    """Import + model load in fresh interpreters, for every engine."""
+    results = {}
+    for engine in ENGINES:
+        runs = []
+        for _ in range(repeats):
+            env = dict(os.environ, MODEL_ENGINE=engine)
+            output = subprocess.run([sys.executable, '-c', COLD_START_SCRIPT], cwd=ROOT, env=env,
+                                    capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        results[engine] = {
+            'total': percentiles([run['total_seconds'] for run in runs]),
+            'import': percentiles([run['import_seconds'] for run in runs]),
+            'load': percentiles([run['load_seconds'] for run in runs]),
+            'model_bytes': runs[0]['model_bytes'],
+            'rss_delta_mb': float(np.median([run['rss_delta_kb'] for run in runs]) / 1024),
+        }
+    return results
+
+
+def bench_single_prediction(loaded, iterations, rng):
+    inputs = [random_answers(rng) for _ in range(iterations)]
+    table = PredictionTable.build(loaded.model, loaded.app_encoder)
+    results = {}
+    for name, predictor in (('model', loaded.model), ('lookup_table', table)):
+        build_report(predictor, loaded.app_encoder, inputs[0])
+        samples = []
+        for answers in inputs:
+            start = time.perf_counter()
+            build_report(predictor, loaded.app_encoder, answers)
+            samples.append(time.perf_counter() - start)
+        results[name] = percentiles(samples)
+    return results
+
+
+def bench_batch_throughput(loaded, rows, chunksize, seed):
+    survey = pd.read_csv(SURVEY_PATH, dtype=str)
+    sample = survey.sample(n=rows, replace=True, random_state=seed).reset_index(drop=True)
+    score_frame(sample.head(chunksize), loaded=loaded)
+    start = time.perf_counter()
+    for offset in range(0, rows, chunksize):
+        score_frame(sample.iloc[offset:offset + chunksize], loaded=loaded, start_row=offset)
+    elapsed = time.perf_counter() - start
+    return {'rows': rows, 'chunksize': chunksize, 'seconds': elapsed, 'rows_per_second': rows / elapsed}
+
+
+def bench_what_if(loaded, iterations, rng):
+    results = {}
+    for max_changes in (1, 2):
+        samples = []
+        for _ in range(iterations):
+            answers = random_answers(rng)
+            start = time.perf_counter()
+            run_sweep(loaded.model, loaded.app_encoder, answers, max_changes=max_changes)
+            samples.append(time.perf_counter() - start)
+        results[f'max_changes_{max_changes}'] = percentiles(samples)
+    return results
+
+
+def simulate_session(server, seed, timeout):
+    """One user on its own websocket: welcome page, every form step, report, a what-if change, new analysis."""
+    from websockets.sync.client import connect
+
+    rng = random.Random(seed)
+    timings = {}
+
+    with connect(f"ws://127.0.0.1:{server.port}/_stcore/stream", subprotocols=['streamlit'], max_size=None,
+                 open_timeout=timeout) as websocket:
+        session = BrowserSession(server, websocket, timeout=timeout)
+
+        def timed(label, *interaction):
+            timings.setdefault(label, []).append(session.interact(*interaction)['wall_ms'] / 1000)
+
+        timed('initial_load')
+        timed('begin', 'BEGIN ANALYSIS')
+        answers = [rng.randint(18, 100)] + [rng.choice(["Yes", "No"]) for _ in range(5)]
+        for step, answer in enumerate(answers):
+            # Every form step has one input labelled ' ' and ends with "Next >>" or "GENERATE REPORT".
+            timed('answer', ' ', answer)
+            timed('next_step', 'GENERATE REPORT' if step == len(answers) - 1 else 'Next >>')
+        if 'Select a Factor:' not in session.widgets:
+            raise RuntimeError("Simulated session did not reach the report dashboard.")
+        timed('what_if', 'Select a Factor:', 'benefits')
+        timed('new_analysis', 'RUN NEW ANALYSIS')
+    return timings
+
+
+def run_load_test(users, sessions_per_user, timeout):
+    """Run `users` concurrent simulated users against one app server, each completing `sessions_per_user` sessions."""
+    server = AppServer(APP_PATH)
+
+    def user(user_id):
+        return [simulate_session(server, user_id * 1000 + i, timeout) for i in range(sessions_per_user)]
+
+    try:
+        simulate_session(server, -1, timeout)  # warm-up: model load, caches, prediction table
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=users) as pool:
+            sessions = [session for result in pool.map(user, range(users)) for session in result]
+        elapsed = time.perf_counter() - start
+    finally:
+        server.close()
+
+    merged = {}
+    for session in sessions:
+        for label, samples in session.items():
+            merged.setdefault(label, []).extend(samples)
+    interactions = sum(len(samples) for samples in merged.values())
+    return {
+        'users': users,
+        'sessions': len(sessions),
+        'seconds': elapsed,
+        'interactions': interactions,
+        'interactions_per_second': interactions / elapsed,
+        'per_interaction': {label: percentiles(samples) for label, samples in merged.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-o', '--output', help="write JSON results here (default: stdout)")
+    parser.add_argument('--cold-start-repeats', type=int, default=3)
+    parser.add_argument('--iterations', type=int, default=500, help="single predictions and what-if sweeps to time")
+    parser.add_argument('--batch-rows', type=int, default=50000)
+    parser.add_argument('--chunksize', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=4, help="concurrent simulated app users")
+    parser.add_argument('--sessions-per-user', type=int, default=2)
+    parser.add_argument('--app-timeout', type=float, default=60.0, help="seconds allowed per app rerun")
+    parser.add_argument('--skip-load-test', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    loaded = get_registry().get()
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'engine': loaded.engine,
+            'model_version': loaded.version,
+        },
+        'cold_start': bench_cold_start(args.cold_start_repeats),
+        'memory': {'model_bytes': loaded.memory_bytes, 'engine': loaded.engine},
+        'single_prediction': bench_single_prediction(loaded, args.iterations, rng),
+        'batch_throughput': bench_batch_throughput(loaded, args.batch_rows, args.chunksize, args.seed),
+        'what_if': bench_what_if(loaded, max(1, args.iterations // 5), rng),
+    }
+    if not args.skip_load_test:
+        results['load_test'] = run_load_test(args.users, args.sessions_per_user, args.app_timeout)
+
+    payload = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(payload + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(payload)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,385 @@
+"""
+Smaller, faster forests derived from the shipped model.
+
+Usage:
+    python compress_forest.py                       # -> mental_health_rf_model.compact.forest
+    python compress_forest.py --specialize-app      # -> mental_health_rf_model.app.forest
+    python compress_forest.py --max-metric-drop 0.005 --report compression.json
+
+Each step is kept only while accuracy, recall and ROC-AUC on train.py's test
+20% of `survey.csv` stay within `max_metric_drop` of the original forest, and
+while at most `max_flip_rate` of the reference rows change their decision.
+The reference rows are the whole survey, or every app input for the app variant.
+
+Those test rows are only held out when the model came from `python train.py`:
+its `training_metrics.json` records the checksum of the forest it fitted on the
+other 80%. Any other model (including a pickle trained before train.py
+existed) may have seen them, so its metrics are reported as in-sample.
+
+1. Specialize (optional): the app leaves 18 of the 24 features at 0. Splits on
+   them are replaced by the branch 0 takes, which is exact for app input.
+2. Tree subsetting: trees are dropped one at a time, each time the tree whose
+   removal keeps the reference probabilities closest to the full forest.
+3. Node pruning: a subtree becomes a leaf when none of its leaves is more than
+   epsilon away from the subtree's own class fractions, so no probability moves
+   by more than epsilon. The largest epsilon in EPSILONS that fits the budget wins.
+4. Precision: thresholds are rounded down to float32, which leaves every float32
+   comparison `x <= threshold` unchanged. Leaf values are stored as float16 and
+   indices in the smallest integer type.
+
+The output is a regular `.forest` artifact, served with
+    MODEL_ENGINE=artifact MODEL_ARTIFACT=mental_health_rf_model.compact.forest streamlit run main.py
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, recall_score, roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from encoder import SURVEY_PATH, FeatureEncoder, app_answers, load_encoder
+from forest_artifact import ARRAY_DTYPES, BASE_DIR, LEAF, ForestArtifact, arrays_checksum, flatten_forest, save_artifact
+from forest_kernel import ForestKernel
+from lookup_table import all_inputs
+from prediction import DECISION_THRESHOLD
+from survey_store import SurveyStore
+
+COMPACT_PATH = os.path.join(BASE_DIR, 'mental_health_rf_model.compact.forest')
+APP_PATH = os.path.join(BASE_DIR, 'mental_health_rf_model.app.forest')
+
+DEFAULT_MAX_METRIC_DROP = 0.01
+DEFAULT_MAX_FLIP_RATE = 0.01
+EPSILONS = (0.01, 0.02, 0.05, 0.1, 0.15, 0.2, 0.25, 0.3)
+METRICS = ('accuracy', 'recall', 'roc_auc')
+# sklearn's TREE_UNDEFINED, the threshold stored at leaves.
+LEAF_THRESHOLD = -2.0
+
+
+class Budget:
+    """Decides whether a candidate forest is still close enough to the original one."""
+
+    def __init__(self, original, holdout, y, reference, max_metric_drop=DEFAULT_MAX_METRIC_DROP,
+                 max_flip_rate=DEFAULT_MAX_FLIP_RATE, threshold=DECISION_THRESHOLD):
+        self.holdout = holdout
+        self.y = y
+        self.reference = reference
+        self.max_metric_drop = max_metric_drop
+        self.max_flip_rate = max_flip_rate
+        self.threshold = threshold
+        kernel = ForestKernel(original)
+        self.baseline = self.scores(kernel.kernel_proba(holdout)[:, 1])
+        self.reference_decisions = kernel.kernel_proba(reference)[:, 1] > threshold
+
+    def scores(self, holdout_proba):
+        prediction = (holdout_proba > self.threshold).astype(int)
+        return {
+            'accuracy': accuracy_score(self.y, prediction),
+            'recall': recall_score(self.y, prediction),
+            'roc_auc': roc_auc_score(self.y, holdout_proba),
+        }
+
+    def flip_rate(self, reference_proba):
+        return float(np.mean((reference_proba > self.threshold) != self.reference_decisions))
+
+    def accepts(self, holdout_proba, reference_proba):
+        scores = self.scores(holdout_proba)
+        return (all(scores[name] >= self.baseline[name] - self.max_metric_drop for name in METRICS)
+                and self.flip_rate(reference_proba) <= self.max_flip_rate)
+
+    def accepts_forest(self, artifact):
+        kernel = ForestKernel(artifact)
+        return self.accepts(kernel.kernel_proba(self.holdout)[:, 1], kernel.kernel_proba(self.reference)[:, 1])
+
+    def summary(self, artifact):
+        kernel = ForestKernel(artifact)
+        scores = self.scores(kernel.kernel_proba(self.holdout)[:, 1])
+        return {
+            'trees': artifact.n_trees,
+            'nodes': artifact.n_nodes,
+            'metrics': scores,
+            'delta': {name: scores[name] - self.baseline[name] for name in METRICS},
+            'flip_rate': self.flip_rate(kernel.kernel_proba(self.reference)[:, 1]),
+        }
+
+
+# --- Forest surgery ---
+
+def _recompute_internal(arrays):
+    """Cover and class fractions of every internal node from its children, which come after it."""
+    left, right, value, cover = arrays['left'], arrays['right'], arrays['value'], arrays['cover']
+    for node in np.flatnonzero(left != LEAF)[::-1]:
+        l, r = left[node], right[node]
+        cover[node] = cover[l] + cover[r]
+        value[node] = (cover[l] * value[l] + cover[r] * value[r]) / cover[node]
+
+
+def rebuild_forest(artifact, trees=None, collapse=None, fixed=None, metadata=None):
+    """
+    Copy the trees numbered `trees` (default all) into fresh preorder arrays.
+    Nodes where `collapse` is True become leaves, and splits on a feature in
+    `fixed` (feature index -> constant) are replaced by the branch the constant takes.
+    """
+    feature, threshold, left, right = artifact.feature, artifact.threshold, artifact.left, artifact.right
+    fixed = {feature_index: np.float32(constant) for feature_index, constant in (fixed or {}).items()}
+    trees = range(artifact.n_trees) if trees is None else trees
+    roots, old_nodes, new_left, new_right, is_leaf = [], [], [], [], []
+    for tree in trees:
+        roots.append(len(old_nodes))
+        stack = [(int(artifact.roots[tree]), -1, False)]
+        while stack:
+            node, parent, is_right = stack.pop()
+            # Compared as float32 against the threshold, like the kernel does.
+            while feature[node] in fixed:
+                node = int(left[node] if fixed[feature[node]] <= threshold[node] else right[node])
+            index = len(old_nodes)
+            if parent >= 0:
+                (new_right if is_right else new_left)[parent] = index
+            leaf = feature[node] == LEAF or (collapse is not None and collapse[node])
+            old_nodes.append(node)
+            new_left.append(LEAF)
+            new_right.append(LEAF)
+            is_leaf.append(leaf)
+            if not leaf:
+                stack.append((int(right[node]), index, True))
+                stack.append((int(left[node]), index, False))
+
+    old_nodes = np.array(old_nodes, dtype=np.intp)
+    is_leaf = np.array(is_leaf, dtype=bool)
+    arrays = {
+        'roots': np.array(roots),
+        'feature': np.where(is_leaf, LEAF, feature[old_nodes]),
+        'threshold': np.where(is_leaf, LEAF_THRESHOLD, threshold[old_nodes]),
+        'left': np.array(new_left),
+        'right': np.array(new_right),
+        'value': np.array(artifact.value[old_nodes], dtype=np.float64),
+        'cover': np.array(artifact.cover[old_nodes], dtype=np.float64),
+    }
+    if fixed:
+        # Folded nodes no longer see the branches they skip; TreeSHAP needs consistent covers.
+        _recompute_internal(arrays)
+    arrays = {name: np.ascontiguousarray(array, dtype=ARRAY_DTYPES[name]) for name, array in arrays.items()}
+    return ForestArtifact(arrays, artifact.feature_columns, artifact.classes,
+                          metadata=artifact.metadata if metadata is None else metadata)
+
+
+def leaf_spread(artifact):
+    """For every node, the largest gap between its class fractions and those of any leaf below it."""
+    left, right, value = artifact.left, artifact.right, np.asarray(artifact.value, dtype=np.float64)
+    low, high = value.copy(), value.copy()
+    for node in np.flatnonzero(left != LEAF)[::-1]:
+        low[node] = np.minimum(low[left[node]], low[right[node]])
+        high[node] = np.maximum(high[left[node]], high[right[node]])
+    return np.maximum(high - value, value - low).max(axis=1)
+
+
+def reduce_precision(artifact, value_dtype=np.float16):
+    """The same forest in the smallest dtypes; only `value_dtype` loses information."""
+    threshold = artifact.threshold.astype(np.float32)
+    # For float32 x, x <= t holds exactly when x <= the largest float32 not above t.
+    rounded_up = threshold > artifact.threshold
+    threshold[rounded_up] = np.nextafter(threshold[rounded_up], np.float32(-np.inf))
+    index_dtype = np.int16 if artifact.n_nodes <= np.iinfo(np.int16).max else np.int32
+    feature_dtype = np.int8 if len(artifact.feature_columns) <= np.iinfo(np.int8).max else np.int16
+    arrays = {
+        'roots': artifact.roots.astype(index_dtype),
+        'feature': artifact.feature.astype(feature_dtype),
+        'threshold': threshold,
+        'left': artifact.left.astype(index_dtype),
+        'right': artifact.right.astype(index_dtype),
+        'value': artifact.value.astype(value_dtype),
+        'cover': artifact.cover.astype(np.float32),
+    }
+    return ForestArtifact(arrays, artifact.feature_columns, artifact.classes, metadata=artifact.metadata)
+
+
+def per_tree_proba(artifact, X):
+    """Positive-class probability of every tree, shape (n_trees, n_rows)."""
+    return np.asarray(artifact.value, dtype=np.float64)[ForestKernel(artifact).apply(X), 1]
+
+
+def select_trees(artifact, budget):
+    """Drop trees greedily while the budget holds; returns the tree numbers kept."""
+    holdout = per_tree_proba(artifact, budget.holdout)
+    reference = per_tree_proba(artifact, budget.reference)
+    target = reference.mean(axis=0)
+    kept = list(range(artifact.n_trees))
+    while len(kept) > 1:
+        without = (reference[kept].sum(axis=0) - reference[kept]) / (len(kept) - 1)
+        best = int(np.argmin(((without - target) ** 2).mean(axis=1)))
+        candidate = kept[:best] + kept[best + 1:]
+        if not budget.accepts(holdout[candidate].mean(axis=0), reference[candidate].mean(axis=0)):
+            break
+        kept = candidate
+    return kept
+
+
+# --- Pipeline ---
+
+def compress(artifact, budget, fixed=None):
+    """Run the compression steps; returns the derived artifact and one summary per step."""
+    steps = [{'step': 'original', **budget.summary(artifact)}]
+    if fixed:
+        names = [artifact.feature_columns[index] for index in sorted(fixed)]
+        artifact = rebuild_forest(artifact, fixed=fixed, metadata={**artifact.metadata, 'fixed_features': names})
+        steps.append({'step': 'specialize', **budget.summary(artifact)})
+
+    artifact = rebuild_forest(artifact, trees=select_trees(artifact, budget))
+    steps.append({'step': 'subset_trees', **budget.summary(artifact)})
+
+    spread = leaf_spread(artifact)
+    epsilon = 0.0
+    for candidate_epsilon in EPSILONS:
+        candidate = rebuild_forest(artifact, collapse=spread <= candidate_epsilon)
+        if not budget.accepts_forest(candidate):
+            break
+        pruned, epsilon = candidate, candidate_epsilon
+    if epsilon:
+        artifact = pruned
+    steps.append({'step': 'prune_nodes', 'epsilon': epsilon, **budget.summary(artifact)})
+
+    compact = reduce_precision(artifact, np.float16)
+    if not budget.accepts_forest(compact):
+        compact = reduce_precision(artifact, np.float32)
+    steps.append({'step': 'reduce_precision', 'value_dtype': compact.value.dtype.name, **budget.summary(compact)})
+
+    compact.metadata.update({
+        'prune_epsilon': epsilon,
+        'max_metric_drop': budget.max_metric_drop,
+        'max_flip_rate': budget.max_flip_rate,
+    })
+    return compact, steps
+
+
+def latency_ms(artifact, X, repeats=50):
+    """Median kernel_proba time in milliseconds."""
+    kernel = ForestKernel(artifact)
+    kernel.kernel_proba(X)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        kernel.kernel_proba(X)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000
+
+
+def survey_features(encoder, survey_path=SURVEY_PATH):
+    """Every survey row encoded from its raw answers, exactly as batch_scoring.py encodes them."""
+    if os.path.isdir(survey_path):
+        return np.asarray(SurveyStore(survey_path).features(encoder), dtype=np.float64)
+    raw = pd.read_csv(survey_path, dtype=str)
+    return encoder.encode_columns(raw, len(raw))
+
+
+def evaluation_split(model_path, original, n_test_rows):
+    """
+    'held-out' when training_metrics.json next to the model shows that train.py fitted this exact forest on
+    the other rows of this survey, otherwise 'in-sample'.
+    """
+    metrics_path = os.path.join(os.path.dirname(os.path.abspath(model_path)), 'training_metrics.json')
+    try:
+        with open(metrics_path) as f:
+            training = json.load(f)
+    except (OSError, ValueError):
+        return 'in-sample'
+    fitted_here = (training.get('forest_sha256') == arrays_checksum(original.arrays)
+                   and training.get('test_rows') == n_test_rows)
+    return 'held-out' if fitted_here else 'in-sample'
+
+
+def load_evaluation_data(feature_columns, survey_path=SURVEY_PATH, specialize_app=False):
+    """(test rows, labels, reference rows, fixed features) encoded the way the target consumer encodes them."""
+    from train import RANDOM_STATE, TARGET, clean_survey, load_survey
+
+    # Cleaning only supplies the labels and train.py's split: production never sees cleaned answers.
+    survey, _ = clean_survey(load_survey(survey_path))
+    y = (survey[TARGET] == 'Yes').astype(int).to_numpy()
+    _, test_index = train_test_split(np.arange(len(survey)), test_size=0.2, random_state=RANDOM_STATE, stratify=y)
+    if not specialize_app:
+        rows = survey_features(load_encoder(feature_columns), survey_path)
+        return rows[test_index], y[test_index], rows, None
+
+    app_encoder = FeatureEncoder.for_app(feature_columns)
+    rows = app_encoder.encode_columns(app_answers(survey), len(survey))
+    used = {field.index for field in app_encoder.fields}
+    fixed = {index: 0.0 for index in range(len(feature_columns)) if index not in used}
+    return rows[test_index], y[test_index], app_encoder.encode_many(all_inputs()), fixed
+
+
+def main(argv=None):
+    import joblib
+    from model_registry import COLUMNS_PATH, MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Derive a smaller, faster forest from the trained model.")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--columns', default=COLUMNS_PATH)
+    parser.add_argument('--survey', default=SURVEY_PATH)
+    parser.add_argument('--specialize-app', action='store_true', help="fold away the features the app leaves at 0")
+    parser.add_argument('--max-metric-drop', type=float, default=DEFAULT_MAX_METRIC_DROP,
+                        help="largest allowed drop in accuracy, recall or ROC-AUC on train.py's test rows "
+                             "(in-sample unless the model came from train.py)")
+    parser.add_argument('--max-flip-rate', type=float, default=DEFAULT_MAX_FLIP_RATE,
+                        help="largest allowed fraction of reference rows whose decision changes")
+    parser.add_argument('-o', '--output', help="artifact path (default depends on the variant)")
+    parser.add_argument('--report', help="write the size/latency/metrics report as JSON")
+    args = parser.parse_args(argv)
+
+    model = joblib.load(args.model)
+    feature_columns = list(joblib.load(args.columns))
+    original = flatten_forest(model, feature_columns)
+    original.metadata['source'] = os.path.basename(args.model)
+    holdout, y, reference, fixed = load_evaluation_data(feature_columns, args.survey, args.specialize_app)
+    budget = Budget(original, holdout, y, reference, args.max_metric_drop, args.max_flip_rate)
+    split = evaluation_split(args.model, original, len(y))
+    if split == 'in-sample':
+        print(f"Warning: {args.model} was not fitted by train.py on the other 80% of {args.survey}, so the metrics "
+              f"below are in-sample and overstate accuracy. Run `python train.py` first for held-out numbers.")
+
+    start = time.perf_counter()
+    compact, steps = compress(original, budget, fixed)
+    elapsed = time.perf_counter() - start
+    output = args.output or (APP_PATH if args.specialize_app else COMPACT_PATH)
+    save_artifact(compact, output)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        original_bytes = os.path.getsize(save_artifact(original, os.path.join(tmp, 'original.forest')))
+    batch = reference[:256]
+    report = {
+        'variant': 'app' if args.specialize_app else 'general',
+        'evaluation': split,
+        'output': output,
+        'seconds': elapsed,
+        'steps': steps,
+        'size_bytes': {
+            'pickle': os.path.getsize(args.model),
+            'original_forest': original_bytes,
+            'compressed_forest': os.path.getsize(output),
+        },
+        'latency_ms': {
+            'original_1_row': latency_ms(original, batch[:1]),
+            'compressed_1_row': latency_ms(compact, batch[:1]),
+            f'original_{len(batch)}_rows': latency_ms(original, batch),
+            f'compressed_{len(batch)}_rows': latency_ms(compact, batch),
+        },
+    }
+
+    print(f"Metrics on train.py's test rows ({split}):")
+    print(f"{'step':<17} {'trees':>5} {'nodes':>6} {'accuracy':>9} {'recall':>7} {'roc_auc':>8} {'flips':>6}")
+    for step in steps:
+        scores = step['metrics']
+        print(f"{step['step']:<17} {step['trees']:>5} {step['nodes']:>6} {scores['accuracy']:>9.4f} "
+              f"{scores['recall']:>7.4f} {scores['roc_auc']:>8.4f} {step['flip_rate']:>6.2%}")
+    sizes = report['size_bytes']
+    print(f"Size: pickle {sizes['pickle'] / 1024:.0f} KiB, forest {sizes['original_forest'] / 1024:.0f} KiB "
+          f"-> {sizes['compressed_forest'] / 1024:.0f} KiB ({output})")
+    print("Latency ms: " + ", ".join(f"{name} {value:.3f}" for name, value in report['latency_ms'].items()))
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,401 @@
+"""
+Streaming data and prediction drift monitor.
+
+Every scored row updates constant-memory sketches: bin counts for each
+monitored feature and a 100-bin histogram of the predicted probability. They
+are kept in a sliding window of time buckets (one hour by default), so memory
+does not grow with traffic and no answers are stored, only counts. The window
+is compared with the same sketches of the training survey (`survey.csv`,
+encoded the way the source encodes its input and scored by the current model):
+
+    PSI  sum((p - q) * ln(p / q)) over bins          alert above 0.2
+    KS   max |P(x <= b) - Q(x <= b)| over bin edges  alert above 0.1 (ordered features and probability)
+
+Feature bins are the training deciles for numeric columns and one bin per
+training value, plus one for values never seen in training, for categorical
+codes. The window is checked at most every CHECK_INTERVAL_SECONDS as rows
+arrive. Alerts are logged (logger 'drift') when a score crosses its threshold
+and again when it recovers, and counted in `drift_alerts_total`. The last
+check's scores, window size and probability quantiles are exported as
+Prometheus gauges; a scrape only reads them.
+
+Sources are monitored separately, because the app and the service only fill
+the form's six features while batch scoring encodes full survey rows:
+
+    get_monitor('app' | 'service' | 'batch')
+
+Scoring the baseline reads and predicts the whole survey, so request paths do
+not wait for it: the first call for a model version starts the build on a
+background thread and returns None (rows are not monitored) until it is done.
+Offline callers pass `wait=True`.
+
+    DRIFT_MONITOR=0              disable monitoring
+    DRIFT_WINDOW_SECONDS=3600    sliding window length
+
+Usage (replay survey.csv as batch traffic, then a shifted copy, printing the drift report after each):
+    python drift_monitor.py
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from encoder import SURVEY_PATH, app_answers
+
+logger = logging.getLogger('drift')
+
+ENABLED = os.environ.get('DRIFT_MONITOR', '1') != '0'
+WINDOW_SECONDS = float(os.environ.get('DRIFT_WINDOW_SECONDS', 3600))
+SOURCES = ('app', 'service', 'batch')
+
+WINDOW_BUCKETS = 12
+MAX_CATEGORIES = 32
+N_QUANTILES = 10
+PROBABILITY_BINS = 100
+PSI_ALERT = 0.2
+KS_ALERT = 0.1
+MIN_SAMPLES = 200
+CHECK_INTERVAL_SECONDS = 5.0
+REPORTED_QUANTILES = (0.1, 0.5, 0.9)
+
+
+# --- Sketches ---
+
+class _Binning:
+    """Maps one encoded column onto a fixed set of bins derived from its training values."""
+
+    def __init__(self, baseline_values, edges=None):
+        distinct = np.unique(baseline_values)
+        self.ordered = edges is not None or len(distinct) > MAX_CATEGORIES
+        if self.ordered:
+            if edges is None:
+                edges = np.unique(np.quantile(baseline_values, np.linspace(0, 1, N_QUANTILES + 1)[1:-1]))
+            self.edges = np.asarray(edges, dtype=np.float64)
+            self.n_bins = len(self.edges) + 1
+        else:
+            self.values = distinct
+            self.n_bins = len(distinct) + 1  # the last bin holds values never seen in training
+
+    def bins(self, values):
+        if self.ordered:
+            return np.searchsorted(self.edges, values, side='right')
+        index = np.searchsorted(self.values, values)
+        seen = self.values[np.minimum(index, len(self.values) - 1)] == values
+        return np.where(seen, index, len(self.values))
+
+
+def psi(actual, expected):
+    """Population stability index of two count vectors, with half-count smoothing for empty bins."""
+    p = (actual + 0.5) / (actual.sum() + 0.5 * len(actual))
+    q = (expected + 0.5) / (expected.sum() + 0.5 * len(expected))
+    return float(np.sum((p - q) * np.log(p / q)))
+
+
+def binned_ks(actual, expected):
+    """Kolmogorov-Smirnov distance of two count vectors over ordered bins."""
+    return float(np.max(np.abs(np.cumsum(actual) / actual.sum() - np.cumsum(expected) / expected.sum())))
+
+
+def histogram_quantile(counts, q):
+    """Quantile of a probability histogram over equal-width bins of [0, 1], interpolated within the bin."""
+    cumulative = np.cumsum(counts)
+    target = q * cumulative[-1]
+    index = min(int(np.searchsorted(cumulative, target)), len(counts) - 1)
+    below = cumulative[index - 1] if index else 0.0
+    fraction = (target - below) / counts[index] if counts[index] else 0.0
+    return float((index + fraction) / len(counts))
+
+
+# --- Monitor ---
+
+class DriftMonitor:
+    """Sliding-window sketches of one traffic source compared with its training baseline."""
+
+    def __init__(self, source, feature_columns, baseline, baseline_probability, indices=None, model_version=None,
+                 window_seconds=WINDOW_SECONDS, n_buckets=WINDOW_BUCKETS, psi_alert=PSI_ALERT, ks_alert=KS_ALERT,
+                 min_samples=MIN_SAMPLES, clock=time.time):
+        """`baseline` holds encoded training rows in the model layout; `indices` picks the monitored columns (default all)."""
+        self.source = source
+        self.model_version = model_version
+        self.indices = list(range(len(feature_columns))) if indices is None else list(indices)
+        self.names = [feature_columns[i] for i in self.indices] + ['probability']
+        baseline = np.asarray(baseline, dtype=np.float64)
+        probability_edges = np.arange(1, PROBABILITY_BINS) / PROBABILITY_BINS
+        self.binnings = [_Binning(baseline[:, i]) for i in self.indices]
+        self.binnings.append(_Binning(baseline_probability, edges=probability_edges))
+        self.offsets = np.cumsum([0] + [binning.n_bins for binning in self.binnings])
+        self.psi_alert = psi_alert
+        self.ks_alert = ks_alert
+        self.min_samples = min_samples
+        self.clock = clock
+        self.bucket_seconds = window_seconds / n_buckets
+        self.expected, _ = self.counts(baseline, baseline_probability)
+        self._buckets = np.zeros((n_buckets, self.offsets[-1]))
+        self._rows = np.zeros(n_buckets)
+        self._slot = None
+        self._alerting = set()
+        self._alert_counts = {}
+        self._last_check = 0.0
+        self._last_result = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_survey(cls, source, loaded, path=SURVEY_PATH, **kwargs):
+        """Baseline from the training survey, encoded as `source` encodes its input and scored by `loaded.model`."""
+        survey = pd.read_csv(path, dtype=str)
+        if source == 'batch':
+            encoder = loaded.encoder
+            rows = encoder.encode_columns(survey, len(survey))
+        else:
+            encoder = loaded.app_encoder
+            rows = encoder.encode_columns(app_answers(survey), len(survey))
+        probability = loaded.model.predict_proba(rows)[:, 1]
+        indices = sorted(field.index for field in encoder.fields)
+        return cls(source, loaded.feature_columns, rows, probability, indices, loaded.version, **kwargs)
+
+    def counts(self, rows, probability):
+        """Bin counts and row count of a batch of encoded rows; mergeable, so worker processes can send them back."""
+        rows = np.atleast_2d(rows)
+        probability = np.asarray(probability, dtype=np.float64).ravel()
+        flat = [binning.bins(rows[:, i]) + offset for i, binning, offset in zip(self.indices, self.binnings, self.offsets)]
+        flat.append(self.binnings[-1].bins(probability) + self.offsets[-2])
+        return np.bincount(np.concatenate(flat), minlength=self.offsets[-1]).astype(np.float64), len(probability)
+
+    def observe(self, rows, probability):
+        """Add encoded rows (model layout) and their predicted probabilities to the window."""
+        self.add_counts(*self.counts(rows, probability))
+
+    def add_counts(self, counts, n_rows):
+        now = self.clock()
+        with self._lock:
+            slot = self._advance(now)
+            self._buckets[slot % len(self._buckets)] += counts
+            self._rows[slot % len(self._rows)] += n_rows
+            due = now - self._last_check >= CHECK_INTERVAL_SECONDS
+        if due:
+            self.check()
+
+    def _advance(self, now):
+        """Clear the buckets that fell out of the window; returns the current slot."""
+        slot = int(now // self.bucket_seconds)
+        if self._slot is None:
+            self._slot = slot
+        for stale in range(self._slot + 1, min(slot, self._slot + len(self._buckets)) + 1):
+            self._buckets[stale % len(self._buckets)] = 0
+            self._rows[stale % len(self._rows)] = 0
+        self._slot = max(self._slot, slot)
+        return slot
+
+    # --- Scores and alerts ---
+
+    def window(self):
+        """Summed counts and row count of the current window."""
+        with self._lock:
+            self._advance(self.clock())
+            return self._buckets.sum(axis=0), float(self._rows.sum())
+
+    def scores(self):
+        """{feature: {'psi', 'ks'}} for the current window ('ks' only for ordered features); empty when the window is."""
+        counts, n_rows = self.window()
+        if not n_rows:
+            return {}
+        scores = {}
+        for name, binning, start, stop in zip(self.names, self.binnings, self.offsets[:-1], self.offsets[1:]):
+            actual, expected = counts[start:stop], self.expected[start:stop]
+            if name == 'probability':
+                # PSI over ten equal-width score bands; the fine bins are for KS and quantiles.
+                groups = PROBABILITY_BINS // 10
+                scores[name] = {'psi': psi(actual.reshape(10, groups).sum(axis=1), expected.reshape(10, groups).sum(axis=1))}
+            else:
+                scores[name] = {'psi': psi(actual, expected)}
+            if binning.ordered:
+                scores[name]['ks'] = binned_ks(actual, expected)
+        return scores
+
+    def probability_quantiles(self, baseline=False):
+        counts = (self.expected if baseline else self.window()[0])[self.offsets[-2]:]
+        if not counts.sum():
+            return {}
+        return {q: histogram_quantile(counts, q) for q in REPORTED_QUANTILES}
+
+    def check(self):
+        """Compare the window with the baseline, log threshold crossings and return the scores."""
+        _, n_rows = self.window()
+        scores = self.scores()
+        quantiles = self.probability_quantiles()
+        with self._lock:
+            self._last_check = self.clock()
+            self._last_result = {'checked_at': self._last_check, 'window_rows': int(n_rows), 'scores': scores,
+                                 'probability_quantiles': quantiles}
+            if n_rows < self.min_samples:
+                return scores
+            for name, values in scores.items():
+                for score, value in values.items():
+                    key = (name, score)
+                    limit = self.psi_alert if score == 'psi' else self.ks_alert
+                    if value > limit and key not in self._alerting:
+                        self._alerting.add(key)
+                        self._alert_counts[key] = self._alert_counts.get(key, 0) + 1
+                        logger.warning("Drift alert: source=%s feature=%s %s=%.3f (threshold %.2f) over %d rows",
+                                       self.source, name, score, value, limit, n_rows)
+                    elif value <= limit and key in self._alerting:
+                        self._alerting.discard(key)
+                        logger.info("Drift recovered: source=%s feature=%s %s=%.3f over %d rows",
+                                    self.source, name, score, value, n_rows)
+        return scores
+
+    @property
+    def last_check(self):
+        """{checked_at, window_rows, scores, probability_quantiles} of the latest check, or None before the first."""
+        return self._last_result
+
+    @property
+    def alert_counts(self):
+        """{(feature, score): alerts raised} since the monitor was built."""
+        return dict(self._alert_counts)
+
+    @property
+    def alerts(self):
+        """(feature, score) pairs currently above their threshold."""
+        return sorted(self._alerting)
+
+    def report(self):
+        scores = self.check()
+        _, n_rows = self.window()
+        return {
+            'source': self.source,
+            'model_version': self.model_version,
+            'window_rows': int(n_rows),
+            'scores': scores,
+            'probability_quantiles': self.probability_quantiles(),
+            'baseline_probability_quantiles': self.probability_quantiles(baseline=True),
+            'alerts': self.alerts,
+        }
+
+
+def prometheus_text(monitors=None):
+    """
+    Exposition text for several monitors (default: every process-wide one), with one TYPE line per family.
+    Exports each monitor's last check as it stands, so scraping never runs a check or raises an alert.
+    """
+    monitors = list(_monitors.values()) if monitors is None else list(monitors)
+    reports = [(monitor, monitor.last_check) for monitor in monitors]
+    reports = [(monitor, report) for monitor, report in reports if report is not None]
+    lines = ["# TYPE drift_check_timestamp_seconds gauge"]
+    lines.extend(f'drift_check_timestamp_seconds{{source="{monitor.source}"}} {report["checked_at"]!r}'
+                 for monitor, report in reports)
+    lines.append("# TYPE drift_window_rows gauge")
+    lines.extend(f'drift_window_rows{{source="{monitor.source}"}} {report["window_rows"]}' for monitor, report in reports)
+    for score in ('psi', 'ks'):
+        lines.append(f"# TYPE drift_{score} gauge")
+        for monitor, report in reports:
+            lines.extend(f'drift_{score}{{source="{monitor.source}",feature="{name}"}} {values[score]!r}'
+                         for name, values in report['scores'].items() if score in values)
+    lines.append("# TYPE drift_probability_quantile gauge")
+    for monitor, report in reports:
+        lines.extend(f'drift_probability_quantile{{source="{monitor.source}",quantile="{q}"}} {value!r}'
+                     for q, value in report['probability_quantiles'].items())
+    lines.append("# TYPE drift_alerts_total counter")
+    for monitor, _ in reports:
+        lines.extend(f'drift_alerts_total{{source="{monitor.source}",feature="{name}",score="{score}"}} {count}'
+                     for (name, score), count in sorted(monitor.alert_counts.items()))
+    return "\n".join(lines) + "\n"
+
+
+# --- Process-wide monitors ---
+
+_monitors = {}
+_builds = {}  # (source, model version) -> thread building that baseline
+_wanted = {}  # source -> model version of the latest get_monitor call
+_monitors_lock = threading.Lock()
+
+
+def _build_monitor(source, loaded):
+    try:
+        monitor = DriftMonitor.from_survey(source, loaded)
+    except Exception:
+        logger.exception("Could not build the drift baseline for source=%s model=%s", source, loaded.version)
+        return
+    with _monitors_lock:
+        # A slow build for a model that has since been replaced must not overwrite the newer monitor.
+        if _wanted.get(source) == loaded.version:
+            _monitors[source] = monitor
+
+
+def get_monitor(source, loaded=None, wait=False):
+    """
+    The process-wide monitor for `source` and `loaded`'s model version (default: the registry's current one).
+    None when DRIFT_MONITOR=0, or while the baseline for that version is built in the background, unless `wait`.
+    """
+    if not ENABLED:
+        return None
+    if source not in SOURCES:
+        raise ValueError(f"Unknown drift source {source!r}; expected one of {', '.join(SOURCES)}.")
+    if loaded is None:
+        from model_registry import get_registry
+        loaded = get_registry().get()
+    monitor = _monitors.get(source)
+    if monitor is not None and monitor.model_version == loaded.version:
+        return monitor
+    key = (source, loaded.version)
+    with _monitors_lock:
+        _wanted[source] = loaded.version
+        for stale in [other for other in _builds if other[0] == source and other != key]:
+            del _builds[stale]  # switching back to an earlier version builds it again
+        build = _builds.get(key)
+        if build is None:
+            build = _builds[key] = threading.Thread(target=_build_monitor, args=(source, loaded),
+                                                    name=f"drift-baseline-{source}", daemon=True)
+            build.start()
+    if not wait:
+        return None
+    build.join()
+    monitor = _monitors.get(source)
+    return monitor if monitor is not None and monitor.model_version == loaded.version else None
+
+
+def print_report(report, file=None, alerts_only=False):
+    quantiles = ', '.join(f"p{int(q * 100)} {value:.3f}" for q, value in report['probability_quantiles'].items())
+    print(f"Drift ({report['source']}): {report['window_rows']} rows in window, probability {quantiles or 'n/a'}", file=file)
+    alerting = {name for name, _ in report['alerts']}
+    for name, values in report['scores'].items():
+        if alerts_only and name not in alerting:
+            continue
+        flags = ' '.join(f"{score.upper()} {value:.3f}{' ALERT' if (name, score) in report['alerts'] else ''}"
+                         for score, value in values.items())
+        print(f"    {name:<28} {flags}", file=file)
+
+
+def main(argv=None):
+    from model_registry import get_registry
+
+    parser = argparse.ArgumentParser(description="Replay the training survey through a drift monitor.")
+    parser.add_argument('--survey', default=SURVEY_PATH)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(message)s')
+
+    loaded = get_registry().get()
+    monitor = DriftMonitor.from_survey('batch', loaded, args.survey)
+    survey = pd.read_csv(args.survey, dtype=str)
+    rows = loaded.encoder.encode_columns(survey, len(survey))
+    start = time.perf_counter()
+    monitor.observe(rows, loaded.model.predict_proba(rows)[:, 1])
+    print(f"Replayed {len(survey)} training rows, sketched in {(time.perf_counter() - start) * 1000:.1f} ms")
+    print_report(monitor.report())
+
+    # An older, more remote workforce that mostly reports a family history.
+    shifted = survey.assign(Age=(pd.to_numeric(survey['Age'], errors='coerce') + 12).astype(str),
+                            family_history='Yes', remote_work='Yes')
+    monitor = DriftMonitor.from_survey('batch', loaded, args.survey)
+    rows = loaded.encoder.encode_columns(shifted, len(shifted))
+    monitor.observe(rows, loaded.model.predict_proba(rows)[:, 1])
+    print("\nShifted copy:")
+    print_report(monitor.report())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""
+Compiled feature encoder: raw answers straight to the model's float layout.
+
+A FeatureEncoder is built once from `feature_columns` with the column index and
+category map of every input field precomputed, and encodes one answer dict into
+a preallocated row or many rows into a 2-D block without touching pandas.
+
+Usage (regenerate `feature_encoder.pkl` from `survey.csv`):
+    python encoder.py
+"""
+import os
+
+import joblib
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ENCODER_PATH = os.path.join(BASE_DIR, 'feature_encoder.pkl')
+SURVEY_PATH = os.path.join(BASE_DIR, 'survey.csv')
+
+MISSING_VALUE = 'Unknown'
+NUMERIC_COLUMNS = ('Age',)
+NON_FEATURE_COLUMNS = ('Timestamp', 'treatment', 'comments')
+
+# The app's form answers: `age` plus Yes/No questions encoded as 1/0.
+APP_FIELDS = {
+    'age': 'Age',
+    'self_employed': 'self_employed',
+    'family_history': 'family_history',
+    'remote_work': 'remote_work',
+    'tech_company': 'tech_company',
+    'benefits': 'benefits',
+}
+APP_YES_NO = {'No': 0, 'Yes': 1}
+
+
+class EncoderField:
+    """
+    How one raw input field maps onto one model column.
+
+    Categorical fields may carry `aliases` (normalized raw answer -> category,
+    with `alias_default` for anything unlisted), and numeric fields a
+    `valid_range` outside of which the value is replaced by `default`.
+    With `reject_unknown`, an answer outside `categories` raises ValueError
+    instead of encoding as `default`; missing answers still encode as `default`.
+    """
+
+    # Class-level defaults keep encoders pickled before these options existed loadable.
+    aliases = None
+    alias_default = None
+    valid_range = None
+    reject_unknown = False
+
+    def __init__(self, name, index, categories=None, default=0.0, aliases=None, alias_default=None, valid_range=None,
+                 reject_unknown=False):
+        self.name = name
+        self.index = index
+        self.categories = categories  # None for numeric fields
+        self.default = default
+        self.aliases = aliases
+        self.alias_default = alias_default
+        self.valid_range = valid_range
+        self.reject_unknown = reject_unknown
+
+    def canonical(self, value):
+        if self.aliases is None:
+            return value
+        alias = self.aliases.get(str(value).strip().lower(), self.alias_default)
+        return value if alias is None else alias
+
+    def numeric(self, value):
+        if self.valid_range is not None and not self.valid_range[0] <= value <= self.valid_range[1]:
+            return self.default
+        return value
+
+    def code(self, value):
+        """Category code of one canonical answer (MISSING_VALUE for a missing one)."""
+        code = self.categories.get(value)
+        if code is not None:
+            return code
+        if self.reject_unknown and value != MISSING_VALUE:
+            raise ValueError(f"Unknown answer {value!r} for '{self.name}'; expected one of {', '.join(self.categories)}.")
+        return self.default
+
+
+def _parse_numeric(values, default):
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        parsed = np.empty(len(values))
+        for i, value in enumerate(values):
+            try:
+                parsed[i] = float(value)
+            except (TypeError, ValueError):
+                parsed[i] = default
+        return parsed
+
+
+def _parse_number(value, default):
+    """One value as a float, or `default` when it is missing or not a number (like `_parse_numeric`)."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return default
+    return default if value != value else value
+
+
+def _is_missing(value):
+    """None or NaN, the two ways a missing answer reaches the encoder."""
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def _fill_missing(values):
+    values = np.array(values, dtype=object)
+    # `v != v` is how NaN identifies itself inside an object array.
+    missing = np.equal(values, None) | (values != values)
+    values[missing] = MISSING_VALUE
+    return values
+
+
+class FeatureEncoder:
+    """Encodes raw answers into rows ordered like `feature_columns`."""
+
+    def __init__(self, feature_columns, fields):
+        self.feature_columns = list(feature_columns)
+        self.fields = list(fields)
+        self._template = np.zeros(len(self.feature_columns), dtype=np.float64)
+
+    @classmethod
+    def for_app(cls, feature_columns):
+        """
+        Encoder for the Streamlit form's answers; unanswered columns stay 0.
+        A Yes/No answer other than 'Yes' or 'No' raises ValueError, since the form cannot give one.
+        """
+        fields = []
+        for name, column in APP_FIELDS.items():
+            if column not in feature_columns:
+                continue
+            categories = None if column in NUMERIC_COLUMNS else APP_YES_NO
+            fields.append(EncoderField(name, feature_columns.index(column), categories, 0.0,
+                                       reject_unknown=categories is not None))
+        return cls(feature_columns, fields)
+
+    @classmethod
+    def for_survey(cls, feature_columns, category_maps, aliases=None, numeric_defaults=None, valid_ranges=None):
+        """
+        Encoder for rows shaped like `survey.csv`. Missing answers become 'Unknown',
+        categories are numbered alphabetically, and unseen categories encode as -1.
+        `aliases` maps a column to `(normalized raw answer -> category, fallback category)`.
+        """
+        aliases = aliases or {}
+        numeric_defaults = numeric_defaults or {}
+        valid_ranges = valid_ranges or {}
+        fields = []
+        for index, column in enumerate(feature_columns):
+            if column in NUMERIC_COLUMNS:
+                fields.append(EncoderField(column, index, None, numeric_defaults.get(column, 0.0),
+                                           valid_range=valid_ranges.get(column)))
+            else:
+                categories = {value: code for code, value in enumerate(sorted(category_maps[column]))}
+                column_aliases, alias_default = aliases.get(column, (None, None))
+                fields.append(EncoderField(column, index, categories, -1.0,
+                                           aliases=column_aliases, alias_default=alias_default))
+        return cls(feature_columns, fields)
+
+    def encode(self, answers, out=None):
+        """Encode one dict of answers into a 1-D row (written into `out` if given)."""
+        row = self._template.copy() if out is None else out
+        for field in self.fields:
+            value = answers.get(field.name)
+            # Same missing, unparseable and unknown handling as encode_columns, so both paths give one row the same codes.
+            if field.categories is None:
+                row[field.index] = field.numeric(_parse_number(value, field.default))
+            else:
+                row[field.index] = field.code(MISSING_VALUE if _is_missing(value) else field.canonical(value))
+        return row
+
+    def encode_many(self, records):
+        """Encode a sequence of answer dicts into a 2-D block."""
+        block = np.zeros((len(records), len(self.feature_columns)), dtype=np.float64)
+        for i, answers in enumerate(records):
+            self.encode(answers, out=block[i])
+        return block
+
+    def encode_columns(self, columns, n_rows):
+        """
+        Encode column-oriented input (a mapping of field name to array-like, e.g. a
+        DataFrame) into a 2-D block with one vectorized pass per field.
+        """
+        block = np.zeros((n_rows, len(self.feature_columns)), dtype=np.float64)
+        for field in self.fields:
+            if field.name not in columns:
+                continue
+            values = columns[field.name]
+            if hasattr(values, 'to_numpy'):
+                values = values.to_numpy()
+            if field.categories is None:
+                parsed = _parse_numeric(values, field.default)
+                invalid = np.isnan(parsed)
+                if field.valid_range is not None:
+                    invalid |= (parsed < field.valid_range[0]) | (parsed > field.valid_range[1])
+                block[:, field.index] = np.where(invalid, field.default, parsed)
+            else:
+                uniques, inverse = np.unique(_fill_missing(values).astype(str), return_inverse=True)
+                codes = np.array([
+                    field.code(value if value == MISSING_VALUE else field.canonical(value)) for value in uniques
+                ], dtype=np.float64)
+                block[:, field.index] = codes[inverse]
+        return block
+
+
+def app_answers(columns):
+    """
+    The app's form answers taken from survey-shaped columns (a mapping of column name to array-like).
+    The form only asks Yes/No, so any other survey answer ("Don't know", missing, ...) is read as 'No'.
+    """
+    answers = {}
+    for name, column in APP_FIELDS.items():
+        values = np.asarray(columns[column], dtype=object)
+        answers[name] = values if column in NUMERIC_COLUMNS else np.where(values == 'Yes', 'Yes', 'No')
+    return answers
+
+
+def survey_category_maps(path=SURVEY_PATH):
+    """Distinct answers per categorical column of the training survey."""
+    import pandas as pd
+    survey = pd.read_csv(path, dtype=str)
+    return {
+        col: sorted(survey[col].fillna(MISSING_VALUE).unique())
+        for col in survey.columns
+        if col not in NON_FEATURE_COLUMNS and col not in NUMERIC_COLUMNS
+    }
+
+
+def build_survey_encoder(feature_columns, path=SURVEY_PATH):
+    return FeatureEncoder.for_survey(feature_columns, survey_category_maps(path))
+
+
+def load_encoder(feature_columns, path=ENCODER_PATH):
+    """Load the serialized survey encoder, or rebuild it from `survey.csv` if it is missing or stale."""
+    if os.path.exists(path):
+        encoder = joblib.load(path)
+        if encoder.feature_columns == list(feature_columns):
+            return encoder
+    return build_survey_encoder(list(feature_columns))
+
+
+if __name__ == '__main__':
+    # Import by module name so the pickle references `encoder.FeatureEncoder`, not `__main__`.
+    import encoder
+    from model_registry import COLUMNS_PATH
+    columns = list(joblib.load(COLUMNS_PATH))
+    joblib.dump(encoder.build_survey_encoder(columns), ENCODER_PATH)
+    print(f"Wrote {ENCODER_PATH}")
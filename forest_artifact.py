@@ -0,0 +1,226 @@
+"""
+Compact, memory-mappable artifact for the random forest.
+
+The node arrays of every tree (feature, threshold, children, class
+probabilities and cover) are flattened into contiguous arrays and written to a
+single file together with the feature columns, a schema version and a SHA-256
+checksum. Loading memory-maps the arrays zero-copy, so cold start is a header
+read and every worker process on a host shares one physical copy of the model.
+
+File layout:
+    b'MHRF' | uint32 header length | JSON header | padding | 64-byte aligned arrays
+
+Each array's dtype is recorded in the header, so derived forests (see
+`compress_forest.py`) can store the same arrays at reduced precision.
+
+Usage (export `mental_health_rf_model.pkl` + `feature_columns.pkl`):
+    python forest_artifact.py [-o mental_health_rf_model.forest]
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ARTIFACT_PATH = os.path.join(BASE_DIR, 'mental_health_rf_model.forest')
+
+MAGIC = b'MHRF'
+SCHEMA_VERSION = 1
+ALIGNMENT = 64
+LEAF = -1
+
+# Array name -> dtype on disk.
+ARRAY_DTYPES = {
+    'roots': np.int32,       # index of each tree's root node
+    'feature': np.int32,     # split feature, LEAF (-1) at leaves
+    'threshold': np.float64, # go left when x[feature] <= threshold
+    'left': np.int32,        # global index of the left child, LEAF at leaves
+    'right': np.int32,       # global index of the right child, LEAF at leaves
+    'value': np.float64,     # per-node class probabilities, shape (n_nodes, n_classes)
+    'cover': np.float64,     # weighted training samples reaching the node
+}
+
+
+class ArtifactError(ValueError):
+    """Raised when an artifact is malformed or fails its checksum."""
+
+
+class ForestArtifact:
+    """Flattened forest arrays plus the metadata needed to score with them."""
+
+    def __init__(self, arrays, feature_columns, classes, schema_version=SCHEMA_VERSION, checksum=None, metadata=None):
+        self.arrays = arrays
+        self.feature_columns = list(feature_columns)
+        self.classes = list(classes)
+        self.schema_version = schema_version
+        self.checksum = checksum
+        self.metadata = dict(metadata or {})
+
+    def __getattr__(self, name):
+        arrays = self.__dict__.get('arrays', {})
+        if name in arrays:
+            return arrays[name]
+        raise AttributeError(name)
+
+    @property
+    def n_trees(self):
+        return len(self.arrays['roots'])
+
+    @property
+    def n_nodes(self):
+        return len(self.arrays['feature'])
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self.arrays.values())
+
+    @property
+    def fixed_features(self):
+        """Features a specialized forest assumes are always 0 (empty for a full forest)."""
+        return self.metadata.get('fixed_features', [])
+
+
+def flatten_forest(model, feature_columns):
+    """Concatenate the node arrays of a fitted RandomForestClassifier's trees."""
+    roots, feature, threshold, left, right, value, cover = [], [], [], [], [], [], []
+    offset = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        is_leaf = tree.children_left == LEAF
+        roots.append(offset)
+        feature.append(np.where(is_leaf, LEAF, tree.feature))
+        threshold.append(tree.threshold)
+        left.append(np.where(is_leaf, LEAF, tree.children_left + offset))
+        right.append(np.where(is_leaf, LEAF, tree.children_right + offset))
+        # Classifier trees already store class fractions, which predict_proba returns as is.
+        value.append(tree.value[:, 0, :])
+        cover.append(tree.weighted_n_node_samples)
+        offset += tree.node_count
+
+    arrays = {
+        'roots': np.array(roots),
+        'feature': np.concatenate(feature),
+        'threshold': np.concatenate(threshold),
+        'left': np.concatenate(left),
+        'right': np.concatenate(right),
+        'value': np.concatenate(value),
+        'cover': np.concatenate(cover),
+    }
+    arrays = {name: np.ascontiguousarray(array, dtype=ARRAY_DTYPES[name]) for name, array in arrays.items()}
+    return ForestArtifact(arrays, feature_columns, model.classes_.tolist())
+
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def arrays_checksum(arrays):
+    """sha256 of the arrays' bytes in order, as stored in an artifact header."""
+    digest = hashlib.sha256()
+    for array in arrays.values():
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def save_artifact(artifact, path=ARTIFACT_PATH):
+    """Write an artifact atomically (to a temporary file, then rename)."""
+    layout = {}
+    offset = 0
+    for name, array in artifact.arrays.items():
+        offset = _aligned(offset)
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += array.nbytes
+
+    header = {
+        'schema_version': artifact.schema_version,
+        'feature_columns': artifact.feature_columns,
+        'classes': artifact.classes,
+        'n_trees': artifact.n_trees,
+        'n_nodes': artifact.n_nodes,
+        'arrays': layout,
+        'sha256': arrays_checksum(artifact.arrays),
+        'metadata': artifact.metadata,
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = _aligned(len(MAGIC) + 4 + len(header_bytes))
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in artifact.arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+    artifact.checksum = header['sha256']
+    return path
+
+
+def _read_header(f):
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ArtifactError("Not a forest artifact (bad magic bytes).")
+    (header_length,) = struct.unpack('<I', f.read(4))
+    header = json.loads(f.read(header_length).decode('utf-8'))
+    if header.get('schema_version') != SCHEMA_VERSION:
+        raise ArtifactError(f"Unsupported artifact schema version {header.get('schema_version')}.")
+    return header, _aligned(len(MAGIC) + 4 + header_length)
+
+
+def load_artifact(path=ARTIFACT_PATH, verify=True):
+    """
+    Memory-map an artifact read-only. Pages are shared between every process
+    that maps the same file. With `verify`, the checksum is checked on load.
+    """
+    with open(path, 'rb') as f:
+        header, data_start = _read_header(f)
+
+    buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    arrays = {}
+    digest = hashlib.sha256()
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        shape = tuple(spec['shape'])
+        count = int(np.prod(shape))
+        array = np.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + spec['offset']).reshape(shape)
+        if verify:
+            digest.update(memoryview(array).cast('B'))
+        arrays[name] = array
+
+    if verify and digest.hexdigest() != header['sha256']:
+        raise ArtifactError(f"Checksum mismatch for {path}.")
+    return ForestArtifact(arrays, header['feature_columns'], header['classes'], header['schema_version'], header['sha256'],
+                          header.get('metadata'))
+
+
+def is_memory_mapped(array):
+    """True when `array` is a view into a memory-mapped file rather than private memory."""
+    while array is not None:
+        if isinstance(array, (np.memmap, mmap.mmap)):
+            return True
+        array = getattr(array, 'base', None)
+    return False
+
+
+def main(argv=None):
+    import joblib
+    from model_registry import COLUMNS_PATH, MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Export the trained forest to a memory-mappable artifact.")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--columns', default=COLUMNS_PATH)
+    parser.add_argument('-o', '--output', default=ARTIFACT_PATH)
+    args = parser.parse_args(argv)
+
+    artifact = flatten_forest(joblib.load(args.model), list(joblib.load(args.columns)))
+    save_artifact(artifact, args.output)
+    print(f"Wrote {args.output}: {artifact.n_trees} trees, {artifact.n_nodes} nodes, "
+          f"{os.path.getsize(args.output) / 1024:.0f} KiB, sha256 {artifact.checksum[:12]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+NumPy inference kernel for the random forest.
+
+Walks every tree at once over the flattened node arrays of a ForestArtifact:
+one vectorized step per tree level instead of scikit-learn's per-call input
+validation and thread-pool dispatch. Probabilities are bit-for-bit identical to
+`RandomForestClassifier.predict_proba`: inputs are compared as float32 against
+float64 thresholds like sklearn's tree code, and per-tree probabilities are
+summed in tree order before dividing by the number of trees.
+"""
+import numpy as np
+
+from forest_artifact import LEAF, flatten_forest
+
+
+class ParityError(AssertionError):
+    """Raised when the kernel disagrees with the scikit-learn forest."""
+
+
+class ForestKernel:
+    """
+    Drop-in `predict_proba` over a ForestArtifact's arrays.
+
+    The kernel wins on single rows and small batches, where sklearn's fixed
+    per-call overhead dominates. Compiled tree traversal is still faster for
+    large batches, so when the fitted sklearn forest is available as `fallback`,
+    batches above `fallback_rows` are handed to it.
+    """
+
+    def __init__(self, artifact, fallback=None, fallback_rows=512):
+        self.artifact = artifact
+        self.fallback = fallback
+        self.fallback_rows = fallback_rows
+        self.feature_columns = artifact.feature_columns
+        self.classes_ = np.array(artifact.classes)
+        self.n_features_in_ = len(artifact.feature_columns)
+        # Index with the arrays in their on-disk dtypes: converting them would copy a memory-mapped
+        # artifact into private memory in every worker instead of sharing the file's pages.
+        self._roots = artifact.roots
+        self._feature = artifact.feature
+        self._left = artifact.left
+        self._right = artifact.right
+        self._threshold = artifact.threshold
+        self._value = artifact.value
+
+    @classmethod
+    def from_model(cls, model, feature_columns, **kwargs):
+        return cls(flatten_forest(model, feature_columns), fallback=model, **kwargs)
+
+    @property
+    def nbytes(self):
+        return self.artifact.nbytes
+
+    def apply(self, X):
+        """Leaf index reached in every tree, shape (n_trees, n_samples)."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        n_samples, n_features = X.shape
+        n_trees = len(self._roots)
+        flat_X = X.ravel()
+        # One slot per (tree, sample) pair; only pairs still at an internal node are advanced each level.
+        nodes = np.repeat(self._roots, n_samples)
+        row_offsets = np.tile(np.arange(n_samples, dtype=np.intp) * n_features, n_trees)
+        active = np.arange(n_trees * n_samples)
+        while active.size:
+            current = nodes[active]
+            feature = self._feature[current]
+            internal = feature != LEAF
+            if not internal.all():
+                active, current, feature = active[internal], current[internal], feature[internal]
+            go_left = flat_X[row_offsets[active] + feature] <= self._threshold[current]
+            nodes[active] = np.where(go_left, self._left[current], self._right[current])
+        return nodes.reshape(n_trees, n_samples)
+
+    def kernel_proba(self, X):
+        """Class probabilities from the NumPy traversal, regardless of batch size."""
+        leaves = self.apply(X)
+        # An axis-0 reduction adds the per-tree rows one after another, matching sklearn's accumulation order.
+        # Reduced-precision leaf values (compressed artifacts) are accumulated in float64 all the same.
+        proba = np.add.reduce(self._value[leaves], axis=0, dtype=np.float64)
+        proba /= leaves.shape[0]
+        return proba
+
+    def predict_proba(self, X):
+        if self.fallback is not None and np.ndim(X) == 2 and len(X) > self.fallback_rows:
+            return self.fallback.predict_proba(X)
+        return self.kernel_proba(X)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def check_parity(kernel, model, X):
+    """Raise ParityError unless the kernel's own traversal reproduces `model.predict_proba(X)` exactly."""
+    expected = model.predict_proba(X)
+    actual = kernel.kernel_proba(X)
+    if not np.array_equal(expected, actual):
+        mismatched = int(np.sum(np.any(expected != actual, axis=1)))
+        worst = float(np.max(np.abs(expected - actual)))
+        raise ParityError(f"{mismatched} of {len(X)} rows differ from scikit-learn (max abs diff {worst:.3g}).")
+
+
+def parity_sample(n_features, n_rows=256, seed=0):
+    """Random integer codes spanning every split threshold of the shipped model (ages and label codes)."""
+    rng = np.random.default_rng(seed)
+    return rng.integers(-1, 80, size=(n_rows, n_features)).astype(np.float64)
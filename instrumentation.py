@@ -0,0 +1,322 @@
+"""
+Low-overhead instrumentation for the prediction hot path.
+
+    from instrumentation import metrics
+
+    timer = metrics.timer()
+    ...encode...
+    timer.lap('encode')
+    ...predict...
+    timer.lap('predict_proba')
+    timer.done()                  # counts the prediction, optionally logs it
+
+Per-stage timings go into fixed-bucket histograms and counters into plain
+integers, all exported in Prometheus text format (`metrics.prometheus_text()`).
+Other components contribute their own exposition text through
+`metrics.add_collector` (prediction caches, model reloads).
+
+Configured from the environment:
+
+    METRICS=0                   no-op mode: every call is a constant-time do-nothing
+    METRICS_LOG=1               one structured JSON log line per prediction (logger 'metrics')
+    METRICS_PORT=9100           serve /metrics (and /profile) from a background thread
+    PROFILER_INTERVAL_MS=5      start the sampling profiler at import time
+"""
+import bisect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger('metrics')
+
+# Upper bounds in seconds, from 10 µs (table lookups) to 2.5 s (cold model loads).
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+                   0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _format_float(value):
+    return '+Inf' if value == float('inf') else repr(float(value))
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        # Called under the owning Metrics lock.
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Bucket upper bound at quantile `q`; coarse, but free to compute."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class StageTimer:
+    """Measures consecutive stages of one prediction."""
+
+    __slots__ = ('_metrics', '_start', '_last', 'stages')
+
+    def __init__(self, metrics):
+        self._metrics = metrics
+        self._start = self._last = time.perf_counter()
+        self.stages = {}
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = now - self._last
+        self._last = now
+
+    def done(self, **fields):
+        """Record every stage, count the prediction and return its total duration in seconds."""
+        total = self._last - self._start
+        self._metrics._record(self.stages, total, fields)
+        return total
+
+
+class _NullTimer:
+    __slots__ = ()
+    stages = {}
+
+    def lap(self, stage):
+        pass
+
+    def done(self, **fields):
+        return 0.0
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """Stage histograms, counters and pluggable collectors behind one lock."""
+
+    enabled = True
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, log_predictions=False):
+        self.buckets = buckets
+        self.log_predictions = log_predictions
+        self.profiler = None
+        self._histograms = {}
+        self._counters = Counter()
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def timer(self):
+        return StageTimer(self)
+
+    def _record(self, stages, total, fields):
+        with self._lock:
+            for stage, seconds in stages.items():
+                histogram = self._histograms.get(stage)
+                if histogram is None:
+                    histogram = self._histograms[stage] = Histogram(self.buckets)
+                histogram.observe(seconds)
+            self._counters['predictions'] += 1
+        if self.log_predictions:
+            event = {'event': 'prediction', 'total_ms': total * 1000,
+                     **{f"{stage}_ms": seconds * 1000 for stage, seconds in stages.items()}, **fields}
+            logger.info(json.dumps(event, default=str))
+
+    def increment(self, counter, amount=1):
+        with self._lock:
+            self._counters[counter] += amount
+
+    def add_collector(self, collect):
+        """Register a zero-argument callable returning Prometheus exposition text."""
+        with self._lock:
+            if collect not in self._collectors:
+                self._collectors.append(collect)
+
+    def snapshot(self):
+        """Counters and per-stage count / mean / approximate p50 and p99, for logs and dashboards."""
+        with self._lock:
+            stages = {
+                stage: {
+                    'count': h.count,
+                    'mean_ms': h.total / h.count * 1000 if h.count else 0.0,
+                    'p50_ms': h.quantile(0.5) * 1000,
+                    'p99_ms': h.quantile(0.99) * 1000,
+                }
+                for stage, h in self._histograms.items()
+            }
+            return {'counters': dict(self._counters), 'stages': stages}
+
+    def prometheus_text(self):
+        with self._lock:
+            histograms = {stage: (list(h.counts), h.total, h.count) for stage, h in self._histograms.items()}
+            counters = dict(self._counters)
+            collectors = list(self._collectors)
+        lines = []
+        if histograms:
+            lines.append("# TYPE prediction_stage_seconds histogram")
+            for stage, (counts, total, count) in sorted(histograms.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    lines.append(f'prediction_stage_seconds_bucket{{stage="{stage}",le="{_format_float(bound)}"}} {cumulative}')
+                lines.append(f'prediction_stage_seconds_sum{{stage="{stage}"}} {total!r}')
+                lines.append(f'prediction_stage_seconds_count{{stage="{stage}"}} {count}')
+        for counter, value in sorted(counters.items()):
+            lines.append(f"# TYPE {counter}_total counter")
+            lines.append(f"{counter}_total {value}")
+        text = "\n".join(lines) + "\n" if lines else ""
+        return text + "".join(collect() for collect in collectors)
+
+    def start_profiler(self, interval_ms=5.0):
+        if self.profiler is None:
+            self.profiler = SamplingProfiler(interval_ms / 1000)
+            self.profiler.start()
+        return self.profiler
+
+    def stop_profiler(self):
+        if self.profiler is not None:
+            self.profiler.stop()
+
+
+class NullMetrics:
+    """Same interface as Metrics; every call returns immediately."""
+
+    enabled = False
+    profiler = None
+
+    def timer(self):
+        return _NULL_TIMER
+
+    def increment(self, counter, amount=1):
+        pass
+
+    def add_collector(self, collect):
+        pass
+
+    def snapshot(self):
+        return {'counters': {}, 'stages': {}}
+
+    def prometheus_text(self):
+        return ""
+
+    def start_profiler(self, interval_ms=5.0):
+        return None
+
+    def stop_profiler(self):
+        pass
+
+
+# --- Sampling profiler ---
+
+class SamplingProfiler:
+    """
+    Background thread that samples every other thread's Python stack at a fixed
+    interval. Stacks are aggregated in collapsed form (`a;b;c count`), ready for
+    flamegraph.pl or speedscope. Costs one stack walk per thread per interval.
+    """
+
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self._stacks = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                names = []
+                while frame is not None and len(names) < self.max_depth:
+                    code = frame.f_code
+                    names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stacks.append(";".join(reversed(names)))
+            with self._lock:
+                self._stacks.update(stacks)
+                self.samples += 1
+
+    def collapsed(self, limit=None):
+        with self._lock:
+            top = self._stacks.most_common(limit)
+        return "".join(f"{stack} {count}\n" for stack, count in top)
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+
+
+# --- Standalone /metrics endpoint (for processes without their own HTTP server, e.g. Streamlit) ---
+
+def serve_metrics(port, host='0.0.0.0', registry=None):
+    """Serve GET /metrics (and /profile when profiling) on a daemon thread; returns the server."""
+    registry = registry or metrics
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/metrics':
+                body, content_type = registry.prometheus_text(), 'text/plain; version=0.0.4'
+            elif self.path == '/profile' and registry.profiler is not None:
+                body, content_type = registry.profiler.collapsed(), 'text/plain'
+            else:
+                self.send_error(404)
+                return
+            payload = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
+
+
+def create_metrics():
+    """Build the process-wide instance from METRICS, METRICS_LOG and PROFILER_INTERVAL_MS."""
+    if os.environ.get('METRICS', '1') == '0':
+        return NullMetrics()
+    instance = Metrics(log_predictions=os.environ.get('METRICS_LOG', '0') == '1')
+    if os.environ.get('PROFILER_INTERVAL_MS'):
+        instance.start_profiler(float(os.environ['PROFILER_INTERVAL_MS']))
+    return instance
+
+
+metrics = create_metrics()
@@ -0,0 +1,109 @@
+"""
+Precomputed prediction table for the app's whole input space.
+
+The form only collects `age` (18-100) and five Yes/No answers, so there are
+83 x 32 = 2,656 distinct inputs. PredictionTable scores all of them in one
+batch and then answers `predict_proba` for app-encoded rows with an O(1) array
+lookup keyed by a packed integer:
+
+    key = (age - 18) * 32 + family_history * 16 + self_employed * 8 + remote_work * 4 + tech_company * 2 + benefits
+
+Rows outside that space are passed through to the live model.
+
+Usage (build the table and check it against the live model):
+    python lookup_table.py
+"""
+import itertools
+import time
+
+import numpy as np
+
+AGE_RANGE = (18, 100)
+BINARY_FIELDS = ('family_history', 'self_employed', 'remote_work', 'tech_company', 'benefits')
+
+
+class TableMismatchError(AssertionError):
+    """Raised when table lookups disagree with the live model."""
+
+
+def all_inputs():
+    """Every answer combination the form can produce, in key order."""
+    records = []
+    for age in range(AGE_RANGE[0], AGE_RANGE[1] + 1):
+        for bits in itertools.product((0, 1), repeat=len(BINARY_FIELDS)):
+            record = {'age': age}
+            record.update({name: "Yes" if bit else "No" for name, bit in zip(BINARY_FIELDS, bits)})
+            records.append(record)
+    return records
+
+
+class PredictionTable:
+    """`predict_proba` over app-encoded rows served from a precomputed array."""
+
+    def __init__(self, probabilities, encoder, fallback):
+        self.probabilities = probabilities
+        self.encoder = encoder
+        self.fallback = fallback
+        self.classes_ = getattr(fallback, 'classes_', None)
+        indices = {field.name: field.index for field in encoder.fields}
+        self._age_index = indices['age']
+        self._binary_indices = np.array([indices[name] for name in BINARY_FIELDS])
+        self._bit_weights = 1 << np.arange(len(BINARY_FIELDS))[::-1]
+        self._other_indices = np.setdiff1d(np.arange(len(encoder.feature_columns)), [self._age_index, *self._binary_indices])
+
+    @classmethod
+    def build(cls, model, encoder, validate=True):
+        X = encoder.encode_many(all_inputs())
+        table = cls(model.predict_proba(X), encoder, model)
+        if validate:
+            table.validate(model)
+        return table
+
+    @property
+    def nbytes(self):
+        return self.probabilities.nbytes
+
+    def keys(self, X):
+        """Packed keys for each row, and a mask of rows that fall inside the table."""
+        age = X[:, self._age_index]
+        bits = X[:, self._binary_indices]
+        valid = (
+            (age >= AGE_RANGE[0]) & (age <= AGE_RANGE[1]) & (age == np.floor(age))
+            & np.all((bits == 0) | (bits == 1), axis=1)
+            & np.all(X[:, self._other_indices] == 0, axis=1)
+        )
+        keys = np.where(valid, (age - AGE_RANGE[0]) * 32 + bits @ self._bit_weights, 0).astype(np.intp)
+        return keys, valid
+
+    def predict_proba(self, X):
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        keys, valid = self.keys(X)
+        if valid.all():
+            return self.probabilities[keys]
+        proba = np.empty((len(X), self.probabilities.shape[1]))
+        proba[valid] = self.probabilities[keys[valid]]
+        proba[~valid] = self.fallback.predict_proba(X[~valid])
+        return proba
+
+    def validate(self, model):
+        """Raise TableMismatchError unless every lookup equals the live model's output."""
+        X = self.encoder.encode_many(all_inputs())
+        keys, valid = self.keys(X)
+        if not valid.all() or not np.array_equal(keys, np.arange(len(X))):
+            raise TableMismatchError("Packed keys do not enumerate the input space in order.")
+        if not np.array_equal(self.probabilities[keys], model.predict_proba(X)):
+            raise TableMismatchError("Precomputed probabilities differ from the live model.")
+
+
+def main():
+    from model_registry import get_registry
+    loaded = get_registry().get()
+    start = time.perf_counter()
+    table = PredictionTable.build(loaded.model, loaded.app_encoder)
+    elapsed = time.perf_counter() - start
+    print(f"Built and validated {len(table.probabilities)} entries ({table.nbytes / 1024:.0f} KiB) "
+          f"in {elapsed * 1000:.1f} ms with the {loaded.engine} engine.")
+
+
+if __name__ == '__main__':
+    main()
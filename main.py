@@ -1,8 +1,18 @@
+import os
+
 import streamlit as st
-import pandas as pd
-import joblib
 import numpy as np
-import time
+import pandas as pd
+
+from model_registry import get_registry
+from encoder import FeatureEncoder
+from drift_monitor import get_monitor, prometheus_text as drift_prometheus_text
+from lookup_table import PredictionTable
+from instrumentation import metrics, serve_metrics
+from prediction import build_report, latency
+from prediction_cache import PredictionCache, feature_key, parse_ttl, prometheus_text
+from rules import get_rules
+from what_if import WHAT_IF_FACTORS, lookup_scenario, run_sweep
 
 # --- Set the page title and icon ---
 st.set_page_config(
@@ -11,7 +21,7 @@ st.set_page_config(
     layout="wide"
 )
 
-# --- Inject custom CSS for a cleaner, modern UI ---
+# --- Inject custom CSS for a cleaner, modern UI (once per session: interactions rerun fragments, not the script) ---
 st.markdown(
     """
     <style>
@@ -192,108 +202,115 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-# --- Load the trained model and feature columns ---
-try:
-    model = joblib.load('mental_health_rf_model.pkl')
-    feature_columns = joblib.load('feature_columns.pkl')
-except FileNotFoundError:
+# --- Load the trained model and feature columns (once per process) ---
+@st.cache_resource
+def load_model_registry():
+    return get_registry()
+
+class DummyModel:
+    def predict(self, data):
+        # Columns follow DUMMY_FEATURE_COLUMNS: Age, self_employed, family_history, remote_work, tech_company, benefits
+        older_with_history = (data[:, 0] > 40) & (data[:, 2] == 1)
+        onsite_without_benefits = (data[:, 3] == 0) & (data[:, 5] == 0)
+        return (older_with_history | onsite_without_benefits).astype(int)
+    def predict_proba(self, data):
+        pred = self.predict(data)
+        return np.where(pred[:, np.newaxis] == 1, [0.15, 0.85], [0.85, 0.15])
+
+DUMMY_FEATURE_COLUMNS = ['Age', 'self_employed', 'family_history', 'remote_work', 'tech_company', 'benefits']
+USE_PREDICTION_TABLE = os.environ.get('PREDICTION_TABLE', '1') != '0'
+
+class AppModel:
+    """What the app predicts with for one model version."""
+
+    def __init__(self, version, model, app_encoder, explainer=None, loaded=None):
+        self.version = version
+        self.model = model
+        self.app_encoder = app_encoder
+        self.explainer = explainer
+        self.loaded = loaded  # the registry's model, for the drift monitor; None for the dummy model
+        # Precompute every form combination (83 ages x 32 Yes/No patterns) for O(1) predictions
+        self.predictor = PredictionTable.build(model, app_encoder) if USE_PREDICTION_TABLE else model
+
+@st.cache_resource(max_entries=1)
+def load_app_model(model_version, _loaded):
+    if _loaded is None:
+        return AppModel(model_version, DummyModel(), FeatureEncoder.for_app(DUMMY_FEATURE_COLUMNS))
+    # Opt-in, like the service's --explain: explaining a prediction costs many times more than making it.
+    explainer = _loaded.explainer if os.environ.get('EXPLAIN', '0') != '0' else None
+    get_monitor('app', _loaded)  # starts building the drift baseline in the background
+    return AppModel(model_version, _loaded.model, _loaded.app_encoder, explainer, _loaded)
+
+def current_model():
+    """
+    The model to answer with right now. Fragments rerun without the rest of the script, so every prediction
+    resolves the registry itself: after a hot reload, all sessions move to the new version on their next interaction.
+    """
+    try:
+        loaded = load_model_registry().get()
+    except FileNotFoundError:
+        return load_app_model('dummy', None)
+    return load_app_model(loaded.version, loaded)
+
+if current_model().version == 'dummy':
     st.warning("Model files not found. Using a dummy model for demonstration.")
-    class DummyModel:
-        def predict(self, data):
-            if data['Age'].iloc[0] > 40 and data['family_history'].iloc[0] == 1:
-                return np.array([1])
-            if data['remote_work'].iloc[0] == 0 and data['benefits'].iloc[0] == 0:
-                return np.array([1])
-            return np.array([0])
-        def predict_proba(self, data):
-            pred = self.predict(data)[0]
-            if pred == 1:
-                return np.array([[0.15, 0.85]])
-            else:
-                return np.array([[0.85, 0.15]])
-    model = DummyModel()
-    feature_columns = ['Age', 'self_employed', 'family_history', 'remote_work', 'tech_company', 'benefits']
+
+# --- Bounded, process-wide caches keyed on the encoded answers ---
+try:
+    CACHE_TTL_SECONDS = parse_ttl(os.environ.get('PREDICTION_CACHE_TTL'))
+except ValueError as exc:
+    CACHE_TTL_SECONDS = None
+    st.warning(f"Ignoring PREDICTION_CACHE_TTL: {exc} Cached reports expire only when the model or rules change.")
+
+@st.cache_resource
+def load_prediction_caches():
+    return {
+        'reports': PredictionCache(max_entries=4096, max_bytes=16 * 1024 * 1024, ttl_seconds=CACHE_TTL_SECONDS, name='reports'),
+        'sweeps': PredictionCache(max_entries=1024, max_bytes=16 * 1024 * 1024, ttl_seconds=CACHE_TTL_SECONDS, name='sweeps'),
+    }
+
+prediction_caches = load_prediction_caches()
+
+# --- Metrics: stage histograms, cache and reload counters; METRICS_PORT serves /metrics ---
+@st.cache_resource
+def start_metrics():
+    metrics.add_collector(load_model_registry().prometheus_text)
+    metrics.add_collector(lambda: prometheus_text(prediction_caches.values()))
+    metrics.add_collector(drift_prometheus_text)
+    port = os.environ.get('METRICS_PORT')
+    return serve_metrics(int(port)) if port and metrics.enabled else None
+
+start_metrics()
 
 # --- Enhanced Prediction "API" function with Risk Scoring and Benchmarks ---
-@st.cache_data
-def predict_data(user_input_data):
+def predict_data(user_input_data, observe=False):
     """
-    Simulates a sophisticated API call. Returns a structured dictionary with analysis.
+    Returns a structured dictionary with analysis from a single forest pass (or table lookup).
+    Reports are shared between sessions and invalidated when the model version or the rule table changes; treat them as read-only.
+    With `observe`, the answers and probability also feed the drift monitor (once per submission, not per rerun).
     """
-    time.sleep(2)
-
-    processed_data = {
-        'Age': user_input_data['age'],
-        'self_employed': 1 if user_input_data['self_employed'] == "Yes" else 0,
-        'family_history': 1 if user_input_data['family_history'] == "Yes" else 0,
-        'remote_work': 1 if user_input_data['remote_work'] == "Yes" else 0,
-        'tech_company': 1 if user_input_data['tech_company'] == "Yes" else 0,
-        'benefits': 1 if user_input_data['benefits'] == "Yes" else 0,
-    }
-    
-    user_input = pd.DataFrame([processed_data])
-    for col in feature_columns:
-        if col not in user_input.columns:
-            user_input[col] = 0
-    user_input = user_input[feature_columns]
-
-    prediction = model.predict(user_input)[0]
-    probability = model.predict_proba(user_input)[0][1]
-
-    # --- Simulated Risk Score Calculation ---
-    risk_score = 0
-    if processed_data['family_history'] == 1: risk_score += 3
-    if processed_data['remote_work'] == 0: risk_score += 2
-    if processed_data['tech_company'] == 1 and processed_data['benefits'] == 0: risk_score += 4
-    if processed_data['Age'] > 45: risk_score += 1
-    if prediction == 1: risk_score += 5 # High weight for model's prediction
-
-    risk_level = "Low"
-    color = "#50fa7b" # Green for low
-    if risk_score > 5:
-        risk_level = "Medium"
-        color = "#ffc800" # Orange for medium
-    if risk_score > 10:
-        risk_level = "High"
-        color = "#ff5555" # Red for high
-        
-    # --- Generate Risk Factor Analysis & Recommendations (simulated) ---
-    risk_factors = []
-    recommendations = []
-    
-    if processed_data['family_history'] == 1:
-        risk_factors.append("Family History of Mental Health")
-        recommendations.append({"category": "Immediate Action", "text": "Consider speaking with a professional about your family history and its potential impact on your well-being. A genetic counselor or therapist may provide valuable guidance."})
-    if processed_data['remote_work'] == 0:
-        risk_factors.append("On-site Work Environment")
-        recommendations.append({"category": "Lifestyle Adjustments", "text": "Maintaining a healthy work-life balance is crucial in an on-site role. Explore stress management techniques and ensure you take regular breaks."})
-    if processed_data['tech_company'] == 1 and processed_data['benefits'] == 0:
-        risk_factors.append("Lack of Employer Mental Health Benefits")
-        recommendations.append({"category": "Immediate Action", "text": "Research local mental health resources and services that are independent of employer benefits. Prioritize your well-being, even without company support."})
-    if processed_data['Age'] > 45:
-        risk_factors.append("Age-Related Stress Factors")
-        recommendations.append({"category": "Lifestyle Adjustments", "text": "As we age, our mental health needs can change. Stay connected with friends and family, and consider mindfulness or meditation to manage stress."})
-    
-    if not risk_factors:
-        recommendations.append({"category": "General Wellness", "text": "Your profile indicates a low-risk status. Continue to monitor your mental health and seek professional help if your circumstances change."})
-    
-    # --- Add 'explanation' key back to the report dictionary ---
-    explanation_text = "The analysis suggests a high probability of requiring professional assistance based on the provided data." if prediction == 1 else "The analysis indicates a low probability of requiring treatment at this time."
-
-    report = {
-        'prediction': 'Treatment Likely' if prediction == 1 else 'Treatment Unlikely',
-        'probability': probability,
-        'risk_score': risk_score,
-        'risk_level': risk_level,
-        'risk_level_color': color,
-        'input_data': user_input_data,
-        'risk_factors': risk_factors,
-        'recommendations': recommendations,
-        'explanation': explanation_text # Fixed: ensure this key is always present
-    }
-
+    app = current_model()
+    row = app.app_encoder.encode(user_input_data)
+    report = prediction_caches['reports'].get_or_compute(
+        feature_key(row),
+        lambda: build_report(app.predictor, app.app_encoder, user_input_data, explainer=app.explainer),
+        (app.version, get_rules().version),
+    )
+    monitor = get_monitor('app', app.loaded) if observe and app.loaded is not None else None
+    if monitor is not None:
+        monitor.observe(row, [report['probability']])
     return report
 
+def what_if_sweep(user_input_data):
+    """
+    Scores every single and pairwise factor flip of the current answers in one batch.
+    """
+    app = current_model()
+    key = feature_key(app.app_encoder.encode(user_input_data))
+    return prediction_caches['sweeps'].get_or_compute(
+        key, lambda: run_sweep(app.predictor, app.app_encoder, user_input_data), (app.version, get_rules().version)
+    )
+
 def get_input_explanation(key):
     explanations = {
         'age': 'Age can correlate with different life stages and stressors, influencing mental health. Your age helps the model contextualize other factors.',
@@ -333,12 +350,179 @@ def next_step():
 def prev_step():
     st.session_state.step -= 1
 
-# --- Main app logic ---
-st.title("🤖 CyberMind AI: Mental Wellness Protocol")
+def generate_report():
+    st.session_state.step += 1
+    st.rerun('session')
 
-with st.container(border=False):
-    st.markdown('<div class="main-content">', unsafe_allow_html=True)
-    
+def start_new_analysis():
+    st.session_state.step = 0
+    st.rerun('session')
+
+def progress_tracker_html(step):
+    """The whole progress tracker as one element."""
+    parts = []
+    for i in range(len(form_steps)):
+        step_class = "completed" if step > i + 1 else ("active" if step == i + 1 else "")
+        parts.append(f'<div class="progress-step {step_class}">{i + 1}</div>')
+        if i < len(form_steps) - 1:
+            line_class = "completed" if step > i + 1 else ""
+            parts.append(f'<div class="progress-line {line_class}"></div>')
+    return f'<div class="progress-tracker">{"".join(parts)}</div>'
+
+# --- Fragments: each interaction reruns only the fragment that owns the widget, never the whole script ---
+@st.fragment
+def render_form_step():
+    """One question of the form; answering it or moving between questions reruns only this fragment."""
+    st.subheader("Data Input")
+    st.markdown(progress_tracker_html(st.session_state.step), unsafe_allow_html=True)
+
+    current_step_num = st.session_state.step
+    current_step_data = form_steps[current_step_num - 1]
+
+    with st.container(border=True):
+        st.markdown(f"### **{current_step_data['label']}**")
+        st.info(get_input_explanation(current_step_data['key']))
+
+        is_input_valid = False
+        if current_step_data['type'] == 'number':
+            value = st.number_input(
+                " ",
+                min_value=current_step_data['min'],
+                max_value=current_step_data['max'],
+                value=st.session_state.user_inputs[current_step_data['key']],
+                label_visibility="collapsed"
+            )
+            st.session_state.user_inputs[current_step_data['key']] = value
+            if value is not None and value >= current_step_data['min'] and value <= current_step_data['max']:
+                is_input_valid = True
+        elif current_step_data['type'] == 'selectbox':
+            value = st.selectbox(
+                " ",
+                options=current_step_data['options'],
+                index=current_step_data['options'].index(st.session_state.user_inputs[current_step_data['key']]),
+                label_visibility="collapsed"
+            )
+            st.session_state.user_inputs[current_step_data['key']] = value
+            is_input_valid = True
+
+    nav_col1, nav_col2 = st.columns([1, 1])
+    with nav_col1:
+        if st.session_state.step > 1:
+            st.button("<< Previous", on_click=prev_step, use_container_width=True)
+    with nav_col2:
+        if st.session_state.step < len(form_steps):
+            st.button("Next >>", on_click=next_step, use_container_width=True, type="primary", disabled=not is_input_valid)
+        else:
+            st.button("GENERATE REPORT", on_click=generate_report, use_container_width=True, type="primary", disabled=not is_input_valid)
+
+@st.fragment
+def render_what_if():
+    """The what-if selectboxes rerun only this panel; the sweep is cached, so each change is a lookup."""
+    sweep = what_if_sweep(st.session_state.user_inputs)
+    with st.container(border=True):
+        st.markdown("Change a key factor to see how your risk level is affected.")
+        what_if_col1, what_if_col2 = st.columns(2)
+        with what_if_col1:
+            key_to_change = st.selectbox("Select a Factor:", WHAT_IF_FACTORS, key='what_if_factor')
+        with what_if_col2:
+            current_val = st.session_state.user_inputs.get(key_to_change, "No") # Get current value
+            options_for_change = ["Yes", "No"]
+            # Ensure the current value is not the only option, if possible
+            if current_val in options_for_change and len(options_for_change) > 1:
+                options_for_change.remove(current_val)
+                options_for_change.insert(0, current_val) # Keep current as first option
+
+            selected_new_value = st.selectbox(f"New value for '{key_to_change}':", options_for_change, key='what_if_value')
+
+        scenario = lookup_scenario(sweep, st.session_state.user_inputs, key_to_change, selected_new_value)
+        if scenario is not None:
+            st.info(f"If you changed **'{key_to_change}'** to **'{selected_new_value}'**, your new risk level would be: **{scenario['risk_level']}** (Score: {scenario['risk_score']}).")
+
+        with st.expander("Full sensitivity analysis"):
+            st.dataframe(
+                sweep[['change', 'probability', 'delta_probability', 'risk_level', 'risk_score', 'delta_risk_score']],
+                hide_index=True,
+                use_container_width=True,
+            )
+
+@st.fragment
+def render_report():
+    """The results dashboard; what-if changes rerun only their own panel inside it."""
+    st.header(">> MEDICAL REPORT DASHBOARD <<")
+    st.markdown("---")
+
+    with st.spinner("Compiling results..."):
+        report = predict_data(st.session_state.user_inputs)
+
+        # --- Summary Metrics Section ---
+        summary_col1, summary_col2, summary_col3 = st.columns(3)
+        with summary_col1:
+            st.metric(label="Probability", value=f"{report['probability'] * 100:.1f}%")
+        with summary_col2:
+            st.metric(label="Risk Level", value=report['risk_level'], label_visibility="visible", help=f"Your risk score is {report['risk_score']}")
+        with summary_col3:
+            st.metric(label="Predicted Status", value=report['prediction'])
+
+        # Display the current risk level
+        st.markdown(f"<p style='color: {report['risk_level_color']}; font-weight: bold; font-size: 1.2rem; text-align: center;'>Current Risk Level: {report['risk_level']}</p>", unsafe_allow_html=True)
+        st.markdown("---")
+
+        # Display the explanation
+        st.info(f"**Analysis Overview:** {report['explanation']}")
+        latency_summary = latency.summary()
+        if latency_summary['count']:
+            st.caption(f"Inference latency: {report['latency_ms']:.1f} ms (p50 {latency_summary['p50_ms']:.1f} ms, p95 {latency_summary['p95_ms']:.1f} ms over {latency_summary['count']} predictions)")
+
+        # --- Feature Contributions (TreeSHAP) ---
+        if 'contributions' in report:
+            st.subheader("What Drove This Prediction")
+            top = pd.Series(report['contributions']).head(8) * 100
+            st.bar_chart(top.rename('Percentage points'), horizontal=True)
+            st.caption(f"Starting from the average prediction of {report['base_value'] * 100:.1f}%, each bar shows how far that answer moved your probability. Questions the form does not ask are treated as unanswered.")
+
+        # --- What-If Scenario Section ---
+        st.subheader("Simulate a What-If Scenario")
+        render_what_if()
+        st.markdown("---")
+
+        # --- Detailed Breakdown Section ---
+        st.subheader("Detailed Report")
+        breakdown_col1, breakdown_col2 = st.columns(2)
+        with breakdown_col1:
+            st.markdown("### Risk Factor Analysis")
+            if report['risk_factors']:
+                for rf in report['risk_factors']:
+                    st.markdown(f"**-** {rf}")
+            else:
+                st.success("No significant risk factors were identified based on the provided data.")
+
+        with breakdown_col2:
+            st.markdown("### Recommended Actions")
+            if report['recommendations']:
+                # Group recommendations by category for cleaner display
+                recs_by_category = {}
+                for rec in report['recommendations']:
+                    recs_by_category.setdefault(rec['category'], []).append(rec['text'])
+
+                for category, texts in recs_by_category.items():
+                    st.markdown(f"**{category}:**")
+                    for text in texts:
+                        st.markdown(f"- {text}")
+            else:
+                st.markdown("No specific recommendations at this time.")
+
+        with st.expander("ACCESS RAW DATA LOG"):
+            st.json(report)
+
+    st.markdown("---")
+    st.button("RUN NEW ANALYSIS", on_click=start_new_analysis, use_container_width=True)
+
+@st.fragment(key='session')
+def render_session():
+    """
+    Dispatches on the current step. Moving between the welcome page, the form and the report reruns this fragment
+    (buttons inside nested fragments ask for it with `st.rerun('session')`), so the script itself runs once per page load.
+    """
     # Welcome Page
     if st.session_state.step == 0:
         st.header("Initiating Diagnostic Protocol")
@@ -354,147 +538,29 @@ with st.container(border=False):
 
     # Form Steps
     elif st.session_state.step > 0 and st.session_state.step <= len(form_steps):
-        st.subheader("Data Input")
-        
-        # Progress tracker
-        st.markdown('<div class="progress-tracker">', unsafe_allow_html=True)
-        for i in range(len(form_steps)):
-            step_class = "completed" if st.session_state.step > i + 1 else ("active" if st.session_state.step == i + 1 else "")
-            st.markdown(f'<div class="progress-step {step_class}">{i + 1}</div>', unsafe_allow_html=True)
-            if i < len(form_steps) - 1:
-                line_class = "completed" if st.session_state.step > i + 1 else ""
-                st.markdown(f'<div class="progress-line {line_class}"></div>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-        current_step_num = st.session_state.step
-        current_step_data = form_steps[current_step_num - 1]
-        
-        with st.container(border=True):
-            st.markdown(f"### **{current_step_data['label']}**")
-            st.info(get_input_explanation(current_step_data['key']))
-
-            is_input_valid = False
-            if current_step_data['type'] == 'number':
-                value = st.number_input(
-                    " ",
-                    min_value=current_step_data['min'],
-                    max_value=current_step_data['max'],
-                    value=st.session_state.user_inputs[current_step_data['key']],
-                    label_visibility="collapsed"
-                )
-                st.session_state.user_inputs[current_step_data['key']] = value
-                if value is not None and value >= current_step_data['min'] and value <= current_step_data['max']:
-                    is_input_valid = True
-            elif current_step_data['type'] == 'selectbox':
-                value = st.selectbox(
-                    " ",
-                    options=current_step_data['options'],
-                    index=current_step_data['options'].index(st.session_state.user_inputs[current_step_data['key']]),
-                    label_visibility="collapsed"
-                )
-                st.session_state.user_inputs[current_step_data['key']] = value
-                is_input_valid = True
-        
-        nav_col1, nav_col2 = st.columns([1, 1])
-        with nav_col1:
-            if st.session_state.step > 1:
-                st.button("<< Previous", on_click=prev_step, use_container_width=True)
-        with nav_col2:
-            if st.session_state.step < len(form_steps):
-                st.button("Next >>", on_click=next_step, use_container_width=True, type="primary", disabled=not is_input_valid)
-            else:
-                st.button("GENERATE REPORT", on_click=next_step, use_container_width=True, type="primary", disabled=not is_input_valid)
+        render_form_step()
 
-    # Thank You/Confirmation Page
+    # Thank You/Confirmation Page, replaced by the dashboard in the same run once the model has answered
     elif st.session_state.step == len(form_steps) + 1:
-        st.header("Analysis Initiated")
-        st.success("Your data has been submitted for analysis. Please wait while the system generates your report.")
-        time.sleep(2)
+        confirmation = st.empty()
+        with confirmation.container():
+            st.header("Analysis Initiated")
+            st.success("Your data has been submitted for analysis. Please wait while the system generates your report.")
+            with st.spinner("Running the model..."):
+                predict_data(st.session_state.user_inputs, observe=True)
+        confirmation.empty()
         st.session_state.step += 1
-        st.rerun()
+        render_report()
 
     # Results Dashboard
     elif st.session_state.step == len(form_steps) + 2:
-        st.header(">> MEDICAL REPORT DASHBOARD <<")
-        st.markdown("---")
-        
-        with st.spinner("Compiling results..."):
-            report = predict_data(st.session_state.user_inputs)
-            
-            # --- Summary Metrics Section ---
-            summary_col1, summary_col2, summary_col3 = st.columns(3)
-            with summary_col1:
-                st.metric(label="Probability", value=f"{report['probability'] * 100:.1f}%")
-            with summary_col2:
-                st.metric(label="Risk Level", value=report['risk_level'], label_visibility="visible", help=f"Your risk score is {report['risk_score']}")
-            with summary_col3:
-                st.metric(label="Predicted Status", value=report['prediction'])
-            
-            # Display the current risk level
-            st.markdown(f"<p style='color: {report['risk_level_color']}; font-weight: bold; font-size: 1.2rem; text-align: center;'>Current Risk Level: {report['risk_level']}</p>", unsafe_allow_html=True)
-            st.markdown("---")
-            
-            # Display the explanation
-            st.info(f"**Analysis Overview:** {report['explanation']}")
-
-            # --- What-If Scenario Section ---
-            st.subheader("Simulate a What-If Scenario")
-            with st.container(border=True):
-                st.markdown("Change a key factor to see how your risk level is affected.")
-                what_if_col1, what_if_col2 = st.columns(2)
-                with what_if_col1:
-                    key_to_change = st.selectbox("Select a Factor:", ['family_history', 'remote_work', 'tech_company', 'benefits'], key='what_if_factor')
-                with what_if_col2:
-                    current_val = st.session_state.user_inputs.get(key_to_change, "No") # Get current value
-                    options_for_change = ["Yes", "No"]
-                    # Ensure the current value is not the only option, if possible
-                    if current_val in options_for_change and len(options_for_change) > 1:
-                        options_for_change.remove(current_val)
-                        options_for_change.insert(0, current_val) # Keep current as first option
-                    
-                    selected_new_value = st.selectbox(f"New value for '{key_to_change}':", options_for_change, key='what_if_value')
-
-                temp_inputs = st.session_state.user_inputs.copy()
-                temp_inputs[key_to_change] = selected_new_value
-
-                if st.button("RUN SCENARIO", use_container_width=True):
-                    what_if_report = predict_data(temp_inputs)
-                    st.info(f"If you changed **'{key_to_change}'** to **'{selected_new_value}'**, your new risk level would be: **{what_if_report['risk_level']}** (Score: {what_if_report['risk_score']}).")
-            st.markdown("---")
-            
-            # --- Detailed Breakdown Section ---
-            st.subheader("Detailed Report")
-            breakdown_col1, breakdown_col2 = st.columns(2)
-            with breakdown_col1:
-                st.markdown("### Risk Factor Analysis")
-                if report['risk_factors']:
-                    for rf in report['risk_factors']:
-                        st.markdown(f"**-** {rf}")
-                else:
-                    st.success("No significant risk factors were identified based on the provided data.")
-
-            with breakdown_col2:
-                st.markdown("### Recommended Actions")
-                if report['recommendations']:
-                    # Group recommendations by category for cleaner display
-                    recs_by_category = {}
-                    for rec in report['recommendations']:
-                        recs_by_category.setdefault(rec['category'], []).append(rec['text'])
-                    
-                    for category, texts in recs_by_category.items():
-                        st.markdown(f"**{category}:**")
-                        for text in texts:
-                            st.markdown(f"- {text}")
-                else:
-                    st.markdown("No specific recommendations at this time.")
-
-            with st.expander("ACCESS RAW DATA LOG"):
-                st.json(report)
-                
-        st.markdown("---")
-        if st.button("RUN NEW ANALYSIS", use_container_width=True):
-            st.session_state.step = 0
-            st.rerun()
+        render_report()
 
+# --- Main app logic ---
+st.title("🤖 CyberMind AI: Mental Wellness Protocol")
+
+with st.container(border=False):
+    st.markdown('<div class="main-content">', unsafe_allow_html=True)
+    render_session()
     st.markdown('</div>', unsafe_allow_html=True)
     st.info("DISCLAIMER: This report is a computational simulation and does not substitute for human medical diagnosis. Consult a qualified professional for all health-related concerns.")
@@ -0,0 +1,232 @@
+"""
+Process-wide registry for the trained model and its feature columns.
+
+The model is unpickled, validated and warmed once per process and then shared
+by every Streamlit session, thread and headless entry point. The registry
+watches the model files on disk and reloads them when they change.
+
+The inference engine is chosen at load time with MODEL_ENGINE:
+    numpy     (default) NumPy forest kernel over the pickled forest, parity-checked at load
+    sklearn   the pickled RandomForestClassifier as is
+    artifact  NumPy forest kernel over the memory-mapped `.forest` artifact (no unpickling)
+
+The numpy engine hands batches over 512 rows to the pickled forest. The artifact
+engine has no pickled forest to hand them to, so large batches stay on the
+kernel and run several times slower; use it for the app and the service.
+
+MODEL_ARTIFACT picks the artifact file, e.g. a derived forest from `compress_forest.py`.
+"""
+import logging
+import os
+import threading
+import time
+
+import joblib
+import numpy as np
+
+from encoder import ENCODER_PATH, FeatureEncoder, load_encoder
+from forest_artifact import ARTIFACT_PATH, load_artifact
+from forest_kernel import ForestKernel, check_parity, parity_sample
+from tree_shap import TreeExplainer, check_additivity
+
+logger = logging.getLogger('model_registry')
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, 'mental_health_rf_model.pkl')
+COLUMNS_PATH = os.path.join(BASE_DIR, 'feature_columns.pkl')
+
+ENGINES = ('numpy', 'sklearn', 'artifact')
+MODEL_ENGINE = os.environ.get('MODEL_ENGINE', 'numpy')
+MODEL_ARTIFACT = os.environ.get('MODEL_ARTIFACT', ARTIFACT_PATH)
+
+
+class ModelValidationError(ValueError):
+    """Raised when the model and its feature columns do not fit together."""
+
+
+class LoadedModel:
+    """A validated model, its feature columns, encoders and load statistics."""
+
+    def __init__(self, model, feature_columns, encoder, engine, version, load_seconds, memory_bytes):
+        self.model = model
+        self.feature_columns = feature_columns
+        self.encoder = encoder
+        self.app_encoder = FeatureEncoder.for_app(feature_columns)
+        self.engine = engine
+        self.version = version
+        self.load_seconds = load_seconds
+        self.memory_bytes = memory_bytes
+        self._explainer = None
+
+    @property
+    def explainer(self):
+        """TreeSHAP explainer for the model, built and additivity-checked on first use."""
+        if self._explainer is None:
+            explainer = TreeExplainer.from_model(self.model, self.feature_columns)
+            check_additivity(explainer, self.model, parity_sample(len(self.feature_columns), n_rows=16))
+            self._explainer = explainer
+        return self._explainer
+
+
+def _file_signature(path, optional=False):
+    if optional and not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _estimate_memory(model):
+    """Bytes held by the fitted trees (node and value arrays)."""
+    if hasattr(model, 'nbytes'):
+        return model.nbytes
+    total = 0
+    for estimator in getattr(model, 'estimators_', [model]):
+        tree = getattr(estimator, 'tree_', None)
+        if tree is None:
+            continue
+        state = tree.__getstate__()
+        total += state['nodes'].nbytes + state['values'].nbytes
+    return total
+
+
+def validate_model(model, feature_columns):
+    if not hasattr(model, 'predict_proba'):
+        raise ModelValidationError("Model does not implement predict_proba.")
+    if not feature_columns or len(set(feature_columns)) != len(feature_columns):
+        raise ModelValidationError("Feature columns must be a non-empty list of unique names.")
+    n_features = getattr(model, 'n_features_in_', len(feature_columns))
+    if n_features != len(feature_columns):
+        raise ModelValidationError(
+            f"Model expects {n_features} features but {len(feature_columns)} columns were provided."
+        )
+    names = getattr(model, 'feature_names_in_', None)
+    if names is not None and list(names) != list(feature_columns):
+        raise ModelValidationError("Feature columns do not match the order the model was trained on.")
+
+
+def warm_model(model, feature_columns):
+    """Run one prediction so first-request costs are paid at load time."""
+    model.predict_proba(np.zeros((1, len(feature_columns))))
+
+
+class ModelRegistry:
+    """Loads the model once and reloads it when the files on disk change."""
+
+    def __init__(self, model_path=MODEL_PATH, columns_path=COLUMNS_PATH, encoder_path=ENCODER_PATH,
+                 engine=MODEL_ENGINE, artifact_path=MODEL_ARTIFACT):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown model engine {engine!r}; expected one of {', '.join(ENGINES)}.")
+        self.model_path = model_path
+        self.columns_path = columns_path
+        self.encoder_path = encoder_path
+        self.engine = engine
+        self.artifact_path = artifact_path
+        self.reload_count = 0
+        self.reload_failures = 0
+        self._lock = threading.Lock()
+        self._loaded = None
+        self._signature = None
+
+    def _current_signature(self):
+        if self.engine == 'artifact':
+            model_files = (_file_signature(self.artifact_path),)
+        else:
+            model_files = (_file_signature(self.model_path), _file_signature(self.columns_path))
+        return model_files + (_file_signature(self.encoder_path, optional=True),)
+
+    def _load_model(self):
+        if self.engine == 'artifact':
+            artifact = load_artifact(self.artifact_path)
+            return ForestKernel(artifact), artifact.feature_columns
+        model = joblib.load(self.model_path)
+        feature_columns = list(joblib.load(self.columns_path))
+        validate_model(model, feature_columns)
+        # Column order is owned by the encoders from here on; predicting on plain
+        # arrays skips sklearn's per-call feature-name checks.
+        if hasattr(model, 'feature_names_in_'):
+            del model.feature_names_in_
+        if self.engine == 'numpy':
+            kernel = ForestKernel.from_model(model, feature_columns)
+            check_parity(kernel, model, parity_sample(len(feature_columns)))
+            model = kernel
+        return model, feature_columns
+
+    def _load(self, signature):
+        start = time.perf_counter()
+        model, feature_columns = self._load_model()
+        warm_model(model, feature_columns)
+        encoder = load_encoder(feature_columns, self.encoder_path)
+        load_seconds = time.perf_counter() - start
+        version = '-'.join(f"{sig[0]:x}" for sig in signature if sig is not None)
+        return LoadedModel(model, feature_columns, encoder, self.engine, version, load_seconds, _estimate_memory(model))
+
+    def get(self):
+        """
+        Return the current LoadedModel, reloading it if the files changed. If a reload fails (e.g. files caught
+        mid-write), the previous model keeps serving until the files change again; the first load still raises.
+        """
+        signature = self._current_signature()
+        loaded = self._loaded
+        if loaded is not None and signature == self._signature:
+            return loaded
+        with self._lock:
+            if self._loaded is None or signature != self._signature:
+                try:
+                    loaded = self._load(signature)
+                except Exception:
+                    if self._loaded is None:
+                        raise
+                    self.reload_failures += 1
+                    logger.exception("Reloading the model failed; still serving version %s.", self._loaded.version)
+                else:
+                    if self._loaded is not None:
+                        self.reload_count += 1
+                    self._loaded = loaded
+                self._signature = signature
+            return self._loaded
+
+    def stats(self):
+        loaded = self._loaded
+        if loaded is None:
+            return {'loaded': False, 'reload_count': self.reload_count, 'reload_failures': self.reload_failures}
+        return {
+            'loaded': True,
+            'engine': loaded.engine,
+            'version': loaded.version,
+            'load_seconds': loaded.load_seconds,
+            'memory_bytes': loaded.memory_bytes,
+            'reload_count': self.reload_count,
+            'reload_failures': self.reload_failures,
+        }
+
+    def prometheus_text(self):
+        """Reload counter and current-model gauges in Prometheus text exposition format."""
+        stats = self.stats()
+        lines = [
+            "# TYPE model_reloads_total counter", f"model_reloads_total {stats['reload_count']}",
+            "# TYPE model_reload_failures_total counter", f"model_reload_failures_total {stats['reload_failures']}",
+        ]
+        if stats['loaded']:
+            lines += [
+                "# TYPE model_info gauge",
+                f'model_info{{engine="{stats["engine"]}",version="{stats["version"]}"}} 1',
+                "# TYPE model_load_seconds gauge",
+                f"model_load_seconds {stats['load_seconds']!r}",
+                "# TYPE model_memory_bytes gauge",
+                f"model_memory_bytes {stats['memory_bytes']}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Return the process-wide ModelRegistry."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
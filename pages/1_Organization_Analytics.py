@@ -0,0 +1,97 @@
+import os
+import time
+
+import streamlit as st
+
+from model_registry import get_registry
+from rollups import DIMENSIONS, RollupService
+from survey_store import STORE_PATH
+
+# --- Organization analytics: every number below comes from the pre-aggregated rollup cube (rollups.py) ---
+st.set_page_config(
+    page_title="CyberMind AI: Organization Analytics",
+    page_icon="📊",
+    layout="wide"
+)
+
+DIMENSION_LABELS = {
+    'Country': 'Country',
+    'no_employees': 'Company size',
+    'tech_company': 'Tech company',
+    'benefits': 'Mental health benefits',
+    'treatment': 'Sought treatment',
+}
+# Segments smaller than this are hidden so individual answers cannot be singled out.
+MIN_RESPONSES = 5
+ALL = 'All'
+
+@st.cache_resource
+def load_rollups():
+    return RollupService(os.environ.get('SURVEY_STORE', STORE_PATH))
+
+st.title("📊 Organization Analytics")
+st.markdown("Treatment rates and predicted risk across workplace segments of the survey responses.")
+
+try:
+    loaded_model = get_registry().get()
+except FileNotFoundError:
+    st.warning("Model files not found. Organization analytics needs the trained model.")
+    st.stop()
+
+start = time.perf_counter()
+try:
+    # Folds in survey store partitions appended since the last rerun; a no-op otherwise.
+    cube = load_rollups().get(loaded_model)
+except ValueError as exc:
+    # A forest specialized for the app's answers, or a survey store this version cannot read.
+    st.warning(f"Organization analytics is unavailable: {exc}")
+    st.stop()
+
+# --- Filters ---
+st.sidebar.header("Filters")
+filters = {}
+for dimension in DIMENSIONS:
+    choice = st.sidebar.selectbox(DIMENSION_LABELS[dimension], [ALL] + cube.values(dimension), key=f"filter_{dimension}")
+    if choice != ALL:
+        filters[dimension] = choice
+
+totals = cube.totals(filters)
+if totals['responses'] < MIN_RESPONSES:
+    st.info(f"Fewer than {MIN_RESPONSES} responses match these filters.")
+    st.stop()
+
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.metric(label="Responses", value=f"{totals['responses']:,}")
+with col2:
+    st.metric(label="Treatment Rate", value=f"{totals['treatment_rate'] * 100:.1f}%")
+with col3:
+    st.metric(label="Mean Predicted Risk", value=f"{totals['mean_risk'] * 100:.1f}%")
+
+# --- Breakdown ---
+st.markdown("---")
+group_by = st.selectbox(
+    "Break down by",
+    [dimension for dimension in DIMENSIONS if dimension not in filters] or list(DIMENSIONS),
+    format_func=DIMENSION_LABELS.get,
+)
+table = cube.breakdown(group_by, filters)
+table = table[table['responses'] >= MIN_RESPONSES].sort_values('responses', ascending=False).head(20)
+elapsed = time.perf_counter() - start
+
+chart = (table[['treatment_rate', 'mean_risk']] * 100).rename(
+    columns={'treatment_rate': 'Treatment rate (%)', 'mean_risk': 'Mean predicted risk (%)'}
+)
+st.bar_chart(chart, stack=False)
+st.dataframe(
+    table.rename(columns={'responses': 'Responses', 'treatment_rate': 'Treatment rate', 'mean_risk': 'Mean predicted risk'}),
+    column_config={
+        'Treatment rate': st.column_config.NumberColumn(format="percent"),
+        'Mean predicted risk': st.column_config.NumberColumn(format="percent"),
+    },
+)
+st.caption(
+    f"Answered from {sum(len(cells) for cells in cube.cuboids.values()):,} pre-aggregated cells over "
+    f"{cube.n_rows:,} responses in {len(cube.partitions)} partitions, in {elapsed * 1000:.1f} ms. "
+    f"Segments with fewer than {MIN_RESPONSES} responses are hidden."
+)
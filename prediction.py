@@ -0,0 +1,113 @@
+"""
+Prediction report used by the Streamlit app and the headless entry points.
+
+`build_report` turns the app's raw answers into the structured report shown on
+the results dashboard. The label comes from the same `predict_proba` pass as the
+probability, compared against a configurable decision threshold.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from instrumentation import metrics
+from rules import get_rules
+
+# Probability above which the model's answer is "Treatment Likely".
+# 0.5 reproduces RandomForestClassifier.predict for a binary model.
+DECISION_THRESHOLD = float(os.environ.get('DECISION_THRESHOLD', 0.5))
+
+
+class LatencyTracker:
+    """Keeps the most recent prediction latencies and reports percentiles."""
+
+    def __init__(self, maxlen=1000):
+        self._samples = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def summary(self):
+        with self._lock:
+            samples = np.array(self._samples)
+        if not len(samples):
+            return {'count': 0}
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1000
+        return {'count': len(samples), 'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99}
+
+
+latency = LatencyTracker()
+
+
+def build_report(model, encoder, user_input_data, threshold=DECISION_THRESHOLD, explainer=None):
+    """
+    Returns a structured dictionary with the prediction, risk scoring and recommendations.
+    With a TreeExplainer, the report also carries each feature's contribution to the probability.
+    """
+    timer = metrics.timer()
+    start = time.perf_counter()
+    user_input = encoder.encode(user_input_data)[np.newaxis, :]
+    timer.lap('encode')
+    probability = model.predict_proba(user_input)[0][1]
+    timer.lap('predict_proba')
+    report = assemble_report(user_input_data, probability, threshold, timer)
+    if explainer is not None:
+        add_contributions(report, explainer.expected_value, explainer.explain(user_input[0]))
+        timer.lap('explain')
+
+    elapsed = time.perf_counter() - start
+    latency.record(elapsed)
+    timer.done(probability=float(probability), risk_level=report['risk_level'])
+    report['latency_ms'] = elapsed * 1000
+    return report
+
+
+def assemble_report(user_input_data, probability, threshold=DECISION_THRESHOLD, timer=None):
+    """
+    Builds the report for answers whose class-1 probability is already known,
+    e.g. from one row of a batched `predict_proba` call. Scores, levels and
+    wording come from the rule table in `rules.json`. `timer` (an
+    instrumentation StageTimer) records the scoring and recommendation stages.
+    """
+    rules = get_rules()
+    prediction = 1 if probability > threshold else 0
+
+    # --- Risk Score Calculation ---
+    fired = rules.fired_rules(user_input_data, prediction)
+    risk_score = rules.score(fired)
+    level = rules.level(risk_score)
+    if timer is not None: timer.lap('risk_scoring')
+
+    # --- Risk Factor Analysis & Recommendations ---
+    report = {
+        'prediction': 'Treatment Likely' if prediction == 1 else 'Treatment Unlikely',
+        'probability': probability,
+        'risk_score': risk_score,
+        'risk_level': level.name,
+        'risk_level_color': level.color,
+        'input_data': dict(user_input_data),
+        'risk_factors': rules.risk_factors(fired),
+        'recommendations': rules.recommendations(fired),
+        'explanation': rules.explanation(prediction),
+    }
+    if timer is not None: timer.lap('recommendations')
+
+    return report
+
+
+def require_full_model(loaded):
+    """Raise ValueError for forests specialized to the app's answers (see compress_forest.py)."""
+    artifact = getattr(loaded.model, 'artifact', None)
+    if artifact is not None and artifact.fixed_features:
+        raise ValueError("The loaded forest is specialized for the app's answers and cannot score full survey rows.")
+
+
+def add_contributions(report, base_value, contributions):
+    """Attach TreeSHAP attributions: base_value + sum(contributions) equals the probability."""
+    report['base_value'] = base_value
+    report['contributions'] = contributions
+    return report
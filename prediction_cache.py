@@ -0,0 +1,172 @@
+"""
+Bounded, process-wide cache for prediction results.
+
+Entries are keyed on the canonical encoded feature vector (so answer dicts that
+encode identically share one entry) and evicted least-recently-used once either
+`max_entries` or the approximate `max_bytes` budget is exceeded. An optional TTL
+expires old entries, and the whole cache is invalidated when the model version
+changes. Cached values are shared, not copied: treat them as read-only.
+"""
+import math
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def approximate_size(obj):
+    """Rough deep size in bytes of a report, DataFrame or nested container."""
+    if hasattr(obj, 'memory_usage') and callable(obj.memory_usage):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(approximate_size(k) + approximate_size(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(approximate_size(item) for item in obj)
+    return sys.getsizeof(obj)
+
+
+def parse_ttl(value):
+    """A TTL setting such as PREDICTION_CACHE_TTL: None when empty, else positive seconds (ValueError otherwise)."""
+    if value is None or not str(value).strip():
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        seconds = float('nan')
+    if not math.isfinite(seconds) or seconds <= 0:
+        raise ValueError(f"Expected a positive number of seconds, got {value!r}.")
+    return seconds
+
+
+def feature_key(row):
+    """Canonical cache key for an encoded feature row."""
+    return np.ascontiguousarray(row, dtype=np.float64).tobytes()
+
+
+class PredictionCache:
+    """Thread-safe LRU cache with an entry limit, a memory budget and an optional TTL."""
+
+    def __init__(self, max_entries=4096, max_bytes=32 * 1024 * 1024, ttl_seconds=None, name='predictions',
+                 clock=time.monotonic):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()  # key -> (value, size, stored_at), least recently used first
+        self._stored = OrderedDict()   # key -> stored_at, oldest first (TTL order, unaffected by hits)
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self._clock = clock
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._stored.clear()
+            self._bytes = 0
+            self._version = version
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        del self._stored[key]
+        self._bytes -= size
+
+    def _expired(self, stored_at, now):
+        return self.ttl_seconds is not None and now - stored_at > self.ttl_seconds
+
+    def _remove_expired(self, now):
+        """Drop every expired entry, oldest first, so dead entries stop counting against the budget."""
+        while self._stored:
+            key, stored_at = next(iter(self._stored.items()))
+            if not self._expired(stored_at, now):
+                break
+            self._remove(key)
+            self.expirations += 1
+
+    def get(self, key, version=None):
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if self._expired(entry[2], self._clock()):
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, version=None):
+        size = approximate_size(value)
+        with self._lock:
+            self._check_version(version)
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            now = self._clock()
+            self._entries[key] = (value, size, now)
+            self._stored[key] = now
+            self._bytes += size
+            if len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove_expired(now)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute, version=None):
+        """Return the cached value for `key`, computing and storing it on a miss."""
+        value = self.get(key, version)
+        if value is None:
+            value = compute()
+            self.put(key, value, version)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stored.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+    def prometheus_text(self):
+        """Counters and gauges in Prometheus text exposition format."""
+        return prometheus_text([self])
+
+
+def prometheus_text(caches):
+    """Exposition text for several caches, with one TYPE line per metric family."""
+    stats = [(cache.name, cache.stats()) for cache in caches]
+    lines = []
+    for kind, names in (('counter', ('hits', 'misses', 'evictions', 'expirations', 'invalidations')),
+                        ('gauge', ('entries', 'bytes'))):
+        for stat in names:
+            metric = f"prediction_cache_{stat}_total" if kind == 'counter' else f"prediction_cache_{stat}"
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.extend(f'{metric}{{cache="{name}"}} {values[stat]}' for name, values in stats)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,224 @@
+"""
+Pre-aggregated rollup cube over survey responses for the organization dashboard.
+
+Every subset of DIMENSIONS (2^5 = 32 group-bys, the empty one being the grand
+total) is materialized as a dict from dimension values to
+[responses, treated, risk_sum]. Any filter, meaning a value or "all" for each
+dimension, is one dict lookup. A breakdown by one dimension is one lookup per
+value of that dimension. Neither touches raw rows.
+
+The cube is fed from the survey store (survey_store.py) one partition at a time.
+It remembers which partitions it has folded in, so an update only aggregates
+partitions appended since. `risk_sum` holds the model's predicted probability,
+so the cube is rebuilt from scratch when the model version changes. The cube is
+saved as `rollups.json` inside the store.
+
+Usage (bring the store's cube up to date and compare query time with a pandas group-by):
+    python rollups.py [--store survey_store]
+"""
+import argparse
+import itertools
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from encoder import MISSING_VALUE, SURVEY_PATH
+from prediction import require_full_model
+from survey_store import STORE_PATH, SurveyStore
+
+DIMENSIONS = ('Country', 'no_employees', 'tech_company', 'benefits', 'treatment')
+MEASURES = ('responses', 'treated', 'risk_sum')
+ROLLUPS_FILE = 'rollups.json'
+SCHEMA_VERSION = 1
+_EMPTY = np.zeros(len(MEASURES))
+
+
+def _dimension_values(column):
+    """Answers with missing ones as 'Unknown', keeping categorical columns categorical."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        if MISSING_VALUE not in column.cat.categories:
+            column = column.cat.add_categories([MISSING_VALUE])
+        return column.fillna(MISSING_VALUE)
+    return column.fillna(MISSING_VALUE).astype(str)
+
+
+class RollupCube:
+    """Counts, treatment rate and mean predicted risk for every combination of dimension filters."""
+
+    def __init__(self, dimensions=DIMENSIONS, model_version=None):
+        self.dimensions = tuple(dimensions)
+        self.model_version = model_version
+        self.partitions = []
+        self.cuboids = {
+            subset: {}
+            for size in range(len(self.dimensions) + 1)
+            for subset in itertools.combinations(self.dimensions, size)
+        }
+
+    @property
+    def n_rows(self):
+        return int(self.cuboids[()].get((), _EMPTY)[0])
+
+    def values(self, dimension):
+        """Every value seen for `dimension`, sorted."""
+        return sorted(value for (value,) in self.cuboids[(dimension,)])
+
+    # --- Updates ---
+
+    def add(self, frame, probability):
+        """Fold a batch of raw answers (with the 'treatment' column) and their predicted probabilities into the cube."""
+        batch = pd.DataFrame({dimension: _dimension_values(frame[dimension]) for dimension in self.dimensions})
+        batch['responses'] = 1.0
+        batch['treated'] = (frame['treatment'] == 'Yes').to_numpy(dtype=float)
+        batch['risk_sum'] = probability
+        base = batch.groupby(list(self.dimensions), observed=True, sort=False)[list(MEASURES)].sum()
+        for subset, cells in self.cuboids.items():
+            if subset:
+                rolled = base.groupby(level=list(subset), observed=True, sort=False).sum()
+                keys = (key if isinstance(key, tuple) else (key,) for key in rolled.index)
+            else:
+                rolled = base.sum().to_frame().T
+                keys = [()]
+            for key, row in zip(keys, rolled.to_numpy()):
+                cells[key] = cells.get(key, _EMPTY) + row
+
+    # --- Queries ---
+
+    def totals(self, filters=None):
+        """{responses, treatment_rate, mean_risk} for rows matching `filters` ({dimension: value})."""
+        filters = filters or {}
+        subset = tuple(dimension for dimension in self.dimensions if dimension in filters)
+        responses, treated, risk_sum = self.cuboids[subset].get(tuple(filters[d] for d in subset), _EMPTY)
+        return {
+            'responses': int(responses),
+            'treatment_rate': treated / responses if responses else float('nan'),
+            'mean_risk': risk_sum / responses if responses else float('nan'),
+        }
+
+    def breakdown(self, dimension, filters=None):
+        """One row of totals per value of `dimension` under `filters`, for values with any responses."""
+        filters = {d: value for d, value in (filters or {}).items() if d != dimension}
+        rows = {value: self.totals({**filters, dimension: value}) for value in self.values(dimension)}
+        table = pd.DataFrame.from_dict(rows, orient='index', columns=['responses', 'treatment_rate', 'mean_risk'])
+        table.index.name = dimension
+        return table[table['responses'] > 0]
+
+    # --- Persistence ---
+
+    def to_dict(self):
+        return {
+            'schema_version': SCHEMA_VERSION,
+            'dimensions': list(self.dimensions),
+            'model_version': self.model_version,
+            'partitions': self.partitions,
+            'cuboids': [
+                {'dimensions': list(subset), 'cells': [[*key, *cell.tolist()] for key, cell in cells.items()]}
+                for subset, cells in self.cuboids.items()
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        cube = cls(data['dimensions'], data['model_version'])
+        cube.partitions = list(data['partitions'])
+        for cuboid in data['cuboids']:
+            size = len(cuboid['dimensions'])
+            cube.cuboids[tuple(cuboid['dimensions'])] = {
+                tuple(cell[:size]): np.array(cell[size:], dtype=float) for cell in cuboid['cells']
+            }
+        return cube
+
+    def save(self, path):
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(path + '.tmp', path)
+
+
+def load_cube(path, dimensions=DIMENSIONS):
+    """The saved cube, or None when there is none or it covers other dimensions or schema."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('schema_version') != SCHEMA_VERSION or tuple(data['dimensions']) != tuple(dimensions):
+        return None
+    return RollupCube.from_dict(data)
+
+
+def refresh_cube(cube, store, loaded):
+    """Fold the store's new partitions into `cube` (rebuilt when the model changed); returns the cube and rows added."""
+    require_full_model(loaded)
+    store.refresh()
+    if cube is None or cube.model_version != loaded.version:
+        cube = RollupCube(model_version=loaded.version)
+    added = 0
+    for partition in store.partitions:
+        if partition in cube.partitions:
+            continue
+        frame = store.read(list(cube.dimensions), [partition])
+        probability = loaded.model.predict_proba(store.features(loaded.encoder, [partition]))[:, 1]
+        cube.add(frame, probability)
+        cube.partitions.append(partition)
+        added += len(frame)
+    return cube, added
+
+
+class RollupService:
+    """Process-wide cube over one survey store, persisted next to it and refreshed on demand."""
+
+    def __init__(self, store_path=STORE_PATH, bootstrap_path=SURVEY_PATH):
+        self.store = SurveyStore(store_path)
+        if not self.store.partitions and bootstrap_path:
+            # First run: seed the store with the training survey so the dashboard has data.
+            self.store.seed(lambda: pd.read_csv(bootstrap_path, dtype=str))
+        self.path = os.path.join(store_path, ROLLUPS_FILE)
+        self.cube = load_cube(self.path)
+        self._lock = threading.Lock()
+
+    def get(self, loaded):
+        """The cube with every committed partition folded in."""
+        with self._lock:
+            cube, added = refresh_cube(self.cube, self.store, loaded)
+            if added or cube is not self.cube:
+                cube.save(self.path)
+            self.cube = cube
+            return cube
+
+
+def main(argv=None):
+    from model_registry import get_registry
+
+    parser = argparse.ArgumentParser(description="Update the organization rollup cube from the survey store.")
+    parser.add_argument('--store', default=STORE_PATH)
+    args = parser.parse_args(argv)
+
+    loaded = get_registry().get()
+    service = RollupService(args.store)
+    start = time.perf_counter()
+    cube = service.get(loaded)
+    print(f"Cube over {cube.n_rows} rows in {len(cube.partitions)} partitions, "
+          f"{sum(len(cells) for cells in cube.cuboids.values())} cells, updated in {time.perf_counter() - start:.2f}s")
+
+    filters = {'tech_company': 'Yes', 'benefits': 'Yes'}
+    start = time.perf_counter()
+    for _ in range(100):
+        cube.breakdown('no_employees', filters)
+    cube_ms = (time.perf_counter() - start) * 10
+    frame = service.store.read(list(DIMENSIONS))
+    start = time.perf_counter()
+    matching = frame[(frame['tech_company'] == 'Yes') & (frame['benefits'] == 'Yes')]
+    expected = matching.groupby('no_employees', observed=True)['treatment'].apply(lambda t: (t == 'Yes').mean())
+    scan_ms = (time.perf_counter() - start) * 1000
+    actual = cube.breakdown('no_employees', filters)['treatment_rate']
+    if not np.allclose(actual.loc[expected.index], expected):
+        raise AssertionError("Cube treatment rates disagree with a scan of the raw rows.")
+    print(f"Breakdown of no_employees for {filters}: cube {cube_ms:.2f} ms, scan of raw rows {scan_ms:.2f} ms")
+    print(cube.breakdown('no_employees', filters).to_string(float_format=lambda value: f"{value:.3f}"))
+
+
+if __name__ == '__main__':
+    main()
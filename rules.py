@@ -0,0 +1,270 @@
+"""
+Declarative rule engine for the risk score, risk level, risk factors and recommendations.
+
+The rules live in `rules.json` (or the file named by RULES_PATH) so weights,
+thresholds and wording can change without touching the code:
+
+    {"name": "age", "when": [{"field": "Age", "op": ">", "value": 45}], "weight": 1,
+     "risk_factor": "...", "recommendation": {"category": "...", "text": "..."}}
+
+A rule fires when all of its conditions hold; the risk score is the sum of the
+weights of the rules that fire, and the risk level is the first level whose
+`above` threshold the score exceeds. Fields are raw survey answers (`Age`,
+`family_history`, ...) plus `prediction`, the model's 0/1 answer. Missing
+answers compare unequal to every value, and non-numeric ones count as 0 in
+numeric comparisons.
+
+Each condition compiles to one boolean-mask operation, so a whole batch is
+scored in a single vectorized pass (`scores`, `levels_for`); single reports use the
+same compiled conditions on scalars. The file is re-read when it changes.
+
+Usage (check that a rule file follows the schema):
+    python rules.py
+    python rules.py --rules custom_rules.json
+"""
+import argparse
+import json
+import math
+import operator
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RULES_PATH = os.environ.get('RULES_PATH', os.path.join(BASE_DIR, 'rules.json'))
+SCHEMA_VERSION = 1
+
+OPS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    'in': None,
+    'not_in': None,
+}
+# The app's answer dicts use lower-case keys for the survey's `Age`.
+APP_ALIASES = {'age': 'Age'}
+
+
+class RuleConfigError(ValueError):
+    """Raised for rule files that do not follow the schema."""
+
+
+def _to_number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if math.isnan(number) else number
+
+
+class Condition:
+    """One `field op value` test, usable on a scalar answer or a whole column."""
+
+    def __init__(self, field, op, value):
+        if op not in OPS:
+            raise RuleConfigError(f"Unknown operator {op!r}; expected one of {', '.join(OPS)}.")
+        if op in ('in', 'not_in') and not isinstance(value, list):
+            raise RuleConfigError(f"Operator {op!r} needs a list value (field {field!r}).")
+        self.field = field
+        self.op = op
+        self.value = value
+        self.numeric = op not in ('in', 'not_in') and isinstance(value, (int, float)) and not isinstance(value, bool)
+
+    def holds(self, answer):
+        if self.numeric:
+            answer = _to_number(answer)
+        if self.op == 'in':
+            return answer in self.value
+        if self.op == 'not_in':
+            return answer not in self.value
+        try:
+            return bool(OPS[self.op](answer, self.value))
+        except TypeError:
+            return False  # ordering a missing or non-string answer against a string
+
+    def mask(self, column, n_rows):
+        """Boolean mask over a Series of answers (None when the column is missing)."""
+        if column is None:
+            return np.full(n_rows, self.holds(None))
+        if self.op in ('in', 'not_in'):
+            isin = column.isin(self.value).to_numpy()
+            return isin if self.op == 'in' else ~isin
+        if self.numeric:
+            column = pd.to_numeric(column, errors='coerce').fillna(0)
+        # Comparisons on pandas string columns keep missing answers as NA; resolve them like `holds(None)`.
+        return OPS[self.op](column, self.value).to_numpy(dtype=bool, na_value=self.holds(None))
+
+
+class Rule:
+    def __init__(self, name, conditions, weight=0, risk_factor=None, recommendation=None):
+        self.name = name
+        self.conditions = conditions
+        self.weight = weight
+        self.risk_factor = risk_factor
+        self.recommendation = recommendation
+
+    def fires(self, answers):
+        return all(condition.holds(answers.get(condition.field)) for condition in self.conditions)
+
+
+class Level:
+    def __init__(self, name, color, above=None):
+        self.name = name
+        self.color = color
+        self.above = above
+
+
+class RuleEngine:
+    """Compiled rule table: scalar report fields for one person, masks and scores for a batch."""
+
+    def __init__(self, rules, levels, no_risk_factors_recommendation=None, explanations=None, version=None):
+        self.rules = rules
+        self.levels = levels
+        self.no_risk_factors_recommendation = no_risk_factors_recommendation
+        self.explanations = explanations or {}
+        self.version = version
+        self.weights = np.array([rule.weight for rule in rules])
+
+    @classmethod
+    def from_config(cls, config, version=None):
+        if config.get('schema_version') != SCHEMA_VERSION:
+            raise RuleConfigError(f"Unsupported rules schema_version {config.get('schema_version')!r}.")
+        try:
+            rules = []
+            for spec in config['rules']:
+                conditions = [Condition(cond['field'], cond['op'], cond['value']) for cond in spec['when']]
+                if not conditions:
+                    raise RuleConfigError(f"Rule {spec['name']!r} has no conditions.")
+                weight = spec.get('weight', 0)
+                if isinstance(weight, bool) or not isinstance(weight, (int, float)):
+                    raise RuleConfigError(f"Rule {spec['name']!r} has a non-numeric weight.")
+                recommendation = spec.get('recommendation')
+                if recommendation is not None and set(recommendation) != {'category', 'text'}:
+                    raise RuleConfigError(f"Rule {spec['name']!r} recommendation needs 'category' and 'text'.")
+                rules.append(Rule(spec['name'], conditions, weight, spec.get('risk_factor'), recommendation))
+            levels = [Level(spec['name'], spec['color'], spec.get('above')) for spec in config['levels']]
+        except (KeyError, TypeError) as exc:
+            raise RuleConfigError(f"Malformed rules file: {exc!r}") from exc
+
+        thresholds = [level.above for level in levels[:-1]]
+        if not levels or levels[-1].above is not None or None in thresholds or thresholds != sorted(thresholds, reverse=True):
+            raise RuleConfigError("Levels must list strictly decreasing 'above' thresholds and end with a default level.")
+        if len(set(thresholds)) != len(thresholds):
+            raise RuleConfigError("Level thresholds must be distinct.")
+        return cls(rules, levels, config.get('no_risk_factors_recommendation'), config.get('explanations'), version)
+
+    @classmethod
+    def from_file(cls, path=RULES_PATH):
+        with open(path, encoding='utf-8') as f:
+            try:
+                config = json.load(f)
+            except ValueError as exc:
+                raise RuleConfigError(f"{path} is not valid JSON: {exc}") from exc
+        stat = os.stat(path)
+        return cls.from_config(config, version=f"{stat.st_mtime_ns:x}")
+
+    # --- One person (app, service) ---
+
+    def fired_rules(self, user_input_data, prediction):
+        answers = {APP_ALIASES.get(key, key): value for key, value in user_input_data.items()}
+        answers['prediction'] = prediction
+        return [rule for rule in self.rules if rule.fires(answers)]
+
+    def score(self, fired):
+        return sum(rule.weight for rule in fired)
+
+    def level(self, score):
+        for level in self.levels[:-1]:
+            if score > level.above:
+                return level
+        return self.levels[-1]
+
+    def risk_factors(self, fired):
+        return [rule.risk_factor for rule in fired if rule.risk_factor]
+
+    def recommendations(self, fired):
+        recommendations = [dict(rule.recommendation) for rule in fired if rule.recommendation]
+        if not self.risk_factors(fired) and self.no_risk_factors_recommendation:
+            recommendations.append(dict(self.no_risk_factors_recommendation))
+        return recommendations
+
+    def explanation(self, prediction):
+        return self.explanations.get(str(prediction), "")
+
+    # --- Whole batches ---
+
+    @property
+    def fields(self):
+        """Answer columns the rules read, besides the model's `prediction`."""
+        return sorted({condition.field for rule in self.rules for condition in rule.conditions} - {'prediction'})
+
+    def masks(self, frame, prediction):
+        """(n_rows, n_rules) boolean matrix of which rules fire for each row of raw answers."""
+        n_rows = len(prediction)
+        columns = {'prediction': pd.Series(np.asarray(prediction))}
+        out = np.ones((n_rows, len(self.rules)), dtype=bool)
+        for j, rule in enumerate(self.rules):
+            for condition in rule.conditions:
+                field = condition.field
+                column = columns[field] if field in columns else frame.get(field)
+                out[:, j] &= condition.mask(column, n_rows)
+        return out
+
+    def scores(self, frame, prediction):
+        masks = self.masks(frame, prediction)
+        weights = self.weights if self.weights.dtype.kind == 'f' else self.weights.astype(np.int64)
+        return masks @ weights if len(self.rules) else np.zeros(len(prediction), dtype=np.int64)
+
+    def levels_for(self, scores):
+        return np.select([scores > level.above for level in self.levels[:-1]],
+                         [level.name for level in self.levels[:-1]], self.levels[-1].name)
+
+
+_engine = None
+_engine_key = None
+_engine_lock = threading.Lock()
+
+
+def get_rules(path=RULES_PATH):
+    """Return the compiled rule table, re-reading the file when it changes."""
+    global _engine, _engine_key
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if key != _engine_key:
+        with _engine_lock:
+            if key != _engine_key:
+                _engine = RuleEngine.from_file(path)
+                _engine_key = key
+    return _engine
+
+
+def risk_scores(frame, prediction):
+    """Rule-table risk score for every row of raw answers, in one vectorized pass."""
+    return get_rules().scores(frame, prediction)
+
+
+def risk_levels(score):
+    return get_rules().levels_for(score)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that a rule file follows the schema.")
+    parser.add_argument('--rules', default=RULES_PATH)
+    args = parser.parse_args(argv)
+    try:
+        engine = RuleEngine.from_file(args.rules)
+    except RuleConfigError as exc:
+        print(exc)
+        sys.exit(1)
+    levels = ', '.join(level.name if level.above is None else f"{level.name} > {level.above}" for level in engine.levels)
+    print(f"{len(engine.rules)} rules on {', '.join(engine.fields)}; levels: {levels}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,411 @@
+"""
+Async HTTP inference service with dynamic micro-batching.
+
+A dependency-free ASGI application exposing the app's prediction report as JSON:
+
+    POST /predict         {"age": 35, "family_history": "Yes", ...}      -> report
+    POST /predict/batch   {"records": [{...}, {...}]}                      -> {"reports": [...]}
+    POST /what-if         {"answers": {...}, "max_changes": 2}             -> {"scenarios": [...]}
+    GET  /healthz                                                          -> model and batching stats
+    GET  /metrics                                                          -> Prometheus text
+    GET  /debug/profile                                                    -> collapsed stacks (PROFILER_INTERVAL_MS)
+
+Concurrent requests are queued and coalesced into micro-batches (up to
+`max_batch_size` rows, waiting at most `max_wait_ms` for a batch to fill)
+before a single `predict_proba` call. Inference runs in a pool of worker
+processes, one model per process, so the event loop never blocks and
+throughput scales with cores rather than with request count. With `--explain`,
+reports also carry each feature's TreeSHAP contribution to the probability.
+That is off by default because explaining a batch costs many times more than
+predicting it.
+
+Usage (requires `uvicorn`):
+    python service.py --port 8000 --workers 4 --max-batch-size 64 --max-wait-ms 5
+    python service.py --explain    # or SERVICE_EXPLAIN=1
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from drift_monitor import get_monitor, prometheus_text as drift_prometheus_text
+from encoder import APP_FIELDS
+from instrumentation import metrics
+from lookup_table import AGE_RANGE
+from model_registry import get_registry
+from prediction import DECISION_THRESHOLD, add_contributions, assemble_report
+from tree_shap import contributions_dict
+from what_if import WHAT_IF_FACTORS, run_sweep
+
+YES_NO = ("Yes", "No")
+MAX_BATCH_RECORDS = 10000
+
+
+class BadRequest(ValueError):
+    """Raised for malformed request bodies; reported to the client as HTTP 400."""
+
+
+def validate_answers(answers):
+    if not isinstance(answers, dict):
+        raise BadRequest("Answers must be a JSON object.")
+    missing = [name for name in APP_FIELDS if name not in answers]
+    if missing:
+        raise BadRequest(f"Missing answers: {', '.join(missing)}.")
+    age = answers['age']
+    if isinstance(age, bool) or not isinstance(age, (int, float)) or not math.isfinite(age):
+        raise BadRequest("'age' must be a number.")
+    if not AGE_RANGE[0] <= age <= AGE_RANGE[1]:
+        raise BadRequest(f"'age' must be between {AGE_RANGE[0]} and {AGE_RANGE[1]}.")
+    for name in APP_FIELDS:
+        if name != 'age' and answers[name] not in YES_NO:
+            raise BadRequest(f"'{name}' must be 'Yes' or 'No'.")
+    return {name: answers[name] for name in APP_FIELDS}
+
+
+# --- Worker-side functions (run in the executor, one model per process) ---
+
+def _predict_batch(X):
+    return get_registry().get().model.predict_proba(X)[:, 1]
+
+
+def _predict_explain_batch(X):
+    """Per row: the class-1 probability followed by each feature's TreeSHAP contribution."""
+    loaded = get_registry().get()
+    return np.column_stack([loaded.model.predict_proba(X)[:, 1], loaded.explainer.shap_values(X)])
+
+
+def _what_if(answers, max_changes):
+    loaded = get_registry().get()
+    table = run_sweep(loaded.model, loaded.app_encoder, answers, WHAT_IF_FACTORS, max_changes)
+    table['factors'] = table['factors'].map(list)
+    return table.to_dict(orient='records')
+
+
+def _warm_worker(explain=False):
+    loaded = get_registry().get()
+    if explain:
+        loaded.explainer
+
+
+class MicroBatcher:
+    """Coalesces single-row requests into batched calls on an executor."""
+
+    def __init__(self, executor, run_batch, max_batch_size=64, max_wait_ms=5.0, max_in_flight=None, on_broken=None):
+        self.executor = executor
+        self.run_batch = run_batch
+        self.on_broken = on_broken  # called with the executor when its worker pool breaks
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.rows = 0
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(max_in_flight or os.cpu_count() or 1)
+        self._task = None
+        self._dispatches = set()  # strong references, so pending dispatch tasks are not garbage-collected
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._collect())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._dispatches):
+            task.cancel()
+
+    async def submit(self, row):
+        """Queue one encoded row and wait for its row of `run_batch` output."""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(items) < self.max_batch_size:
+                if not self._queue.empty():
+                    items.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Several batches may be in flight at once, one per worker slot.
+            await self._slots.acquire()
+            task = loop.create_task(self._dispatch(items))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, items):
+        executor = self.executor
+        try:
+            X = np.vstack([row for row, _ in items])
+            results = await asyncio.get_running_loop().run_in_executor(executor, self.run_batch, X)
+            self.batches += 1
+            self.rows += len(items)
+            metrics.increment('prediction_batches')
+            metrics.increment('prediction_batch_rows', len(items))
+            for (_, future), result in zip(items, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as exc:
+            if isinstance(exc, BrokenExecutor) and self.on_broken is not None:
+                self.on_broken(executor)
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(exc)
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'rows': self.rows,
+            'mean_batch_size': self.rows / self.batches if self.batches else 0.0,
+            'queued': self._queue.qsize(),
+        }
+
+
+class InferenceService:
+    """ASGI application. Executor and batcher are created on first use or at lifespan startup."""
+
+    def __init__(self, max_batch_size=64, max_wait_ms=5.0, workers=None, executor='process', threshold=DECISION_THRESHOLD,
+                 explain=False):
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.workers = workers or os.cpu_count() or 1
+        self.executor_kind = executor
+        self.threshold = threshold
+        self.explain = explain
+        self.executor = None
+        self.batcher = None
+        self.routes = {
+            ('POST', '/predict'): self.predict,
+            ('POST', '/predict/batch'): self.predict_batch,
+            ('POST', '/what-if'): self.what_if,
+            ('GET', '/healthz'): self.health,
+            ('GET', '/metrics'): self.prometheus,
+            ('GET', '/debug/profile'): self.profile,
+        }
+        metrics.add_collector(get_registry().prometheus_text)
+        metrics.add_collector(drift_prometheus_text)
+
+    def _new_executor(self):
+        pool = ProcessPoolExecutor if self.executor_kind == 'process' else ThreadPoolExecutor
+        return pool(max_workers=self.workers, initializer=_warm_worker, initargs=(self.explain,))
+
+    def _replace_executor(self, broken):
+        """Swap in a fresh worker pool after one died; the batch that hit the broken pool fails, later ones run."""
+        if self.executor is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.executor = self._new_executor()
+            self.batcher.executor = self.executor
+            metrics.increment('worker_pool_restarts')
+
+    async def _loaded_model(self):
+        """The current model, resolved off the event loop: a reload (unpickle, parity check, warm-up) blocks a thread."""
+        return await asyncio.to_thread(get_registry().get)
+
+    def _warm(self):
+        # The event loop process only needs the encoders, but loading here keeps the first request fast.
+        loaded = get_registry().get()
+        if self.explain:
+            loaded.explainer
+        get_monitor('service', loaded)
+
+    async def _ensure_started(self):
+        if self.executor is None:
+            await asyncio.to_thread(self._warm)
+            if self.executor is not None:  # another request started it meanwhile
+                return
+            self.executor = self._new_executor()
+            run_batch = _predict_explain_batch if self.explain else _predict_batch
+            self.batcher = MicroBatcher(self.executor, run_batch, self.max_batch_size, self.max_wait_ms, self.workers,
+                                        on_broken=self._replace_executor)
+
+    async def shutdown(self):
+        if self.batcher is not None:
+            await self.batcher.stop()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+            self.batcher = None
+
+    # --- Endpoints ---
+
+    async def _report(self, answers):
+        answers = validate_answers(answers)
+        timer = metrics.timer()
+        loaded = await self._loaded_model()
+        row = loaded.app_encoder.encode(answers)
+        timer.lap('encode')
+        result = await self.batcher.submit(row)
+        timer.lap('batched_predict_proba')
+        probability = float(result[0]) if self.explain else float(result)
+        report = assemble_report(answers, probability, self.threshold, timer)
+        monitor = get_monitor('service', loaded)
+        if monitor is not None:
+            monitor.observe(row, [probability])
+        if self.explain:
+            add_contributions(report, loaded.explainer.expected_value, contributions_dict(loaded.feature_columns, result[1:]))
+        timer.done(probability=probability, risk_level=report['risk_level'])
+        return report
+
+    async def predict(self, body):
+        return await self._report(body)
+
+    async def predict_batch(self, body):
+        records = body.get('records') if isinstance(body, dict) else None
+        if not isinstance(records, list):
+            raise BadRequest("Expected a JSON object with a 'records' list.")
+        if len(records) > MAX_BATCH_RECORDS:
+            raise BadRequest(f"At most {MAX_BATCH_RECORDS} records per request.")
+        return {'reports': await asyncio.gather(*(self._report(record) for record in records))}
+
+    async def what_if(self, body):
+        if not isinstance(body, dict):
+            raise BadRequest("Expected a JSON object with an 'answers' object.")
+        answers = validate_answers(body.get('answers'))
+        max_changes = body.get('max_changes', 2)
+        if isinstance(max_changes, bool) or max_changes not in range(1, len(WHAT_IF_FACTORS) + 1):
+            raise BadRequest(f"'max_changes' must be an integer between 1 and {len(WHAT_IF_FACTORS)}.")
+        executor = self.executor
+        try:
+            scenarios = await asyncio.get_running_loop().run_in_executor(executor, _what_if, answers, max_changes)
+        except BrokenExecutor:
+            self._replace_executor(executor)
+            raise
+        return {'scenarios': scenarios}
+
+    async def health(self, body):
+        return {'status': 'ok', 'model': get_registry().stats(), 'batching': self.batcher.stats()}
+
+    async def prometheus(self, body):
+        return metrics.prometheus_text()
+
+    async def profile(self, body):
+        if metrics.profiler is None:
+            raise BadRequest("Profiler is off; set PROFILER_INTERVAL_MS to enable it.")
+        return metrics.profiler.collapsed()
+
+    # --- ASGI plumbing ---
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        await self._ensure_started()
+        handler = self.routes.get((scope['method'], scope['path']))
+        if handler is None:
+            await _send_json(send, 404, {'error': f"No route for {scope['method']} {scope['path']}."})
+            return
+        try:
+            body = await _read_json(receive) if scope['method'] == 'POST' else None
+            result = await handler(body)
+            if isinstance(result, str):
+                await _send_text(send, 200, result)
+            else:
+                await _send_json(send, 200, result)
+        except BadRequest as exc:
+            await _send_json(send, 400, {'error': str(exc)})
+        except Exception as exc:
+            await _send_json(send, 500, {'error': f"{type(exc).__name__}: {exc}"})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await self._ensure_started()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+async def _read_json(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    try:
+        return json.loads(b''.join(chunks) or b'null')
+    except ValueError:
+        raise BadRequest("Request body is not valid JSON.")
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+async def _send_json(send, status, payload):
+    body = json.dumps(payload, default=_json_default).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _send_text(send, status, text):
+    body = text.encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'text/plain; version=0.0.4'), (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def create_app():
+    """App factory configured from the environment, for `uvicorn service:create_app --factory`."""
+    return InferenceService(
+        max_batch_size=int(os.environ.get('SERVICE_MAX_BATCH_SIZE', 64)),
+        max_wait_ms=float(os.environ.get('SERVICE_MAX_WAIT_MS', 5)),
+        workers=int(os.environ.get('SERVICE_WORKERS', 0)) or None,
+        executor=os.environ.get('SERVICE_EXECUTOR', 'process'),
+        explain=os.environ.get('SERVICE_EXPLAIN', '0') != '0',
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the mental health model over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=0, help="inference worker processes (0 = all cores)")
+    parser.add_argument('--executor', choices=('process', 'thread'), default='process')
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--explain', action='store_true', help="add TreeSHAP contributions to reports (much slower)")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    app = InferenceService(args.max_batch_size, args.max_wait_ms, args.workers or None, args.executor,
+                           explain=args.explain)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
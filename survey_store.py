@@ -0,0 +1,287 @@
+"""
+Columnar on-disk store for survey exports shaped like `survey.csv`.
+
+Each append becomes a partition directory with one `.npy` file per column:
+dictionary codes (int16/int32, -1 for missing) for categorical answers, float64
+for `Age` and datetime64[s] for `Timestamp`. The free-text `comments` column is
+not stored. Category dictionaries are append-only JSON lists in the manifest, so
+codes never change once written. The manifest is the commit point: a partition
+becomes visible only after it is fully written and the manifest is replaced.
+Writers in different processes take turns through an exclusive lock on
+`survey_store/.lock`.
+
+    survey_store/
+        manifest.json              schema, dictionaries, partitions
+        part-000000/Age.npy ...    one file per column, memory-mapped on read
+        part-000000/cache/         encoded feature matrices, one per encoder
+
+Reads are lazy: only the requested columns' files are opened. Cleaning works on
+dictionaries, so each distinct answer is cleaned once, not once per row. The
+encoded model matrix is cached per partition, keyed by the encoder's hash, so
+appending only encodes the new partition.
+
+Usage (append exports, then print the store's layout and read timings):
+    python survey_store.py survey.csv [more.csv ...] [--store survey_store] [--partition-rows 100000]
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, so run one writer at a time by hand.
+    fcntl = None
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from encoder import BASE_DIR, NUMERIC_COLUMNS, SURVEY_PATH
+
+STORE_PATH = os.path.join(BASE_DIR, 'survey_store')
+SCHEMA_VERSION = 1
+DEFAULT_PARTITION_ROWS = 100000
+DATETIME_COLUMNS = ('Timestamp',)
+SKIP_COLUMNS = ('comments',)
+MANIFEST = 'manifest.json'
+LOCK_FILE = '.lock'
+
+
+class StoreError(ValueError):
+    """Raised for a store with an unknown schema or a missing column."""
+
+
+def column_kind(column):
+    if column in NUMERIC_COLUMNS:
+        return 'numeric'
+    if column in DATETIME_COLUMNS:
+        return 'datetime'
+    return 'category'
+
+
+class SurveyStore:
+    """Partitioned, dictionary-encoded survey columns. One writer at a time; any number of readers."""
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self._manifest_mtime = None
+        self.refresh()
+
+    # --- Manifest ---
+
+    def refresh(self):
+        """Re-read the manifest if another process appended; returns True when it changed."""
+        manifest_path = os.path.join(self.path, MANIFEST)
+        mtime = os.stat(manifest_path).st_mtime_ns if os.path.exists(manifest_path) else None
+        if mtime is not None and mtime == self._manifest_mtime:
+            return False
+        manifest = {'schema_version': SCHEMA_VERSION, 'columns': {}, 'dictionaries': {}, 'partitions': []}
+        if mtime is not None:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            if manifest.get('schema_version') != SCHEMA_VERSION:
+                raise StoreError(f"Unsupported survey store schema version {manifest.get('schema_version')}.")
+        self.columns = manifest['columns']
+        self.dictionaries = manifest['dictionaries']
+        self._partitions = manifest['partitions']
+        changed = self._manifest_mtime is not None or mtime is not None
+        self._manifest_mtime = mtime
+        return changed
+
+    def _write_manifest(self, partitions):
+        manifest = {
+            'schema_version': SCHEMA_VERSION,
+            'columns': self.columns,
+            'dictionaries': self.dictionaries,
+            'partitions': partitions,
+        }
+        manifest_path = os.path.join(self.path, MANIFEST)
+        with open(manifest_path + '.tmp', 'w') as f:
+            json.dump(manifest, f)
+        os.replace(manifest_path + '.tmp', manifest_path)
+        self._partitions = partitions
+        self._manifest_mtime = os.stat(manifest_path).st_mtime_ns
+
+    @property
+    def partitions(self):
+        return [partition['name'] for partition in self._partitions]
+
+    @property
+    def n_rows(self):
+        return sum(partition['rows'] for partition in self._partitions)
+
+    def partition_rows(self, partitions=None):
+        rows = {partition['name']: partition['rows'] for partition in self._partitions}
+        return [rows[name] for name in (self.partitions if partitions is None else partitions)]
+
+    # --- Writing ---
+
+    def _encode_column(self, column, values):
+        kind = self.columns.setdefault(column, column_kind(column))
+        if kind == 'numeric':
+            return pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+        if kind == 'datetime':
+            return np.asarray(pd.to_datetime(values, errors='coerce', format='mixed'), dtype='datetime64[s]')
+        dictionary = self.dictionaries.setdefault(column, [])
+        index = {value: code for code, value in enumerate(dictionary)}
+        inverse, uniques = pd.factorize(values)
+        for value in uniques:
+            if str(value) not in index:
+                index[str(value)] = len(dictionary)
+                dictionary.append(str(value))
+        codes = np.array([index[str(value)] for value in uniques] + [-1], dtype=np.int64)[inverse]
+        return codes.astype(np.int16 if len(dictionary) <= np.iinfo(np.int16).max else np.int32)
+
+    @contextlib.contextmanager
+    def _writer_lock(self):
+        """Hold the store's exclusive writer lock, shared across processes."""
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, LOCK_FILE), 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def append(self, frame):
+        """Write a DataFrame of raw answers as a new partition and return its name."""
+        with self._writer_lock():
+            return self._append(frame)
+
+    def seed(self, load_frame):
+        """
+        Append `load_frame()` if the store is still empty; returns True if it did. When several processes
+        seed the same store at once, one of them appends and the others see its partition.
+        """
+        with self._writer_lock():
+            self.refresh()
+            if self._partitions:
+                return False
+            self._append(load_frame())
+            return True
+
+    def _append(self, frame):
+        self.refresh()
+        name = f"part-{len(self._partitions):06d}"
+        target = os.path.join(self.path, name)
+        staging = os.path.join(self.path, f".{name}.tmp")
+        # Leftovers of an append that died before its manifest update are not referenced by anything.
+        for leftover in (target, staging):
+            shutil.rmtree(leftover, ignore_errors=True)
+        os.makedirs(staging)
+        for column in frame.columns:
+            if column in SKIP_COLUMNS:
+                continue
+            np.save(os.path.join(staging, f"{column}.npy"), self._encode_column(column, frame[column]))
+        os.rename(staging, target)
+        self._write_manifest(self._partitions + [{'name': name, 'rows': len(frame)}])
+        return name
+
+    # --- Reading ---
+
+    def _load(self, partition, column, rows):
+        path = os.path.join(self.path, partition, f"{column}.npy")
+        if os.path.exists(path):
+            return np.load(path, mmap_mode='r')
+        # Columns that first appeared in a later export are missing in older partitions.
+        kind = self.columns[column]
+        if kind == 'category':
+            return np.full(rows, -1, dtype=np.int16)
+        if kind == 'numeric':
+            return np.full(rows, np.nan)
+        return np.full(rows, np.datetime64('NaT'), dtype='datetime64[s]')
+
+    def column(self, column, partitions=None):
+        """One column across `partitions`: a Categorical for answers, a NumPy array otherwise."""
+        if column not in self.columns:
+            raise StoreError(f"Column {column!r} is not in the survey store.")
+        partitions = self.partitions if partitions is None else partitions
+        parts = [self._load(name, column, rows) for name, rows in zip(partitions, self.partition_rows(partitions))]
+        values = np.concatenate(parts) if parts else np.empty(0)
+        if self.columns[column] == 'category':
+            return pd.Categorical.from_codes(values.astype(np.int32), categories=self.dictionaries[column])
+        return values
+
+    def read(self, columns=None, partitions=None):
+        """DataFrame of `columns` (default all); the files of other columns are never opened."""
+        columns = list(self.columns) if columns is None else columns
+        n_rows = sum(self.partition_rows(partitions))
+        return pd.DataFrame({column: self.column(column, partitions) for column in columns}, index=pd.RangeIndex(n_rows))
+
+    def iter_frames(self, columns=None):
+        """One DataFrame per partition, in append order."""
+        for partition in self.partitions:
+            yield self.read(columns, [partition])
+
+    def features(self, encoder, partitions=None):
+        """The encoder's float32 model matrix for `partitions`, cached per partition and encoder."""
+        key = joblib.hash(encoder)[:16]
+        partitions = self.partitions if partitions is None else partitions
+        blocks = []
+        for name, rows in zip(partitions, self.partition_rows(partitions)):
+            path = os.path.join(self.path, name, 'cache', f"features-{key}.npy")
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                np.save(path + '.tmp.npy', self._encode_partition(encoder, name, rows))
+                os.replace(path + '.tmp.npy', path)
+            blocks.append(np.load(path, mmap_mode='r'))
+        if not blocks:
+            return np.empty((0, len(encoder.feature_columns)), dtype=np.float32)
+        return np.concatenate(blocks)
+
+    def _encode_partition(self, encoder, partition, rows):
+        # The forest compares inputs as float32, so the cache stores what the model actually sees.
+        block = np.zeros((rows, len(encoder.feature_columns)), dtype=np.float32)
+        for field in encoder.fields:
+            if field.name not in self.columns:
+                continue
+            values = self._load(partition, field.name, rows)
+            if self.columns[field.name] == 'category':
+                # Encode each dictionary entry once, then gather; code -1 picks the trailing None (missing).
+                dictionary = np.array(self.dictionaries[field.name] + [None], dtype=object)
+                table = encoder.encode_columns({field.name: dictionary}, len(dictionary))[:, field.index]
+                block[:, field.index] = table[values]
+            else:
+                block[:, field.index] = encoder.encode_columns({field.name: np.asarray(values)}, rows)[:, field.index]
+        return block
+
+
+def main(argv=None):
+    from batch_scoring import iter_chunks
+    from model_registry import get_registry
+
+    parser = argparse.ArgumentParser(description="Append survey exports to the columnar survey store.")
+    parser.add_argument('inputs', nargs='*', default=[SURVEY_PATH], help="CSV or Parquet exports shaped like survey.csv")
+    parser.add_argument('--store', default=STORE_PATH)
+    parser.add_argument('--partition-rows', type=int, default=DEFAULT_PARTITION_ROWS, help="rows per partition")
+    args = parser.parse_args(argv)
+
+    store = SurveyStore(args.store)
+    for path in args.inputs:
+        start = time.perf_counter()
+        added = [store.append(frame) for frame in iter_chunks(path, args.partition_rows)]
+        print(f"Appended {path} as {len(added)} partition(s) in {time.perf_counter() - start:.2f}s")
+
+    size = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(args.store) for name in names)
+    print(f"{args.store}: {store.n_rows} rows, {len(store.partitions)} partitions, {len(store.columns)} columns, "
+          f"{size / 1024:.0f} KiB")
+
+    columns = ['Country', 'no_employees', 'tech_company', 'benefits', 'treatment']
+    start = time.perf_counter()
+    store.read(columns)
+    store_read = time.perf_counter() - start
+    start = time.perf_counter()
+    pd.read_csv(args.inputs[0], dtype=str, usecols=columns)
+    csv_read = time.perf_counter() - start
+    print(f"Read {len(columns)} columns: store {store_read * 1000:.1f} ms, CSV {csv_read * 1000:.1f} ms ({args.inputs[0]})")
+
+    encoder = get_registry().get().encoder
+    for label in ('Model matrix', 'Model matrix again (cached)'):
+        start = time.perf_counter()
+        store.features(encoder)
+        print(f"{label}: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import joblib
+import numpy as np
+import pandas as pd
+
+from batch_scoring import iter_chunks
+from compress_forest import Budget, compress, evaluation_split, load_evaluation_data, rebuild_forest
+from encoder import ENCODER_PATH, SURVEY_PATH
+from forest_artifact import ForestArtifact, flatten_forest
+from model_registry import COLUMNS_PATH, MODEL_PATH, get_registry
+from train import save_outputs
+
+
+def test_evaluation_rows_are_encoded_like_batch_scoring():
+    feature_columns = list(joblib.load(COLUMNS_PATH))
+    holdout, y, reference, fixed = load_evaluation_data(feature_columns)
+
+    encoder = get_registry().get().encoder
+    expected = np.vstack([encoder.encode_columns(chunk, len(chunk)) for chunk in iter_chunks(SURVEY_PATH, 500)])
+    np.testing.assert_array_equal(reference, expected)
+    assert fixed is None
+
+    # The held-out rows are a subset of the same encoding, one label each.
+    assert len(holdout) == len(y) == round(len(pd.read_csv(SURVEY_PATH)) * 0.2)
+    assert all((reference == row).all(axis=1).any() for row in holdout)
+
+
+def test_budget_rejects_a_step_that_breaks_it():
+    feature_columns = list(joblib.load(COLUMNS_PATH))
+    original = flatten_forest(joblib.load(MODEL_PATH), feature_columns)
+    holdout, y, reference, _ = load_evaluation_data(feature_columns)
+    budget = Budget(original, holdout, y, reference, max_metric_drop=0.0, max_flip_rate=0.0)
+
+    assert budget.accepts_forest(original)
+    # One tree alone moves decisions and metrics; a zero budget cannot take it.
+    assert not budget.accepts_forest(rebuild_forest(original, trees=[0]))
+    # Nor can it take collapsing every tree to its root.
+    assert not budget.accepts_forest(rebuild_forest(original, collapse=np.ones(original.n_nodes, dtype=bool)))
+
+    compact, steps = compress(original, budget)
+    assert all(step['flip_rate'] == 0.0 for step in steps)
+    assert all(delta >= 0.0 for step in steps for delta in step['delta'].values())
+
+
+def test_only_a_train_py_forest_counts_as_held_out(tmp_path):
+    forest = joblib.load(MODEL_PATH)
+    original = flatten_forest(forest, list(joblib.load(COLUMNS_PATH)))
+    assert evaluation_split(MODEL_PATH, original, 252) == 'in-sample'
+
+    paths = save_outputs(forest, joblib.load(ENCODER_PATH), {'test_rows': 252}, str(tmp_path))
+    assert evaluation_split(paths['model'], original, 252) == 'held-out'
+    assert evaluation_split(paths['model'], original, 300) == 'in-sample'
+    retrained = {**original.arrays, 'value': original.value * 0.5}
+    assert evaluation_split(paths['model'], ForestArtifact(retrained, original.feature_columns, original.classes),
+                            252) == 'in-sample'
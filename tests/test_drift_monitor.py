@@ -0,0 +1,173 @@
+import copy
+import logging
+
+import numpy as np
+import pytest
+
+import drift_monitor
+from drift_monitor import DriftMonitor, binned_ks, get_monitor, histogram_quantile, prometheus_text, psi
+from model_registry import get_registry
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def baseline(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = np.column_stack([rng.normal(40, 10, n), rng.integers(0, 3, n)])
+    return rows, rng.random(n)
+
+
+def monitor(clock, **kwargs):
+    rows, probability = baseline()
+    return DriftMonitor('batch', ['age', 'answer'], rows, probability, clock=clock, min_samples=100, **kwargs)
+
+
+def shifted(n=500, seed=1):
+    rows, probability = baseline(n, seed)
+    rows[:, 0] += 25
+    rows[:, 1] = 2
+    return rows, np.clip(probability + 0.4, 0, 1)
+
+
+# --- Scores ---
+
+def test_psi_and_ks_of_count_vectors():
+    counts = np.array([10.0, 20.0, 30.0, 40.0])
+    assert psi(counts, counts * 3) < 1e-4  # only the half-count smoothing differs
+    assert binned_ks(counts, counts * 3) == pytest.approx(0.0)
+    assert binned_ks(np.array([1.0, 0.0]), np.array([0.0, 1.0])) == 1.0
+    p, q = np.array([0.5, 0.5]), np.array([0.25, 0.75])
+    smoothed = psi(p * 1e6, q * 1e6)
+    assert smoothed == pytest.approx(np.sum((p - q) * np.log(p / q)), rel=1e-4)
+    # Empty bins are smoothed rather than infinite.
+    assert np.isfinite(psi(np.array([0.0, 10.0]), np.array([10.0, 0.0])))
+
+
+def test_histogram_quantile_interpolates_within_bins():
+    counts = np.ones(100)
+    assert histogram_quantile(counts, 0.5) == pytest.approx(0.5)
+    assert histogram_quantile(counts, 0.9) == pytest.approx(0.9)
+    assert histogram_quantile(np.eye(1, 100, 42).ravel(), 0.5) == pytest.approx(0.425)
+
+
+def test_training_traffic_scores_low_and_shifted_traffic_high():
+    clock = FakeClock()
+    same = monitor(clock)
+    same.observe(*baseline(1000, seed=2))
+    for values in same.scores().values():
+        assert all(value < 0.1 for value in values.values())
+
+    drifted = monitor(clock)
+    drifted.observe(*shifted())
+    scores = drifted.scores()
+    assert scores['age']['psi'] > 0.2 and scores['age']['ks'] > 0.1
+    assert scores['answer']['psi'] > 0.2 and 'ks' not in scores['answer']
+    assert scores['probability']['ks'] > 0.1
+
+
+def test_unseen_categories_get_their_own_bin():
+    clock = FakeClock()
+    m = monitor(clock)
+    rows, probability = baseline(200, seed=3)
+    rows[:, 1] = 7
+    m.observe(rows, probability)
+    counts, _ = m.window()
+    answer = counts[m.offsets[1]:m.offsets[2]]
+    assert answer[-1] == 200 and answer[:-1].sum() == 0
+
+
+# --- Window ---
+
+def test_rows_leave_the_window_bucket_by_bucket():
+    clock = FakeClock(0.0)
+    m = monitor(clock, window_seconds=60, n_buckets=6)
+    m.observe(*baseline(100, seed=4))
+    clock.now = 30
+    m.observe(*baseline(50, seed=5))
+    assert m.window()[1] == 150
+    clock.now = 65  # the first bucket [0, 10) has left the 60 s window
+    assert m.window()[1] == 50
+    clock.now = 200
+    assert m.window()[1] == 0
+    assert m.scores() == {}
+
+
+# --- Alerts ---
+
+def test_alerts_fire_once_and_recover(caplog):
+    clock = FakeClock(0.0)
+    m = monitor(clock, window_seconds=60, n_buckets=6)
+    with caplog.at_level(logging.INFO, logger='drift'):
+        m.observe(*shifted())
+        m.check()
+        m.check()
+    assert ('age', 'psi') in m.alerts
+    assert m.alert_counts[('age', 'psi')] == 1
+    assert sum('Drift alert' in record.getMessage() for record in caplog.records) == len(m.alert_counts)
+
+    clock.now = 120
+    with caplog.at_level(logging.INFO, logger='drift'):
+        m.observe(*baseline(1000, seed=6))  # due for a check: the last one was 120 s ago
+    assert m.alerts == []
+    assert any('Drift recovered' in record.getMessage() for record in caplog.records)
+    assert m.alert_counts[('age', 'psi')] == 1
+
+
+def test_no_alerts_below_min_samples():
+    m = monitor(FakeClock())
+    m.observe(*shifted(50))
+    m.check()
+    assert m.alerts == [] and m.alert_counts == {}
+
+
+def test_scraping_exports_the_last_check_without_running_one():
+    clock = FakeClock(0.0)
+    m = monitor(clock)
+    m.observe(*shifted())
+    assert 'drift_psi{' not in prometheus_text([m])  # observe checks at most every 5 s; nothing checked yet
+
+    m.check()
+    alerting = m.alerts
+    clock.now = 2
+    m.observe(*baseline(5000, seed=7))  # a check now would see the drift recover
+    first = prometheus_text([m])
+    assert prometheus_text([m]) == first
+    assert m.alerts == alerting and m.alert_counts[('age', 'psi')] == 1
+    assert 'drift_window_rows{source="batch"} 500' in first
+    assert 'drift_alerts_total{source="batch",feature="age",score="psi"} 1' in first
+    assert first.count('# TYPE drift_psi gauge') == 1
+
+
+# --- Process-wide monitors ---
+
+@pytest.fixture
+def fresh_monitors(monkeypatch):
+    monkeypatch.setattr(drift_monitor, 'ENABLED', True)
+    monkeypatch.setattr(drift_monitor, '_monitors', {})
+    monkeypatch.setattr(drift_monitor, '_builds', {})
+    monkeypatch.setattr(drift_monitor, '_wanted', {})
+
+
+def test_baseline_is_built_in_the_background(fresh_monitors):
+    loaded = get_registry().get()
+    assert get_monitor('service', loaded) is None  # the request path never waits for the survey
+    built = get_monitor('service', loaded, wait=True)
+    assert built is not None and built.model_version == loaded.version
+    assert get_monitor('service', loaded) is built
+    assert len(built.names) == len(loaded.app_encoder.fields) + 1
+
+
+def test_a_stale_build_does_not_replace_the_current_monitor(fresh_monitors):
+    loaded = get_registry().get()
+    newer = copy.copy(loaded)
+    newer.version = 'newer'
+    drift_monitor._wanted['app'] = 'newer'
+    drift_monitor._build_monitor('app', loaded)
+    assert 'app' not in drift_monitor._monitors
+    assert get_monitor('app', newer, wait=True).model_version == 'newer'
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from encoder import ENCODER_PATH, SURVEY_PATH, FeatureEncoder, app_answers, load_encoder
+from model_registry import COLUMNS_PATH
+
+
+def survey_encoder():
+    import joblib
+    return load_encoder(list(joblib.load(COLUMNS_PATH)), ENCODER_PATH)
+
+
+def test_missing_answers_encode_alike_per_row_and_per_column():
+    encoder = survey_encoder()
+    rows = pd.read_csv(SURVEY_PATH, dtype=str, nrows=50)
+    rows.loc[0, ['self_employed', 'work_interfere']] = np.nan
+    rows.loc[1, 'Age'] = np.nan
+    rows.loc[2, 'state'] = None
+    assert rows.isna().any(axis=None)
+
+    by_column = encoder.encode_columns(rows, len(rows))
+    by_row = encoder.encode_many(rows.to_dict('records'))
+    np.testing.assert_array_equal(by_row, by_column)
+
+
+def test_nan_and_none_are_the_missing_category():
+    encoder = survey_encoder()
+    field = next(field for field in encoder.fields if field.name == 'self_employed')
+    for missing in (None, float('nan'), np.float64('nan')):
+        row = encoder.encode({'self_employed': missing})
+        assert row[field.index] == field.categories['Unknown']
+
+
+def test_unparseable_numbers_encode_alike_per_row_and_per_column():
+    encoder = survey_encoder()
+    rows = pd.read_csv(SURVEY_PATH, dtype=str, nrows=4)
+    rows.loc[0, 'Age'] = 'abc'
+    rows.loc[1, 'Age'] = ''
+    rows.loc[2, 'Age'] = '-5'
+    by_column = encoder.encode_columns(rows, len(rows))
+    by_row = encoder.encode_many(rows.to_dict('records'))
+    np.testing.assert_array_equal(by_row, by_column)
+    age = next(field for field in encoder.fields if field.name == 'Age')
+    assert (by_row[:2, age.index] == age.default).all()
+
+
+def test_app_encoder_parses_age_like_encode_columns():
+    encoder = FeatureEncoder.for_app(survey_encoder().feature_columns)
+    answers = {'age': 'abc', 'family_history': 'Yes', 'self_employed': 'No', 'remote_work': 'No',
+               'tech_company': 'Yes', 'benefits': 'No'}
+    by_row = encoder.encode(answers)
+    by_column = encoder.encode_columns({name: [value] for name, value in answers.items()}, 1)[0]
+    np.testing.assert_array_equal(by_row, by_column)
+
+
+def test_app_encoder_rejects_answers_the_form_cannot_give():
+    encoder = FeatureEncoder.for_app(survey_encoder().feature_columns)
+    answers = {'age': 35, 'family_history': 'maybe', 'self_employed': 'No', 'remote_work': 'No',
+               'tech_company': 'Yes', 'benefits': 'No'}
+    with pytest.raises(ValueError, match='family_history'):
+        encoder.encode(answers)
+    with pytest.raises(ValueError, match='family_history'):
+        encoder.encode_columns({name: [value] for name, value in answers.items()}, 1)
+
+
+def test_app_answers_read_other_survey_answers_as_no():
+    survey = pd.read_csv(SURVEY_PATH, dtype=str)
+    answers = app_answers(survey)
+    assert set(answers['benefits']) == {'Yes', 'No'}
+    assert (answers['benefits'] == 'Yes').sum() == (survey['benefits'] == 'Yes').sum()
+    FeatureEncoder.for_app(survey_encoder().feature_columns).encode_columns(answers, len(survey))
@@ -0,0 +1,28 @@
+import joblib
+import numpy as np
+
+from compress_forest import reduce_precision
+from forest_artifact import is_memory_mapped, load_artifact, save_artifact
+from forest_kernel import ForestKernel, check_parity, parity_sample
+from model_registry import MODEL_PATH
+
+NODE_ARRAYS = ('_roots', '_feature', '_left', '_right', '_threshold', '_value')
+
+
+def test_kernel_reads_the_mapped_artifact_without_copying():
+    artifact = load_artifact()
+    kernel = ForestKernel(artifact)
+    for name in NODE_ARRAYS:
+        assert is_memory_mapped(getattr(kernel, name)), name
+    check_parity(kernel, joblib.load(MODEL_PATH), parity_sample(kernel.n_features_in_))
+
+
+def test_compact_artifact_stays_mapped(tmp_path):
+    compact = reduce_precision(load_artifact())
+    path = str(tmp_path / 'compact.forest')
+    save_artifact(compact, path)
+    kernel = ForestKernel(load_artifact(path))
+    for name in NODE_ARRAYS:
+        assert is_memory_mapped(getattr(kernel, name)), name
+    X = parity_sample(kernel.n_features_in_)
+    np.testing.assert_array_equal(kernel.kernel_proba(X), ForestKernel(compact).kernel_proba(X))
@@ -0,0 +1,138 @@
+import json
+import logging
+import re
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from instrumentation import Histogram, Metrics, NullMetrics, SamplingProfiler, serve_metrics
+
+SAMPLE_LINE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[^}]*\})? \S+$')
+
+
+def record(metrics, stages, **fields):
+    timer = metrics.timer()
+    timer.stages.update(stages)
+    timer.done(**fields)
+
+
+def parse(text):
+    """Samples keyed by 'name{labels}', after checking every line is valid exposition text."""
+    samples, families = {}, []
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            families.append(line.split()[2])
+            continue
+        assert SAMPLE_LINE.match(line), line
+        key, value = line.rsplit(' ', 1)
+        samples[key] = float(value)
+    assert len(families) == len(set(families)), 'one TYPE line per family'
+    return samples
+
+
+def test_histogram_buckets_are_cumulative_and_end_at_count():
+    metrics = Metrics(buckets=(0.001, 0.01, 0.1))
+    for seconds in (0.0005, 0.005, 0.005, 0.05, 5.0):
+        record(metrics, {'predict_proba': seconds})
+    samples = parse(metrics.prometheus_text())
+    buckets = [samples[f'prediction_stage_seconds_bucket{{stage="predict_proba",le="{le}"}}']
+               for le in ('0.001', '0.01', '0.1', '+Inf')]
+    assert buckets == [1, 3, 4, 5]
+    assert samples['prediction_stage_seconds_count{stage="predict_proba"}'] == 5
+    assert samples['prediction_stage_seconds_sum{stage="predict_proba"}'] == pytest.approx(5.0605)
+    assert samples['predictions_total'] == 5
+
+
+def test_counters_and_collectors_are_exported_once():
+    metrics = Metrics()
+    metrics.increment('cache_hits')
+    metrics.increment('cache_hits', 2)
+
+    def collect():
+        return '# TYPE model_reloads_total counter\nmodel_reloads_total 1\n'
+    metrics.add_collector(collect)
+    metrics.add_collector(collect)
+    samples = parse(metrics.prometheus_text())
+    assert samples['cache_hits_total'] == 3
+    assert samples['model_reloads_total'] == 1
+
+
+def test_snapshot_reports_counts_and_quantiles():
+    metrics = Metrics(buckets=(0.001, 0.01))
+    for seconds in (0.0005, 0.0005, 0.005):
+        record(metrics, {'encode': seconds})
+    stage = metrics.snapshot()['stages']['encode']
+    assert stage['count'] == 3
+    assert stage['p50_ms'] == 1.0
+    assert stage['p99_ms'] == 10.0
+    assert Histogram().quantile(0.5) is None
+
+
+def test_stage_timer_laps_cover_the_total():
+    metrics = Metrics()
+    timer = metrics.timer()
+    time.sleep(0.002)
+    timer.lap('encode')
+    timer.lap('predict_proba')
+    total = timer.done()
+    assert list(timer.stages) == ['encode', 'predict_proba']
+    assert sum(timer.stages.values()) == pytest.approx(total)
+
+
+def test_prediction_log_line_is_json(caplog):
+    metrics = Metrics(log_predictions=True)
+    with caplog.at_level(logging.INFO, logger='metrics'):
+        record(metrics, {'encode': 0.001}, risk_level='Low')
+    event = json.loads(caplog.records[-1].getMessage())
+    assert event['event'] == 'prediction'
+    assert event['encode_ms'] == 1.0
+    assert event['risk_level'] == 'Low'
+
+
+def test_null_metrics_export_nothing():
+    metrics = NullMetrics()
+    timer = metrics.timer()
+    timer.lap('encode')
+    assert timer.done() == 0.0
+    metrics.increment('cache_hits')
+    metrics.add_collector(lambda: 'x 1\n')
+    assert metrics.prometheus_text() == ''
+    assert metrics.snapshot() == {'counters': {}, 'stages': {}}
+
+
+def test_metrics_endpoint_serves_exposition_text():
+    metrics = Metrics()
+    metrics.increment('cache_hits')
+    server = serve_metrics(0, host='127.0.0.1', registry=metrics)
+    try:
+        url = f'http://127.0.0.1:{server.server_address[1]}'
+        with urllib.request.urlopen(url + '/metrics') as response:
+            assert response.headers['Content-Type'].startswith('text/plain')
+            assert parse(response.read().decode())['cache_hits_total'] == 1
+        try:
+            urllib.request.urlopen(url + '/profile')
+            assert False, 'profile must 404 while the profiler is off'
+        except urllib.error.HTTPError as exc:
+            assert exc.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_profiler_collects_collapsed_stacks():
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    try:
+        deadline = time.perf_counter() + 0.1
+        while time.perf_counter() < deadline:
+            pass
+    finally:
+        profiler.stop()
+    assert profiler.samples > 0
+    lines = profiler.collapsed().splitlines()
+    busy = [line for line in lines if line.rsplit(' ', 1)[0].endswith('test_profiler_collects_collapsed_stacks')]
+    assert busy and int(busy[0].rsplit(' ', 1)[1]) > 0
+    profiler.reset()
+    assert profiler.collapsed() == ''
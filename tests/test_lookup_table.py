@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from lookup_table import AGE_RANGE, PredictionTable, TableMismatchError, all_inputs
+from model_registry import get_registry
+
+
+@pytest.fixture(scope='module')
+def loaded():
+    return get_registry().get()
+
+
+@pytest.fixture(scope='module')
+def table(loaded):
+    return PredictionTable.build(loaded.model, loaded.app_encoder)
+
+
+def test_table_covers_every_form_input_once():
+    inputs = all_inputs()
+    assert len(inputs) == (AGE_RANGE[1] - AGE_RANGE[0] + 1) * 32
+    assert len({tuple(sorted(record.items())) for record in inputs}) == len(inputs)
+
+
+def test_lookups_equal_the_live_model(loaded, table):
+    X = loaded.app_encoder.encode_many(all_inputs()[::7])
+    np.testing.assert_array_equal(table.predict_proba(X), loaded.model.predict_proba(X))
+
+
+def test_rows_outside_the_form_fall_back_to_the_model(loaded, table):
+    X = loaded.app_encoder.encode_many(all_inputs()[:3])
+    X[0, table._age_index] = 17          # below the form's range
+    X[1, table._age_index] = 30.5        # not a whole age
+    X[2, table._other_indices[0]] = 3.0  # a column the form never fills
+    keys, valid = table.keys(X)
+    assert not valid.any()
+    np.testing.assert_array_equal(table.predict_proba(X), loaded.model.predict_proba(X))
+
+
+def test_single_rows_are_accepted(loaded, table):
+    row = loaded.app_encoder.encode(all_inputs()[100])
+    np.testing.assert_array_equal(table.predict_proba(row), loaded.model.predict_proba(row[np.newaxis, :]))
+
+
+def test_validate_rejects_a_table_that_disagrees_with_the_model(loaded, table):
+    stale = PredictionTable(table.probabilities.copy(), loaded.app_encoder, loaded.model)
+    stale.probabilities[5] = stale.probabilities[5][::-1]
+    with pytest.raises(TableMismatchError):
+        stale.validate(loaded.model)
@@ -0,0 +1,79 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from encoder import ENCODER_PATH
+from model_registry import COLUMNS_PATH, MODEL_PATH, ModelRegistry
+
+
+@pytest.fixture
+def model_files(tmp_path):
+    paths = {}
+    for name, source in (('model_path', MODEL_PATH), ('columns_path', COLUMNS_PATH), ('encoder_path', ENCODER_PATH)):
+        paths[name] = str(tmp_path / os.path.basename(source))
+        shutil.copy(source, paths[name])
+    return paths
+
+
+def bump_mtime(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_model_is_loaded_once_while_files_are_unchanged(model_files):
+    registry = ModelRegistry(engine='sklearn', **model_files)
+    loaded = registry.get()
+    assert registry.get() is loaded
+    assert registry.reload_count == 0
+    assert registry.stats()['loaded']
+
+
+def test_model_reloads_when_a_file_changes(model_files):
+    registry = ModelRegistry(engine='sklearn', **model_files)
+    first = registry.get()
+    bump_mtime(model_files['model_path'])
+    second = registry.get()
+    assert second is not first
+    assert second.version != first.version
+    assert registry.reload_count == 1
+    assert registry.get() is second
+    assert "model_reloads_total 1" in registry.prometheus_text()
+
+
+def test_engines_agree_on_the_same_files(model_files):
+    X = np.zeros((3, 24))
+    X[:, 0] = (25, 40, 60)
+    sklearn_proba = ModelRegistry(engine='sklearn', **model_files).get().model.predict_proba(X)
+    numpy_proba = ModelRegistry(engine='numpy', **model_files).get().model.predict_proba(X)
+    np.testing.assert_array_equal(sklearn_proba, numpy_proba)
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        ModelRegistry(engine='onnx')
+
+
+def test_failed_reload_keeps_serving_the_previous_model(model_files):
+    registry = ModelRegistry(engine='sklearn', **model_files)
+    first = registry.get()
+    with open(model_files['model_path'], 'wb') as f:
+        f.write(b'half-written pickle')
+    assert registry.get() is first
+    assert registry.reload_failures == 1
+    # The broken files are not retried on every call, only after they change again.
+    assert registry.get() is first
+    assert registry.reload_failures == 1
+
+    shutil.copy(MODEL_PATH, model_files['model_path'])
+    bump_mtime(model_files['model_path'])
+    assert registry.get() is not first
+    assert registry.reload_count == 1
+
+
+def test_first_load_failure_is_raised(model_files):
+    with open(model_files['model_path'], 'wb') as f:
+        f.write(b'not a pickle')
+    with pytest.raises(Exception):
+        ModelRegistry(engine='sklearn', **model_files).get()
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from prediction_cache import PredictionCache, approximate_size, feature_key, parse_ttl, prometheus_text
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = PredictionCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1   # 'b' is now the least recently used
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_byte_budget_bounds_the_cache():
+    value = np.zeros(100)
+    cache = PredictionCache(max_entries=100, max_bytes=3 * approximate_size(value))
+    for key in range(5):
+        cache.put(key, np.zeros(100))
+    stats = cache.stats()
+    assert stats['entries'] == 3
+    assert stats['bytes'] <= 3 * approximate_size(value)
+    assert cache.get(0) is None and cache.get(4) is not None
+
+
+def test_values_over_the_budget_are_not_stored():
+    cache = PredictionCache(max_bytes=10)
+    cache.put('big', np.zeros(100))
+    assert cache.stats()['entries'] == 0
+
+
+def test_entries_expire_after_the_ttl():
+    clock = FakeClock()
+    cache = PredictionCache(ttl_seconds=10, clock=clock)
+    cache.put('a', 1)
+    clock.now = 10
+    assert cache.get('a') == 1
+    clock.now = 10.5
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_expired_entries_are_evicted_before_live_ones():
+    clock = FakeClock()
+    cache = PredictionCache(max_entries=3, ttl_seconds=10, clock=clock)
+    cache.put('old', 1)
+    clock.now = 5
+    cache.put('a', 2)
+    cache.put('b', 3)
+    assert cache.get('old') == 1   # most recently used, but stored first
+    clock.now = 12
+    cache.put('c', 4)
+    assert cache.stats()['expirations'] == 1
+    assert cache.stats()['evictions'] == 0
+    assert [cache.get(key) for key in ('a', 'b', 'c')] == [2, 3, 4]
+
+
+def test_version_change_invalidates_everything():
+    cache = PredictionCache()
+    cache.put('a', 1, version='v1')
+    assert cache.get('a', version='v1') == 1
+    assert cache.get('a', version='v2') is None
+    assert cache.stats()['invalidations'] == 1
+    assert cache.stats()['bytes'] == 0
+
+
+def test_get_or_compute_computes_once():
+    cache = PredictionCache()
+    calls = []
+    compute = lambda: calls.append(1) or 'report'
+    assert cache.get_or_compute('a', compute) == 'report'
+    assert cache.get_or_compute('a', compute) == 'report'
+    assert len(calls) == 1
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_rows_that_encode_alike_share_a_key():
+    assert feature_key(np.array([1, 0, 35])) == feature_key([1.0, 0.0, 35.0])
+    assert feature_key([1.0, 0.0, 35.0]) != feature_key([1.0, 0.0, 36.0])
+
+
+def test_prometheus_text_has_one_type_line_per_family():
+    text = prometheus_text([PredictionCache(name='reports'), PredictionCache(name='sweeps')])
+    assert text.count('# TYPE prediction_cache_hits_total counter') == 1
+    assert 'prediction_cache_hits_total{cache="sweeps"} 0' in text
+
+
+def test_parse_ttl():
+    assert parse_ttl(None) is None and parse_ttl('') is None and parse_ttl('  ') is None
+    assert parse_ttl('90') == 90.0 and parse_ttl('0.5') == 0.5
+    for bad in ('abc', '0', '-5', 'inf', 'nan'):
+        with pytest.raises(ValueError, match='positive number of seconds'):
+            parse_ttl(bad)
@@ -0,0 +1,117 @@
+import multiprocessing
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from encoder import SURVEY_PATH
+from model_registry import get_registry
+from rollups import DIMENSIONS, RollupCube, RollupService, load_cube, refresh_cube
+from survey_store import SurveyStore
+
+
+@pytest.fixture
+def survey():
+    return pd.read_csv(SURVEY_PATH, dtype=str)
+
+
+def scan(frame, probability, filters):
+    """Totals from the raw rows, the way the cube should compute them."""
+    mask = np.ones(len(frame), dtype=bool)
+    for dimension, value in filters.items():
+        mask &= (frame[dimension].fillna('Unknown') == value).to_numpy()
+    return {
+        'responses': int(mask.sum()),
+        'treatment_rate': (frame['treatment'][mask] == 'Yes').mean(),
+        'mean_risk': probability[mask].mean(),
+    }
+
+
+def test_totals_and_breakdowns_match_a_scan_of_the_rows(survey):
+    probability = np.random.default_rng(0).random(len(survey))
+    cube = RollupCube()
+    cube.add(survey.iloc[:600], probability[:600])
+    cube.add(survey.iloc[600:], probability[600:])
+
+    for filters in ({}, {'tech_company': 'Yes'}, {'tech_company': 'Yes', 'benefits': "Don't know"},
+                    {'Country': 'United States', 'no_employees': '26-100', 'treatment': 'No'}):
+        expected = scan(survey, probability, filters)
+        actual = cube.totals(filters)
+        assert actual['responses'] == expected['responses']
+        assert actual['treatment_rate'] == pytest.approx(expected['treatment_rate'])
+        assert actual['mean_risk'] == pytest.approx(expected['mean_risk'])
+
+    table = cube.breakdown('no_employees', {'benefits': 'Yes'})
+    assert table['responses'].sum() == cube.totals({'benefits': 'Yes'})['responses']
+    assert cube.totals({'Country': 'Atlantis'})['responses'] == 0
+    assert set(cube.values('tech_company')) == {'Yes', 'No'}
+
+
+def test_cube_survives_a_save_and_load(tmp_path, survey):
+    cube = RollupCube(model_version='v1')
+    cube.add(survey, np.linspace(0, 1, len(survey)))
+    cube.partitions = ['part-000000']
+    path = str(tmp_path / 'rollups.json')
+    cube.save(path)
+
+    loaded = load_cube(path)
+    assert loaded.model_version == 'v1' and loaded.partitions == ['part-000000']
+    assert loaded.totals({'benefits': 'No'}) == cube.totals({'benefits': 'No'})
+    assert load_cube(path, dimensions=DIMENSIONS[:2]) is None
+    assert load_cube(str(tmp_path / 'missing.json')) is None
+
+
+def test_refresh_folds_in_only_new_partitions(tmp_path, survey):
+    loaded = get_registry().get()
+    store = SurveyStore(str(tmp_path / 'store'))
+    store.append(survey.iloc[:500])
+
+    cube, added = refresh_cube(None, store, loaded)
+    assert added == 500 and cube.model_version == loaded.version
+    assert refresh_cube(cube, store, loaded) == (cube, 0)
+
+    store.append(survey.iloc[500:])
+    cube, added = refresh_cube(cube, store, loaded)
+    assert added == len(survey) - 500
+    probability = loaded.model.predict_proba(loaded.encoder.encode_columns(survey, len(survey)))[:, 1]
+    assert cube.totals()['mean_risk'] == pytest.approx(probability.mean())
+
+    other_version = types.SimpleNamespace(**{**vars(loaded), 'version': 'other'})
+    rebuilt, added = refresh_cube(cube, store, other_version)
+    assert rebuilt is not cube and added == len(survey)
+
+
+def test_a_specialized_forest_is_refused(tmp_path, survey):
+    store = SurveyStore(str(tmp_path / 'store'))
+    store.append(survey.iloc[:10])
+    artifact = types.SimpleNamespace(fixed_features=['Gender'])
+    specialized = types.SimpleNamespace(version='app', model=types.SimpleNamespace(artifact=artifact))
+    with pytest.raises(ValueError, match='specialized'):
+        refresh_cube(None, store, specialized)
+
+
+def test_service_persists_the_cube(tmp_path):
+    loaded = get_registry().get()
+    path = str(tmp_path / 'store')
+    cube = RollupService(path).get(loaded)
+    assert cube.n_rows == len(pd.read_csv(SURVEY_PATH))
+    assert RollupService(path).cube.totals() == cube.totals()
+
+
+def _start_service(path):
+    RollupService(path)
+
+
+def test_concurrent_first_runs_seed_the_store_once(tmp_path):
+    path = str(tmp_path / 'store')
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_start_service, args=(path,)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert [process.exitcode for process in processes] == [0] * 4
+    store = SurveyStore(path)
+    assert store.partitions == ['part-000000']
+    assert store.n_rows == len(pd.read_csv(SURVEY_PATH))
@@ -0,0 +1,141 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from encoder import SURVEY_PATH
+from lookup_table import all_inputs
+from rules import RULES_PATH, RuleConfigError, RuleEngine
+
+
+# --- Reference implementation: the hard-coded rules the table replaced ---
+
+def reference_report_fields(user_input_data, prediction):
+    """The original per-person if-chain."""
+    family_history = user_input_data['family_history'] == "Yes"
+    remote_work = user_input_data['remote_work'] == "Yes"
+    tech_company = user_input_data['tech_company'] == "Yes"
+    benefits = user_input_data['benefits'] == "Yes"
+    age = user_input_data['age']
+
+    risk_score = 0
+    if family_history: risk_score += 3
+    if not remote_work: risk_score += 2
+    if tech_company and not benefits: risk_score += 4
+    if age > 45: risk_score += 1
+    if prediction == 1: risk_score += 5
+
+    risk_level, color = "Low", "#50fa7b"
+    if risk_score > 5:
+        risk_level, color = "Medium", "#ffc800"
+    if risk_score > 10:
+        risk_level, color = "High", "#ff5555"
+
+    risk_factors = []
+    recommendations = []
+    if family_history:
+        risk_factors.append("Family History of Mental Health")
+        recommendations.append({"category": "Immediate Action", "text": "Consider speaking with a professional about your family history and its potential impact on your well-being. A genetic counselor or therapist may provide valuable guidance."})
+    if not remote_work:
+        risk_factors.append("On-site Work Environment")
+        recommendations.append({"category": "Lifestyle Adjustments", "text": "Maintaining a healthy work-life balance is crucial in an on-site role. Explore stress management techniques and ensure you take regular breaks."})
+    if tech_company and not benefits:
+        risk_factors.append("Lack of Employer Mental Health Benefits")
+        recommendations.append({"category": "Immediate Action", "text": "Research local mental health resources and services that are independent of employer benefits. Prioritize your well-being, even without company support."})
+    if age > 45:
+        risk_factors.append("Age-Related Stress Factors")
+        recommendations.append({"category": "Lifestyle Adjustments", "text": "As we age, our mental health needs can change. Stay connected with friends and family, and consider mindfulness or meditation to manage stress."})
+    if not risk_factors:
+        recommendations.append({"category": "General Wellness", "text": "Your profile indicates a low-risk status. Continue to monitor your mental health and seek professional help if your circumstances change."})
+
+    explanation = "The analysis suggests a high probability of requiring professional assistance based on the provided data." if prediction == 1 else "The analysis indicates a low probability of requiring treatment at this time."
+    return {
+        'risk_score': risk_score,
+        'risk_level': risk_level,
+        'risk_level_color': color,
+        'risk_factors': risk_factors,
+        'recommendations': recommendations,
+        'explanation': explanation,
+    }
+
+
+def reference_scores(frame, prediction):
+    """The original vectorized batch score over raw survey answers."""
+    def answer(col, value):
+        if col not in frame.columns:
+            return np.zeros(len(frame), dtype=bool)
+        return (frame[col] == value).to_numpy()
+
+    age = pd.to_numeric(frame['Age'], errors='coerce').fillna(0).to_numpy() if 'Age' in frame.columns else np.zeros(len(frame))
+    score = np.zeros(len(frame), dtype=np.int64)
+    score += 3 * answer('family_history', 'Yes')
+    score += 2 * ~answer('remote_work', 'Yes')
+    score += 4 * (answer('tech_company', 'Yes') & ~answer('benefits', 'Yes'))
+    score += 1 * (age > 45)
+    score += 5 * (prediction == 1)
+    return score
+
+
+# --- The shipped rule file against the reference ---
+
+@pytest.fixture(scope='module')
+def engine():
+    return RuleEngine.from_file(RULES_PATH)
+
+
+@pytest.mark.parametrize('prediction', [0, 1])
+def test_report_fields_match_the_reference_for_every_app_input(engine, prediction):
+    for inputs in all_inputs():
+        fired = engine.fired_rules(inputs, prediction)
+        level = engine.level(engine.score(fired))
+        assert {
+            'risk_score': engine.score(fired),
+            'risk_level': level.name,
+            'risk_level_color': level.color,
+            'risk_factors': engine.risk_factors(fired),
+            'recommendations': engine.recommendations(fired),
+            'explanation': engine.explanation(prediction),
+        } == reference_report_fields(inputs, prediction), inputs
+
+
+@pytest.mark.parametrize('prediction', [0, 1])
+def test_batch_scores_match_the_reference_on_survey_rows(engine, prediction):
+    survey = pd.read_csv(SURVEY_PATH, dtype=str)
+    survey.loc[:4, 'Age'] = ['abc', None, '', '46', '45.5']
+    predictions = np.full(len(survey), prediction)
+    expected = reference_scores(survey, predictions)
+    actual = engine.scores(survey, predictions)
+    np.testing.assert_array_equal(actual, expected)
+    np.testing.assert_array_equal(engine.levels_for(actual), engine.levels_for(expected))
+
+
+def test_batch_and_single_scores_agree(engine):
+    inputs = list(all_inputs())[::37]
+    frame = pd.DataFrame(inputs).rename(columns={'age': 'Age'})
+    prediction = np.arange(len(inputs)) % 2
+    singles = [engine.score(engine.fired_rules(row, p)) for row, p in zip(inputs, prediction)]
+    np.testing.assert_array_equal(engine.scores(frame, prediction), singles)
+
+
+# --- Schema checks ---
+
+def config(**changes):
+    with open(RULES_PATH, encoding='utf-8') as f:
+        return {**json.load(f), **changes}
+
+
+@pytest.mark.parametrize('changes', [
+    {'schema_version': 2},
+    {'levels': [{'name': 'Low', 'color': '#fff', 'above': 3}]},
+    {'levels': [{'name': 'High', 'color': '#f00', 'above': 5}, {'name': 'Medium', 'color': '#ff0', 'above': 10},
+                {'name': 'Low', 'color': '#0f0'}]},
+    {'rules': [{'name': 'bad', 'when': [{'field': 'Age', 'op': '~', 'value': 1}]}]},
+    {'rules': [{'name': 'bad', 'when': [{'field': 'Age', 'op': 'in', 'value': 1}]}]},
+    {'rules': [{'name': 'bad', 'when': []}]},
+    {'rules': [{'name': 'bad', 'when': [{'field': 'Age', 'op': '>', 'value': 1}], 'weight': 'high'}]},
+    {'rules': [{'name': 'bad'}]},
+])
+def test_malformed_rule_files_are_rejected(changes):
+    with pytest.raises(RuleConfigError):
+        RuleEngine.from_config(config(**changes))
@@ -0,0 +1,156 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytest
+
+from model_registry import get_registry
+from service import InferenceService, MicroBatcher, _predict_batch
+from what_if import WHAT_IF_FACTORS
+
+ANSWERS = {'age': 35, 'family_history': 'Yes', 'self_employed': 'No', 'remote_work': 'No',
+           'tech_company': 'Yes', 'benefits': 'No'}
+
+
+async def call(app, method, path, body=None, raw=None):
+    """Drive one HTTP request through the ASGI app; returns (status, decoded body)."""
+    messages = [{'type': 'http.request', 'body': raw if raw is not None else json.dumps(body).encode()}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await app({'type': 'http', 'method': method, 'path': path}, receive, send)
+    status, payload = sent[0]['status'], sent[1]['body'].decode()
+    is_json = (b'content-type', b'application/json') in sent[0]['headers']
+    return status, json.loads(payload) if is_json else payload
+
+
+def run(test, **options):
+    """Run `test(app)` against a thread-executor service and shut it down afterwards."""
+    async def main():
+        app = InferenceService(executor='thread', workers=2, **options)
+        try:
+            return await test(app)
+        finally:
+            await app.shutdown()
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize('change, message', [
+    ({'age': -5}, 'between 18 and 100'),
+    ({'age': 101}, 'between 18 and 100'),
+    ({'age': True}, 'number'),
+    ({'age': float('inf')}, 'number'),
+    ({'family_history': 'maybe'}, "'Yes' or 'No'"),
+])
+def test_predict_rejects_answers_the_form_cannot_give(change, message):
+    async def test(app):
+        return await call(app, 'POST', '/predict', raw=json.dumps({**ANSWERS, **change}).encode())
+    status, body = run(test)
+    assert status == 400
+    assert message in body['error']
+
+
+def test_predict_rejects_bad_json_and_unknown_routes():
+    async def test(app):
+        return (await call(app, 'POST', '/predict', raw=b'{not json'),
+                await call(app, 'GET', '/nowhere'))
+    (bad_status, bad_body), (missing_status, _) = run(test)
+    assert bad_status == 400 and 'JSON' in bad_body['error']
+    assert missing_status == 404
+
+
+def test_predict_matches_the_model():
+    async def test(app):
+        return await call(app, 'POST', '/predict', ANSWERS)
+    status, report = run(test)
+    loaded = get_registry().get()
+    expected = loaded.model.predict_proba(loaded.app_encoder.encode(ANSWERS)[None, :])[0, 1]
+    assert status == 200
+    assert report['probability'] == pytest.approx(expected)
+    assert report['risk_level'] in ('Low', 'Moderate', 'High')
+
+
+def test_batch_requests_are_coalesced():
+    records = [{**ANSWERS, 'age': age} for age in range(20, 60)]
+
+    async def test(app):
+        status, body = await call(app, 'POST', '/predict/batch', {'records': records})
+        return status, body, app.batcher.stats()
+    status, body, stats = run(test, max_wait_ms=50)
+    loaded = get_registry().get()
+    expected = _predict_batch(loaded.app_encoder.encode_many(records))
+    assert status == 200
+    np.testing.assert_allclose([report['probability'] for report in body['reports']], expected)
+    assert stats['rows'] == len(records)
+    assert stats['batches'] < len(records)
+
+
+@pytest.mark.parametrize('max_changes', [0, len(WHAT_IF_FACTORS) + 1, True, 1.5, '2'])
+def test_what_if_rejects_bad_max_changes(max_changes):
+    async def test(app):
+        return await call(app, 'POST', '/what-if', {'answers': ANSWERS, 'max_changes': max_changes})
+    status, body = run(test)
+    assert status == 400
+    assert 'max_changes' in body['error']
+
+
+def test_what_if_allows_changing_every_factor():
+    async def test(app):
+        return await call(app, 'POST', '/what-if', {'answers': ANSWERS, 'max_changes': len(WHAT_IF_FACTORS)})
+    status, body = run(test)
+    assert status == 200
+    assert max(len(scenario['factors']) for scenario in body['scenarios']) == len(WHAT_IF_FACTORS)
+
+
+def test_health_and_metrics_endpoints():
+    async def test(app):
+        await call(app, 'POST', '/predict', ANSWERS)
+        return await call(app, 'GET', '/healthz'), await call(app, 'GET', '/metrics')
+    (health_status, health), (metrics_status, text) = run(test)
+    assert health_status == 200 and health['status'] == 'ok'
+    assert health['batching']['rows'] == 1
+    assert metrics_status == 200
+    assert '# TYPE prediction_batches_total counter' in text
+
+
+def test_broken_pool_is_replaced():
+    failures = []
+
+    def break_once(X):
+        if not failures:
+            failures.append(X)
+            raise BrokenProcessPool('worker died')
+        return _predict_batch(X)
+
+    async def test(app):
+        await call(app, 'GET', '/healthz')
+        broken = app.executor
+        app.batcher.run_batch = break_once
+        first = await call(app, 'POST', '/predict', ANSWERS)
+        second = await call(app, 'POST', '/predict', ANSWERS)
+        return broken, app.executor, app.batcher.executor, first, second
+    broken, executor, batcher_executor, (first_status, _), (second_status, _) = run(test)
+    assert first_status == 500
+    assert second_status == 200
+    assert executor is not broken and batcher_executor is executor
+
+
+def test_batcher_keeps_dispatch_tasks_until_done():
+    async def main():
+        with ThreadPoolExecutor(1) as executor:
+            batcher = MicroBatcher(executor, lambda X: X[:, 0], max_wait_ms=1)
+            results = await asyncio.gather(*(batcher.submit(np.array([float(i)])) for i in range(5)))
+            await asyncio.sleep(0)
+            pending = len(batcher._dispatches)
+            await batcher.stop()
+        return results, pending
+    results, pending = asyncio.run(main())
+    assert results == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert pending == 0
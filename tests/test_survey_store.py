@@ -0,0 +1,108 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from encoder import SURVEY_PATH
+from model_registry import get_registry
+from survey_store import MANIFEST, StoreError, SurveyStore
+
+
+@pytest.fixture
+def survey():
+    frame = pd.read_csv(SURVEY_PATH, dtype=str, nrows=300)
+    frame.loc[0, ['self_employed', 'work_interfere']] = np.nan
+    frame.loc[1, 'Age'] = 'abc'
+    return frame
+
+
+def test_append_and_read_round_trip(tmp_path, survey):
+    store = SurveyStore(str(tmp_path / 'store'))
+    store.append(survey.iloc[:200])
+    store.append(survey.iloc[200:])
+    assert store.n_rows == len(survey) and len(store.partitions) == 2
+
+    read = store.read()
+    assert 'comments' not in read.columns
+    for column in ('Country', 'self_employed', 'work_interfere', 'treatment'):
+        assert read[column].astype(object).fillna('<missing>').tolist() == survey[column].fillna('<missing>').tolist()
+    np.testing.assert_array_equal(read['Age'], pd.to_numeric(survey['Age'], errors='coerce'))
+    assert read['Timestamp'].notna().all()
+
+
+def test_reads_only_the_requested_columns(tmp_path, survey):
+    store = SurveyStore(str(tmp_path / 'store'))
+    store.append(survey)
+    os.remove(os.path.join(store.path, store.partitions[0], 'Country.npy'))
+    assert list(store.read(['treatment', 'Age']).columns) == ['treatment', 'Age']
+    with pytest.raises(StoreError):
+        store.column('no_such_column')
+
+
+def test_dictionaries_are_append_only_and_new_columns_backfill(tmp_path, survey):
+    store = SurveyStore(str(tmp_path / 'store'))
+    store.append(survey.iloc[:100])
+    first_dictionary = list(store.dictionaries['Country'])
+
+    later = survey.iloc[100:].copy()
+    later.loc[later.index[0], 'Country'] = 'Atlantis'
+    later['team'] = 'blue'
+    store.append(later)
+
+    assert store.dictionaries['Country'][:len(first_dictionary)] == first_dictionary
+    assert 'Atlantis' in store.dictionaries['Country'][len(first_dictionary):]
+    read = store.read(['Country', 'team'])
+    assert read['Country'][100] == 'Atlantis'
+    assert read['Country'][:100].tolist() == survey['Country'][:100].tolist()
+    assert read['team'][:100].isna().all() and (read['team'][100:] == 'blue').all()
+
+
+def test_readers_see_appends_from_another_writer(tmp_path, survey):
+    path = str(tmp_path / 'store')
+    reader = SurveyStore(path)
+    assert reader.n_rows == 0 and not reader.refresh()
+
+    SurveyStore(path).append(survey)
+    assert reader.refresh()
+    assert reader.n_rows == len(survey)
+    assert not reader.refresh()
+
+
+def test_unfinished_append_is_invisible_and_cleaned_up(tmp_path, survey):
+    store = SurveyStore(str(tmp_path / 'store'))
+    store.append(survey.iloc[:100])
+    os.makedirs(os.path.join(store.path, '.part-000001.tmp'))
+    os.makedirs(os.path.join(store.path, 'part-000001'))
+    assert SurveyStore(store.path).n_rows == 100
+
+    store.append(survey.iloc[100:])
+    assert store.n_rows == len(survey)
+    assert not os.path.exists(os.path.join(store.path, '.part-000001.tmp'))
+
+
+def test_features_match_the_encoder_and_are_cached(tmp_path, survey):
+    store = SurveyStore(str(tmp_path / 'store'))
+    store.append(survey.iloc[:150])
+    store.append(survey.iloc[150:])
+    encoder = get_registry().get().encoder
+
+    expected = encoder.encode_columns(survey, len(survey)).astype(np.float32)
+    np.testing.assert_array_equal(store.features(encoder), expected)
+    cached = os.listdir(os.path.join(store.path, store.partitions[0], 'cache'))
+    assert len(cached) == 1 and cached[0].startswith('features-')
+    np.testing.assert_array_equal(store.features(encoder, [store.partitions[1]]), expected[150:])
+
+
+def test_unknown_schema_version_is_rejected(tmp_path, survey):
+    store = SurveyStore(str(tmp_path / 'store'))
+    store.append(survey.iloc[:10])
+    manifest_path = os.path.join(store.path, MANIFEST)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    manifest['schema_version'] = 99
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f)
+    with pytest.raises(StoreError):
+        SurveyStore(store.path)
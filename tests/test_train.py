@@ -0,0 +1,23 @@
+import os
+
+import joblib
+import numpy as np
+
+from encoder import ENCODER_PATH
+from model_registry import MODEL_PATH, ModelRegistry
+from train import FEATURE_COLUMNS, save_outputs
+
+
+def test_save_outputs_writes_complete_files_the_registry_can_load(tmp_path):
+    forest = joblib.load(MODEL_PATH)
+    survey_encoder = joblib.load(ENCODER_PATH)
+    paths = save_outputs(forest, survey_encoder, {'test_metrics': {}}, str(tmp_path))
+
+    assert list(paths)[-1] == 'model'
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+    registry = ModelRegistry(model_path=paths['model'], columns_path=paths['columns'], encoder_path=paths['encoder'],
+                             engine='numpy')
+    loaded = registry.get()
+    assert loaded.feature_columns == FEATURE_COLUMNS
+    X = np.zeros((2, len(FEATURE_COLUMNS)))
+    np.testing.assert_array_equal(loaded.model.predict_proba(X), forest.predict_proba(X))
@@ -0,0 +1,49 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from model_registry import get_registry
+from prediction import build_report
+from what_if import WHAT_IF_FACTORS, lookup_scenario, run_sweep
+
+YES_NO_FIELDS = ('family_history', 'self_employed', 'remote_work', 'tech_company', 'benefits')
+
+
+def sample_answers():
+    rng = np.random.default_rng(0)
+    for age in (18, 35, 52, 100):
+        for _ in range(3):
+            yield {'age': age, **{name: str(rng.choice(["Yes", "No"])) for name in YES_NO_FIELDS}}
+
+
+def test_every_app_yes_no_answer_can_be_varied():
+    assert sorted(WHAT_IF_FACTORS) == sorted(YES_NO_FIELDS)
+
+
+@pytest.mark.parametrize('answers', list(sample_answers()))
+def test_sweep_matches_a_report_per_scenario(answers):
+    loaded = get_registry().get()
+    sweep = run_sweep(loaded.model, loaded.app_encoder, answers)
+    expected_rows = len(WHAT_IF_FACTORS) + len(list(itertools.combinations(WHAT_IF_FACTORS, 2)))
+    assert len(sweep) == expected_rows
+
+    baseline = build_report(loaded.model, loaded.app_encoder, answers)
+    for scenario in sweep.itertuples():
+        changed = dict(answers)
+        for key in scenario.factors:
+            changed[key] = "No" if answers[key] == "Yes" else "Yes"
+        report = build_report(loaded.model, loaded.app_encoder, changed)
+        assert scenario.probability == report['probability']
+        assert scenario.risk_score == report['risk_score']
+        assert scenario.risk_level == report['risk_level']
+        assert scenario.delta_probability == report['probability'] - baseline['probability']
+
+
+def test_lookup_scenario_finds_single_flips_only():
+    loaded = get_registry().get()
+    answers = next(sample_answers())
+    sweep = run_sweep(loaded.model, loaded.app_encoder, answers)
+    flipped = "No" if answers['benefits'] == "Yes" else "Yes"
+    assert lookup_scenario(sweep, answers, 'benefits', flipped)['factors'] == ('benefits',)
+    assert lookup_scenario(sweep, answers, 'benefits', answers['benefits']) is None
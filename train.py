@@ -0,0 +1,256 @@
+"""
+Reproducible training pipeline: `survey.csv` -> model, feature columns, encoder and metrics.
+
+Usage:
+    python train.py                       # retrain in place (the app reloads automatically)
+    python train.py --output-dir models/  # write the artifacts somewhere else
+    python train.py --quick               # single-candidate run for smoke tests
+    python train.py --survey survey_store # train from a columnar survey store (survey_store.py)
+
+Steps: load the survey with explicit dtypes, clean `Age` and the free-text
+`Gender`, label-encode the 24 feature columns, run a cross-validated
+RandomForestClassifier grid search across all cores (fold preprocessing is
+cached so each fold is encoded once, not once per candidate) on an 80/20
+stratified split, and report the same held-out metrics as the README.
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, confusion_matrix, f1_score, precision_score, recall_score, roc_auc_score
+from sklearn.model_selection import GridSearchCV, StratifiedKFold, train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OrdinalEncoder
+
+import encoder
+from forest_artifact import flatten_forest, save_artifact
+
+logger = logging.getLogger('train')
+
+FEATURE_COLUMNS = [
+    'Age', 'Gender', 'Country', 'state', 'self_employed', 'family_history', 'work_interfere',
+    'no_employees', 'remote_work', 'tech_company', 'benefits', 'care_options', 'wellness_program',
+    'seek_help', 'anonymity', 'leave', 'mental_health_consequence', 'phys_health_consequence',
+    'coworkers', 'supervisor', 'mental_health_interview', 'phys_health_interview',
+    'mental_vs_physical', 'obs_consequence',
+]
+CATEGORICAL_COLUMNS = [col for col in FEATURE_COLUMNS if col not in encoder.NUMERIC_COLUMNS]
+TARGET = 'treatment'
+SURVEY_DTYPES = {'Age': 'float64', TARGET: 'category', **{col: 'category' for col in CATEGORICAL_COLUMNS}}
+
+AGE_RANGE = (18, 100)
+GENDER_ALIASES = {
+    **dict.fromkeys(['male', 'm', 'man', 'cis male', 'cis man', 'male (cis)', 'make', 'maile', 'mal', 'mail', 'malr', 'msle'], 'Male'),
+    **dict.fromkeys(['female', 'f', 'woman', 'cis female', 'female (cis)', 'cis-female/femme', 'femake', 'femail'], 'Female'),
+}
+GENDER_OTHER = 'Other'
+
+PARAM_GRID = {
+    'forest__n_estimators': [100, 200],
+    'forest__max_depth': [None, 10, 20],
+    'forest__min_samples_split': [2, 10],
+}
+RANDOM_STATE = 42
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process plus its finished worker processes."""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is kilobytes on Linux and bytes on macOS.
+    return usage / (1024 * 1024) if sys.platform == 'darwin' else usage / 1024
+
+
+def load_survey(path=encoder.SURVEY_PATH):
+    """The feature and target columns of a survey CSV or of a survey store directory (see survey_store.py)."""
+    if os.path.isdir(path):
+        from survey_store import SurveyStore
+        return SurveyStore(path).read(FEATURE_COLUMNS + [TARGET])
+    return pd.read_csv(path, usecols=FEATURE_COLUMNS + [TARGET], dtype=SURVEY_DTYPES)
+
+
+def _clean_gender(value):
+    return GENDER_ALIASES.get(str(value).strip().lower(), GENDER_OTHER)
+
+
+def _fill_missing_answer(value):
+    return encoder.MISSING_VALUE if pd.isna(value) else str(value)
+
+
+def _clean_answers(column, clean):
+    """`clean` applied to every answer (NaN for missing), once per distinct answer of a categorical column."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        cleaned = pd.Series(list(column.cat.categories) + [np.nan], dtype=object).map(clean).to_numpy(dtype=str)
+        return pd.Series(cleaned[column.cat.codes.to_numpy()], index=column.index)
+    return column.map(clean).astype(str)
+
+
+def clean_survey(survey):
+    """Replace impossible ages with the median valid age and collapse free-text genders."""
+    survey = survey.copy()
+    age = survey['Age']
+    valid = age.between(*AGE_RANGE)
+    age_default = float(age[valid].median())
+    survey['Age'] = age.where(valid, age_default)
+
+    survey['Gender'] = _clean_answers(survey['Gender'], _clean_gender)
+    for col in CATEGORICAL_COLUMNS:
+        if col != 'Gender':
+            survey[col] = _clean_answers(survey[col], _fill_missing_answer)
+    return survey, age_default
+
+
+def build_pipeline(memory=None):
+    # One transformer per column keeps the output in FEATURE_COLUMNS order, which is the layout the app feeds the forest.
+    preprocess = ColumnTransformer(
+        [
+            (col, 'passthrough' if col in encoder.NUMERIC_COLUMNS
+             else OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1), [col])
+            for col in FEATURE_COLUMNS
+        ],
+        verbose_feature_names_out=False,
+    )
+    forest = RandomForestClassifier(class_weight='balanced', random_state=RANDOM_STATE)
+    return Pipeline([('encode', preprocess), ('forest', forest)], memory=memory)
+
+
+def evaluate(model, X, y):
+    probability = model.predict_proba(X)[:, 1]
+    prediction = (probability > 0.5).astype(int)
+    return {
+        'accuracy': accuracy_score(y, prediction),
+        'recall': recall_score(y, prediction),
+        'precision': precision_score(y, prediction),
+        'f1': f1_score(y, prediction),
+        'roc_auc': roc_auc_score(y, probability),
+        'confusion_matrix': confusion_matrix(y, prediction).tolist(),
+    }
+
+
+def train(survey_path=encoder.SURVEY_PATH, n_jobs=-1, cv=5, param_grid=PARAM_GRID):
+    """Run the search and return (forest, survey encoder, metrics report)."""
+    timings = {}
+    start = time.perf_counter()
+    survey, age_default = clean_survey(load_survey(survey_path))
+    X = survey[FEATURE_COLUMNS]
+    y = (survey[TARGET] == 'Yes').astype(int).to_numpy()
+    timings['load_and_clean_seconds'] = time.perf_counter() - start
+    logger.info("Loaded %d rows in %.2fs (peak %.0f MB)", len(survey), timings['load_and_clean_seconds'], peak_memory_mb())
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=RANDOM_STATE, stratify=y)
+
+    with tempfile.TemporaryDirectory(prefix='train-cache-') as cache_dir:
+        search = GridSearchCV(
+            build_pipeline(memory=joblib.Memory(cache_dir, verbose=0)),
+            param_grid,
+            scoring='roc_auc',
+            cv=StratifiedKFold(n_splits=cv, shuffle=True, random_state=RANDOM_STATE),
+            n_jobs=n_jobs,
+        )
+        start = time.perf_counter()
+        search.fit(X_train, y_train)
+        timings['search_seconds'] = time.perf_counter() - start
+    n_candidates = len(search.cv_results_['params'])
+    logger.info("Searched %d candidates x %d folds in %.2fs (peak %.0f MB); best CV ROC-AUC %.3f with %s",
+                n_candidates, cv, timings['search_seconds'], peak_memory_mb(), search.best_score_, search.best_params_)
+
+    best = search.best_estimator_
+    fitted = best.named_steps['encode'].named_transformers_
+    category_maps = {col: list(fitted[col].categories_[0]) for col in CATEGORICAL_COLUMNS}
+    survey_encoder = encoder.FeatureEncoder.for_survey(
+        FEATURE_COLUMNS,
+        category_maps,
+        aliases={'Gender': (GENDER_ALIASES, GENDER_OTHER)},
+        numeric_defaults={'Age': age_default},
+        valid_ranges={'Age': AGE_RANGE},
+    )
+
+    # The shipped model is the bare forest; the survey encoder must reproduce the pipeline's preprocessing exactly.
+    forest = best.named_steps['forest']
+    test_matrix = survey_encoder.encode_columns(X_test, len(X_test))
+    if not np.array_equal(test_matrix, best.named_steps['encode'].transform(X_test).astype(np.float64)):
+        raise RuntimeError("Survey encoder does not match the pipeline's preprocessing.")
+
+    metrics = evaluate(forest, test_matrix, y_test)
+    report = {
+        'rows': len(survey),
+        'train_rows': len(X_train),
+        'test_rows': len(X_test),
+        'best_params': {key.split('__', 1)[1]: value for key, value in search.best_params_.items()},
+        'cv_roc_auc': search.best_score_,
+        'test_metrics': metrics,
+        'timings': timings,
+        'peak_memory_mb': peak_memory_mb(),
+    }
+    return forest, survey_encoder, report
+
+
+def _replace_atomically(path, write):
+    """Call `write(tmp_path)`, then rename the result over `path` so readers never see a partial file."""
+    tmp_path = path + '.tmp'
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def save_outputs(forest, survey_encoder, report, output_dir):
+    """
+    Write the artifacts one complete file at a time. The app reloads when any of them changes, so the model, whose
+    change is what makes a reload pick up the new forest, goes last: by then its columns and encoder are in place.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {
+        'columns': os.path.join(output_dir, 'feature_columns.pkl'),
+        'encoder': os.path.join(output_dir, 'feature_encoder.pkl'),
+        'artifact': os.path.join(output_dir, 'mental_health_rf_model.forest'),
+        'metrics': os.path.join(output_dir, 'training_metrics.json'),
+        'model': os.path.join(output_dir, 'mental_health_rf_model.pkl'),
+    }
+    _replace_atomically(paths['columns'], lambda path: joblib.dump(FEATURE_COLUMNS, path))
+    _replace_atomically(paths['encoder'], lambda path: joblib.dump(survey_encoder, path))
+    artifact = flatten_forest(forest, FEATURE_COLUMNS)
+    save_artifact(artifact, paths['artifact'])  # already written atomically
+    # Lets compress_forest.py prove that the test rows it evaluates on were held out from this exact forest.
+    report = {**report, 'forest_sha256': artifact.checksum}
+
+    def write_metrics(path):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+    _replace_atomically(paths['metrics'], write_metrics)
+    _replace_atomically(paths['model'], lambda path: joblib.dump(forest, path))
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the mental health model from survey.csv.")
+    parser.add_argument('--survey', default=encoder.SURVEY_PATH, help="survey CSV or survey store directory")
+    parser.add_argument('--output-dir', default=encoder.BASE_DIR)
+    parser.add_argument('--jobs', type=int, default=-1, help="parallel jobs for the search (-1 = all cores)")
+    parser.add_argument('--cv', type=int, default=5, help="cross-validation folds")
+    parser.add_argument('--quick', action='store_true', help="search a single candidate")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(message)s')
+
+    param_grid = {key: values[:1] for key, values in PARAM_GRID.items()} if args.quick else PARAM_GRID
+    start = time.perf_counter()
+    forest, survey_encoder, report = train(args.survey, n_jobs=args.jobs, cv=args.cv, param_grid=param_grid)
+    report['timings']['total_seconds'] = time.perf_counter() - start
+    paths = save_outputs(forest, survey_encoder, report, args.output_dir)
+
+    metrics = report['test_metrics']
+    logger.info("Test accuracy %.3f, recall %.3f, F1 %.3f, ROC-AUC %.3f, confusion %s",
+                metrics['accuracy'], metrics['recall'], metrics['f1'], metrics['roc_auc'], metrics['confusion_matrix'])
+    logger.info("Wrote %s in %.1fs total (peak %.0f MB)", ', '.join(paths.values()),
+                report['timings']['total_seconds'], report['peak_memory_mb'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Counterfactual "what-if" sweep over the app's Yes/No factors.
+
+Every single-factor and pairwise flip of the current answers is encoded into one
+matrix and scored with a single `predict_proba` call, giving the full
+sensitivity picture in one round trip.
+"""
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from prediction import DECISION_THRESHOLD
+from rules import risk_levels, risk_scores
+
+WHAT_IF_FACTORS = ['family_history', 'self_employed', 'remote_work', 'tech_company', 'benefits']
+
+
+def _flip(value):
+    return "No" if value == "Yes" else "Yes"
+
+
+def scenario_inputs(user_input_data, factors=WHAT_IF_FACTORS, max_changes=2):
+    """The baseline answers followed by every variation with up to `max_changes` flipped factors."""
+    scenarios = [((), dict(user_input_data))]
+    for n in range(1, max_changes + 1):
+        for changed in combinations(factors, n):
+            inputs = dict(user_input_data)
+            for key in changed:
+                inputs[key] = _flip(inputs[key])
+            scenarios.append((changed, inputs))
+    return scenarios
+
+
+def run_sweep(model, encoder, user_input_data, factors=WHAT_IF_FACTORS, max_changes=2, threshold=DECISION_THRESHOLD):
+    """
+    Score the baseline and all flips in one batch. Returns a DataFrame of the
+    variations ranked by how much they move the risk level and probability.
+    """
+    scenarios = scenario_inputs(user_input_data, factors, max_changes)
+    features = encoder.encode_many([inputs for _, inputs in scenarios])
+    probability = model.predict_proba(features)[:, 1]
+    prediction = (probability > threshold).astype(np.int64)
+
+    raw = pd.DataFrame([inputs for _, inputs in scenarios]).rename(columns={'age': 'Age'})
+    score = risk_scores(raw, prediction)
+    level = risk_levels(score)
+
+    table = pd.DataFrame({
+        'factors': [changed for changed, _ in scenarios],
+        'change': [", ".join(f"{key}: {user_input_data[key]} → {inputs[key]}" for key in changed) for changed, inputs in scenarios],
+        'probability': probability,
+        'delta_probability': probability - probability[0],
+        'risk_score': score,
+        'delta_risk_score': score - score[0],
+        'risk_level': level,
+        'level_changed': level != level[0],
+    }).iloc[1:]
+    table['abs_delta'] = table['delta_probability'].abs()
+    table = table.sort_values(['level_changed', 'abs_delta'], ascending=False)
+    return table.drop(columns='abs_delta').reset_index(drop=True)
+
+
+def lookup_scenario(table, user_input_data, key, new_value):
+    """Row of a sweep table for setting one factor to `new_value`, or None if it is unchanged."""
+    if user_input_data.get(key) == new_value:
+        return None
+    match = table[table['factors'] == (key,)]
+    return match.iloc[0] if len(match) else None